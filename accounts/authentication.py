@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from accounts.cache import user_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user through an in-process
+    TTL cache instead of a SELECT per request.
+
+    Entries are dropped on User post_save/post_delete (accounts.models), so a
+    process sees its own changes at once; other worker processes may serve a
+    stale user for at most JWT_USER_CACHE_TTL seconds.
+    """
+
+    def _user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def _cached_user(self, user_id):
+        values = user_cache.get(str(user_id))
+        if values is None:
+            return None
+        return self.user_model.from_db(None, [f.attname for f in self.user_model._meta.concrete_fields], values)
+
+    def _cache_user(self, user):
+        user_cache.set(str(user.pk), [getattr(user, f.attname) for f in self.user_model._meta.concrete_fields])
+
+    def _check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        user = self._cached_user(user_id)
+        if user is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            self._cache_user(user)
+        return self._check_user(user, validated_token)
+
+
+class StatelessReadJWTAuthentication(CachedJWTAuthentication):
+    """
+    For read-only views that only need the user's id: when JWT_STATELESS_READS
+    is on, safe-method requests get a TokenUser built from the token claims
+    and never touch the user table. The user's is_active flag is not checked
+    in that mode. Other methods fall back to CachedJWTAuthentication.
+    """
+
+    def authenticate(self, request):
+        self.stateless = settings.JWT_STATELESS_READS and request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if self.stateless:
+            if api_settings.USER_ID_CLAIM not in validated_token:
+                raise InvalidToken(_("Token contained no recognizable user identification"))
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+        return super().get_user(validated_token)
+
+
+class AsyncJWTAuthentication(StatelessReadJWTAuthentication):
+    """
+    StatelessReadJWTAuthentication for the async views (socialapi.async_views):
+    token validation is CPU only, and a user missing from the cache is
+    loaded with the async ORM.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        self.stateless = settings.JWT_STATELESS_READS and request.method in SAFE_METHODS
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if self.stateless:
+            return self.get_user(validated_token)
+        user_id = self._user_id(validated_token)
+        user = self._cached_user(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            self._cache_user(user)
+        return self._check_user(user, validated_token)
@@ -0,0 +1,140 @@
+"""
+In-process Bloom filter over blacklisted refresh token jtis.
+
+A Bloom filter never reports a member as absent, so a token it rejects is
+certainly not blacklisted and needs no database lookup; only the rare
+"maybe" goes on to the BlacklistedToken query. The filter picks up new
+blacklist rows every BLACKLIST_FILTER_REFRESH_SECONDS (by primary key, so
+it is a cheap range read) and is rebuilt from scratch every
+BLACKLIST_FILTER_REBUILD_SECONDS to shed pruned tokens and stay sized.
+
+Both run on a background thread (socialapi.background), so no request
+waits for them. Until the first build finishes, and whenever the last
+refresh is more than an interval old (e.g. after the process sat idle),
+every token goes to the query instead. Tokens blacklisted in this process
+are added immediately; a token blacklisted by another worker, or written
+straight to the table, can pass the filter for at most one refresh
+interval.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from socialapi.background import BackgroundTask
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class BlacklistFilter:
+    """
+    The filter is built and kept current by a BackgroundTask, never on the
+    request thread: until the first build finishes, and while a refresh is
+    overdue, every token is a "maybe".
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # guards the attributes below, never held during a query
+        self._bloom = None
+        self._added = None  # jtis added while a rebuild is reading the table
+        self._max_id = 0
+        self._seen_id = 0
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+        self._task = BackgroundTask(self.update, 'blacklist-filter')
+
+    def _rebuild(self):
+        with self._lock:
+            self._added = []
+        count = BlacklistedToken.objects.count()
+        capacity = max(settings.BLACKLIST_FILTER_MIN_CAPACITY, count * 2)
+        bloom = BloomFilter(capacity, settings.BLACKLIST_FILTER_ERROR_RATE)
+        max_id = 0
+        rows = BlacklistedToken.objects.order_by().values_list('id', 'token__jti')
+        for pk, jti in rows.iterator(chunk_size=5000):
+            bloom.add(jti)
+            max_id = max(max_id, pk)
+        with self._lock:
+            for jti in self._added:
+                bloom.add(jti)
+            self._bloom, self._added, self._max_id, self._seen_id = bloom, None, max_id, max_id
+            self._rebuilt_at = self._refreshed_at = time.monotonic()
+
+    def _refresh(self):
+        # Re-read from the high-water mark of the refresh before last: ids are
+        # allocated before commit, so a lower id can become visible after a
+        # higher one has already been seen.
+        rows = list(BlacklistedToken.objects.filter(id__gt=self._seen_id).order_by().values_list('id', 'token__jti'))
+        with self._lock:
+            max_id = self._max_id
+            for pk, jti in rows:
+                self._bloom.add(jti)
+                max_id = max(max_id, pk)
+            self._seen_id, self._max_id = self._max_id, max_id
+            self._refreshed_at = time.monotonic()
+
+    def _due(self):
+        now = time.monotonic()
+        if self._bloom is None or now - self._rebuilt_at > settings.BLACKLIST_FILTER_REBUILD_SECONDS:
+            return self._rebuild
+        if self._stale(now):
+            return self._refresh
+        return None
+
+    def _stale(self, now):
+        """Whether the filter may be missing rows blacklisted more than a refresh interval ago."""
+        return self._bloom is None or now - self._refreshed_at > settings.BLACKLIST_FILTER_REFRESH_SECONDS
+
+    def update(self):
+        """Rebuild or refresh the filter if it is due, on the calling thread."""
+        with self._lock:
+            due = self._due()
+        if due is not None:
+            due()
+
+    def might_contain(self, jti):
+        with self._lock:
+            bloom = self._bloom
+            due = self._due() is not None
+            stale = self._stale(time.monotonic())
+        if due:
+            self._task.start()
+        # an overdue filter can't rule anything out: the caller asks the table
+        return stale or jti in bloom
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+            if self._added is not None:
+                self._added.append(jti)
+
+    def reset(self):
+        self._task.join()
+        with self._lock:
+            self._bloom = None
+
+
+blacklist_filter = BlacklistFilter()
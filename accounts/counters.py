@@ -0,0 +1,50 @@
+"""
+Denormalized profile counters on UserInfo.
+
+Counters are only ever changed with relative F() updates, so concurrent
+writers never overwrite each other. Callers pass {user_id: delta} so a batch
+of rows costs one UPDATE per distinct delta rather than one per row.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import F
+
+from accounts.models import UserInfo
+from socialapi.caching import bump_versions
+
+COUNTER_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def adjust(field, deltas):
+    """Apply {user_id: delta} to one counter field."""
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f'Unknown counter field: {field}')
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        UserInfo.objects.filter(user_id__in=user_ids).update(**{field: F(field) + delta})
+    # .update() sends no signals, so invalidate cached profiles here
+    bump_versions(*(f'user-counts:{user_id}' for user_id, delta in deltas.items() if delta))
+
+
+def posts_created(author_ids):
+    adjust('posts_count', Counter(author_ids))
+
+
+def posts_deleted(author_ids):
+    adjust('posts_count', {user_id: -n for user_id, n in Counter(author_ids).items()})
+
+
+def follows_created(edges):
+    """`edges` is an iterable of (follower_id, following_id) pairs."""
+    edges = list(edges)
+    adjust('following_count', Counter(follower for follower, _ in edges))
+    adjust('followers_count', Counter(following for _, following in edges))
+
+
+def follows_deleted(edges):
+    edges = list(edges)
+    adjust('following_count', {user_id: -n for user_id, n in Counter(f for f, _ in edges).items()})
+    adjust('followers_count', {user_id: -n for user_id, n in Counter(f for _, f in edges).items()})
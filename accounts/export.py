@@ -0,0 +1,56 @@
+"""
+Streaming data export of one user: GET /api/user/export/ and export_user.
+
+The user's posts (hot and archived), followers and following are read
+through server-side cursors, USER_EXPORT_CHUNK_SIZE rows at a time, and
+encoded as they are read, so memory stays flat however large the account
+is. Every record has the same fields, which makes the CSV a single table:
+
+    type        post, follower or following
+    id          the post's id, or the other user's
+    username    the post's author (the user) or the other user
+    content     the post's text; empty for follows
+    created_at  when the post was written or the follow made
+
+Each section is newest first, in the order of its composite index.
+"""
+from itertools import islice
+
+from django.conf import settings
+from rest_framework import serializers
+
+from posts.models import ArchivedPost, Post
+from social.models import Follow
+
+FIELDS = ('type', 'id', 'username', 'content', 'created_at')
+
+_created_at_field = serializers.DateTimeField()
+
+
+def records(user, chunk_size=None):
+    """The user's export records, as dicts with FIELDS as keys."""
+    chunk_size = chunk_size or settings.USER_EXPORT_CHUNK_SIZE
+    created_at = _created_at_field.to_representation
+    for model in (Post, ArchivedPost):  # archived posts are the older ones
+        posts = model.objects.filter(author_id=user.pk).order_by('-created_at', '-id')
+        for pk, content, written_at in posts.values_list('id', 'content', 'created_at').iterator(chunk_size):
+            yield {'type': 'post', 'id': pk, 'username': user.username, 'content': content,
+                   'created_at': created_at(written_at)}
+    for kind, mine, other in (('follower', 'following', 'follower'), ('following', 'follower', 'following')):
+        follows = Follow.objects.filter(**{f'{mine}_id': user.pk}).order_by('-created_at', '-id')
+        rows = follows.values_list(f'{other}_id', f'{other}__username', 'created_at')
+        for pk, username, followed_at in rows.iterator(chunk_size):
+            yield {'type': kind, 'id': pk, 'username': username, 'content': '', 'created_at': created_at(followed_at)}
+
+
+def stream(user, renderer, chunk_size=None):
+    """
+    The export encoded by an NDJSONRenderer or CSVRenderer, as bytes of
+    about a chunk of records each rather than a write per line.
+    """
+    chunk_size = chunk_size or settings.USER_EXPORT_CHUNK_SIZE
+    rows = records(user, chunk_size)
+    # the CSV header is written even when there are no records to take the columns from
+    lines = renderer.stream(rows, FIELDS) if renderer.format == 'csv' else renderer.stream(rows)
+    while chunk := b''.join(islice(lines, chunk_size)):
+        yield chunk
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import export
+from accounts.models import User
+from socialapi.renderers import CSVRenderer, NDJSONRenderer
+
+RENDERERS = {renderer.format: renderer for renderer in (NDJSONRenderer, CSVRenderer)}
+
+
+class Command(BaseCommand):
+    help = ("Stream a user's posts, followers and following as NDJSON or CSV (the same export as "
+            "GET /api/user/export/), reading through server-side cursors so memory stays flat.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='username or id')
+        parser.add_argument('--format', choices=sorted(RENDERERS), default='ndjson')
+        parser.add_argument('--output', help='write the export here instead of stdout')
+        parser.add_argument('--chunk-size', type=int, help='rows per cursor fetch (default: USER_EXPORT_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        lookup = {'pk': int(options['user'])} if options['user'].isdigit() else {'username': options['user']}
+        user = User.objects.filter(**lookup).first()
+        if user is None:
+            raise CommandError(f'No user {options["user"]!r}.')
+        chunks = export.stream(user, RENDERERS[options['format']](), options['chunk_size'])
+
+        written = 0
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    written += len(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+                written += len(chunk)
+        # stderr, so the message never ends up inside an export written to stdout
+        self.stderr.write(self.style.SUCCESS(f'Exported {user.username} ({written} bytes).'))
@@ -0,0 +1,182 @@
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from accounts.models import User, UserInfo
+
+INFO_FIELDS = ('bio', 'website', 'birth_date', 'phone_number', 'twitter_handle', 'linkedin_url', 'github_url')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _hash_passwords(passwords):
+    return [make_password(password or None) for password in passwords]
+
+
+def _flag(value, default=False):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = ('Import users from CSV or JSON Lines with bulk inserts of User and UserInfo. '
+            'Columns: username, email, password (plain text, hashed here) or password_hash '
+            '(already in a Django hasher format, used as is), optional tc, is_active and UserInfo fields '
+            f'({", ".join(INFO_FIELDS)}). Users that already exist (ignoring case) are skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV/JSONL file, or '-' for stdin")
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help='default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='users per INSERT and transaction')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='processes hashing plain-text passwords; 1 hashes in this process')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if path == '-' and not options['format']:
+            raise CommandError('--format is required when reading from stdin')
+        self.batch_size = options['batch_size']
+
+        self.pool, self.workers = None, options['workers']
+        self.created = self.skipped = self.invalid = 0
+        self.started = time.perf_counter()
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            rows = read_rows(stream, fmt)
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                self.import_batch(batch)
+                self.report()
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if self.pool is not None:
+                self.pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(self.progress()))
+
+    def progress(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.created / elapsed if elapsed else 0
+        return (f'Created {self.created} user(s), skipped {self.skipped} existing, {self.invalid} invalid '
+                f'in {elapsed:.1f}s ({rate:,.0f} users/s).')
+
+    def report(self):
+        self.stderr.write(self.progress())
+
+    def parse(self, row):
+        username = (row.get('username') or '').strip()
+        email = User.objects.normalize_email((row.get('email') or '').strip())
+        if not username or not email:
+            return None
+        user = User(
+            username=username,
+            email=email,
+            tc=_flag(row.get('tc')),
+            is_active=_flag(row.get('is_active'), default=True),
+            password=row.get('password_hash') or '',
+        )
+        info = UserInfo(**{field: row.get(field) or '' for field in INFO_FIELDS if field != 'birth_date'})
+        if row.get('birth_date'):
+            info.birth_date = date.fromisoformat(row['birth_date'])
+        return user, info, row.get('password')
+
+    def hash_passwords(self, passwords):
+        if self.workers <= 1 or len(passwords) < 2:
+            return _hash_passwords(passwords)
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        chunk = -(-len(passwords) // self.workers)
+        chunks = [passwords[i:i + chunk] for i in range(0, len(passwords), chunk)]
+        return [hashed for hashes in self.pool.map(_hash_passwords, chunks) for hashed in hashes]
+
+    def import_batch(self, rows):
+        parsed, seen_usernames, seen_emails = [], set(), set()
+        for row in rows:
+            try:
+                entry = self.parse(row)
+            except (ValueError, TypeError):
+                entry = None
+            if entry is None:
+                self.invalid += 1
+                continue
+            username, email = entry[0].username.lower(), entry[0].email.lower()
+            if username in seen_usernames or email in seen_emails:  # repeated within the batch
+                self.skipped += 1
+                continue
+            seen_usernames.add(username)
+            seen_emails.add(email)
+            parsed.append(entry)
+
+        # one query per field and batch for the users that already exist, through the Lower() indexes;
+        # kept apart, as a username may equal another user's email
+        taken = {}
+        for field, values in (('username', seen_usernames), ('email', seen_emails)):
+            existing = User.objects.annotate(key=Lower(field)).filter(key__in=values)
+            taken[field] = set(existing.values_list('key', flat=True))
+        fresh = [
+            entry for entry in parsed
+            if entry[0].username.lower() not in taken['username'] and entry[0].email.lower() not in taken['email']
+        ]
+        self.skipped += len(parsed) - len(fresh)
+        if not fresh:
+            return
+
+        to_hash = [(user, password) for user, _, password in fresh if not user.password]
+        for (user, _), hashed in zip(to_hash, self.hash_passwords([password for _, password in to_hash])):
+            user.password = hashed
+
+        try:
+            with transaction.atomic():
+                self.insert(fresh)
+            self.created += len(fresh)
+        except IntegrityError:
+            # lost a race with another writer, or a case variant LOWER() folds differently: go row by row
+            for entry in fresh:
+                entry[0].pk = None
+                entry[0]._state.adding = True
+                try:
+                    with transaction.atomic():
+                        self.insert([entry])
+                    self.created += 1
+                except IntegrityError:
+                    self.skipped += 1
+
+    def insert(self, entries):
+        # bulk_create skips post_save, so create_user_info doesn't add a second INSERT per user
+        users = User.objects.bulk_create([user for user, _, _ in entries], batch_size=self.batch_size)
+        infos = []
+        for user, (_, info, _) in zip(users, entries):
+            info.user_id = user.pk
+            infos.append(info)
+        UserInfo.objects.bulk_create(infos, batch_size=self.batch_size)
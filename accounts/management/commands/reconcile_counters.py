@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from accounts.models import UserInfo
+from posts.models import ArchivedPost, Post
+from social.models import Follow
+
+
+def _count(queryset, field):
+    counted = queryset.filter(**{field: OuterRef('user_id')}).order_by().values(field).annotate(n=Count('id'))
+    return Coalesce(Subquery(counted.values('n')), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Recompute UserInfo post/follower/following counters in batches and fix any that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        checked = fixed = 0
+        last_pk = 0
+
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    UserInfo.objects.filter(pk__gt=last_pk).order_by('pk')
+                    .select_for_update()
+                    .annotate(
+                        # archived posts still count (posts.archive)
+                        actual_posts=_count(Post.objects, 'author_id') + _count(ArchivedPost.objects, 'author_id'),
+                        actual_followers=_count(Follow.objects, 'following_id'),
+                        actual_following=_count(Follow.objects, 'follower_id'),
+                    )
+                    .only('pk', 'user_id', 'posts_count', 'followers_count', 'following_count')[:batch_size]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                checked += len(batch)
+
+                drifted = []
+                for info in batch:
+                    if (info.posts_count, info.followers_count, info.following_count) != \
+                            (info.actual_posts, info.actual_followers, info.actual_following):
+                        info.posts_count = info.actual_posts
+                        info.followers_count = info.actual_followers
+                        info.following_count = info.actual_following
+                        drifted.append(info)
+                fixed += len(drifted)
+                if drifted and not dry_run:
+                    UserInfo.objects.bulk_update(drifted, ['posts_count', 'followers_count', 'following_count'])
+
+        verb = 'would fix' if dry_run else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} profile(s), {verb} {fixed}.'))
@@ -1,9 +1,13 @@
 from django.db import models
 from django.contrib.auth.base_user import BaseUserManager, AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
-from django.db.models.signals import post_save
+from django.db.models.functions import Lower
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+from accounts.cache import user_cache
+from socialapi.caching import bump_versions
+
 
 class UserManager(BaseUserManager):
     use_in_migrations = True
@@ -28,8 +32,18 @@ class UserManager(BaseUserManager):
 
         return self.create_user(username, email, password, **extra_fields)
 
+    def case_insensitive(self, field, value):
+        """Users whose `field` equals value ignoring case; matches the Lower() unique index on it."""
+        return self.alias(**{f'{field}_lower': Lower(field)}).filter(**{f'{field}_lower': Lower(models.Value(value))})
+
     def get_by_natural_key(self, username):
-        return self.get(models.Q(username__iexact=username) | models.Q(email__iexact=username))
+        # username, then email: each an equality probe on a Lower() unique index (see User.Meta);
+        # an OR of two iexact filters can't use either index
+        for field in ('username', 'email'):
+            user = self.case_insensitive(field, username).first()
+            if user is not None:
+                return user
+        raise self.model.DoesNotExist(f'No user with username or email {username!r}')
 
 
 class User(AbstractBaseUser, PermissionsMixin):
@@ -47,6 +61,13 @@ class User(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = ['email']
     USERNAME_FIELD = 'username'
 
+    class Meta:
+        constraints = [
+            # logins are case-insensitive (UserManager.get_by_natural_key), so uniqueness is too
+            models.UniqueConstraint(Lower('username'), name='accounts_user_username_lower_uniq'),
+            models.UniqueConstraint(Lower('email'), name='accounts_user_email_lower_uniq'),
+        ]
+
     def __str__(self):
         return self.username or self.email
 
@@ -69,9 +90,10 @@ class UserInfo(models.Model):
     linkedin_url = models.URLField(blank=True)
     github_url = models.URLField(blank=True)
 
-    @property
-    def posts_count(self):
-        return self.user.posts.count()
+    # denormalized counters, kept current by accounts.counters; see reconcile_counters to repair drift
+    posts_count = models.IntegerField(default=0)
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
 
     @property
     def posts(self):
@@ -82,3 +104,14 @@ class UserInfo(models.Model):
 def create_user_info(sender, instance, created, **kwargs):
     if created:
         UserInfo.objects.create(user=instance)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.delete(str(instance.pk))
+    bump_versions(f'user:{instance.pk}')
+
+
+@receiver([post_save, post_delete], sender=UserInfo)
+def invalidate_cached_user_info(sender, instance, **kwargs):
+    bump_versions(f'user:{instance.user_id}')
@@ -1,8 +1,16 @@
+from django.conf import settings
+from django.urls import reverse
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer, TokenVerifySerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
 
 from accounts.models import User, UserInfo
-from posts.models import Post
+from accounts.tokens import FilteredRefreshToken, is_blacklisted
+from posts.archive import HotColdPosts
 from posts.serializers import PostSerializer, UserPostsSerializer
+from socialapi.pagination import encode_cursor
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -15,6 +23,16 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             'password': {'write_only': True}
         }
 
+    def validate_username(self, value):
+        if User.objects.case_insensitive('username', value).exists():
+            raise serializers.ValidationError('user with this username already exists.')
+        return value
+
+    def validate_email(self, value):
+        if User.objects.case_insensitive('email', value).exists():
+            raise serializers.ValidationError('user with this Email already exists.')
+        return value
+
     def validate(self, attrs):
         password = attrs.get('password')
         password2 = attrs.get('password2')
@@ -36,14 +54,28 @@ class UserLogoutSerializer(serializers.Serializer):
     refresh = serializers.CharField()
 
     def validate(self, attrs):
-        from rest_framework_simplejwt.tokens import RefreshToken
         try:
-            RefreshToken(attrs['refresh'])
+            attrs['token'] = FilteredRefreshToken(attrs['refresh'])
         except Exception as e:
             raise serializers.ValidationError("Invalid refresh token") from e
         return attrs
 
 
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    """POST /api/user/token/refresh/: the refresh token's blacklist check goes through the Bloom filter."""
+    token_class = FilteredRefreshToken
+
+
+class FilteredTokenVerifySerializer(TokenVerifySerializer):
+    """POST /api/user/token/verify/, with the same filtered blacklist check."""
+
+    def validate(self, attrs):
+        token = UntypedToken(attrs['token'])
+        if is_blacklisted(token.get(api_settings.JTI_CLAIM)):
+            raise serializers.ValidationError(_('Token is blacklisted'))
+        return {}
+
+
 # this is the protected one only the user himself can see this information
 class UserProfileSerializer(serializers.ModelSerializer):
     # changed to explicit safe fields to avoid exposing password/hash
@@ -54,18 +86,37 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 
 class UserInfoSerializer(serializers.ModelSerializer):
-    posts_count = serializers.SerializerMethodField()
+    # only the most recent USER_EMBEDDED_POSTS_LIMIT posts are embedded;
+    # posts_next links to UserPostsView for the rest
     posts = serializers.SerializerMethodField()
+    posts_next = serializers.SerializerMethodField()
 
     class Meta:
         model = UserInfo
         fields = '__all__'
+        read_only_fields = ['posts_count', 'followers_count', 'following_count']
 
-    def get_posts_count(self, obj):
-        return obj.user.posts.count()
+    def _recent_posts(self, obj):
+        if not hasattr(obj, '_recent_posts'):
+            limit = settings.USER_EMBEDDED_POSTS_LIMIT
+            recent = HotColdPosts.filter(rows=lambda posts: posts.only('id', 'content', 'created_at'),
+                                         author_id=obj.user_id)
+            obj._recent_posts = recent.seek(None, False, limit + 1)
+        return obj._recent_posts
 
     def get_posts(self, obj):
-        return UserPostsSerializer(obj.user.posts.all(), many=True).data
+        recent = self._recent_posts(obj)[:settings.USER_EMBEDDED_POSTS_LIMIT]
+        return UserPostsSerializer(recent, many=True).data
+
+    def get_posts_next(self, obj):
+        recent = self._recent_posts(obj)
+        if len(recent) <= settings.USER_EMBEDDED_POSTS_LIMIT:
+            return None
+        last = recent[settings.USER_EMBEDDED_POSTS_LIMIT - 1]
+        url = reverse('posts:user-posts', kwargs={'pk': obj.user_id})
+        url = f'{url}?cursor={encode_cursor(last.created_at, last.id)}'
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 
 # this is the public information can be visible to anyone out there
@@ -78,5 +129,5 @@ class UserDetailSerializer(serializers.ModelSerializer):
 
     def get_info(self, obj):
         if hasattr(obj, 'info'):
-            return UserInfoSerializer(obj.info).data
+            return UserInfoSerializer(obj.info, context=self.context).data
         return None
@@ -1,4 +1,6 @@
-from django.test import TestCase
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
@@ -6,6 +8,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from datetime import date
 
 from accounts.models import User, UserInfo
+from socialapi.testing import QueryBudgetMixin
 
 
 class UserModelTestCase(TestCase):
@@ -170,6 +173,39 @@ class UserLoginTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_login_is_case_insensitive(self):
+        """Test username and email match regardless of case"""
+        for username in ('LoginUser', 'LOGIN@example.com'):
+            response = self.client.post(self.login_url, {'username': username, 'password': 'loginpass123'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_natural_key_lookup_is_an_indexed_probe_per_field(self):
+        """Test a username login is one query, served by the Lower() index"""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(User.objects.get_by_natural_key('LOGINUSER'), self.user)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn(' OR ', queries[0]['sql'])
+        for field in ('username', 'email'):
+            plan = User.objects.case_insensitive(field, 'x').explain()
+            self.assertIn(f'accounts_user_{field}_lower_uniq', plan)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(User.objects.get_by_natural_key('Login@Example.com'), self.user)
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.get_by_natural_key('nobody')
+
+    def test_usernames_unique_ignoring_case(self):
+        """Test the Lower() unique constraints reject case variants"""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='LOGINUSER', email='other@example.com', password='x')
+        response = self.client.post(reverse('register'), {
+            'username': 'LoginUser', 'email': 'Login@Example.com', 'password': 'pass12345',
+            'password2': 'pass12345', 'tc': True,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data)
+        self.assertIn('email', response.data)
+
     def test_login_with_wrong_password(self):
         """Test login fails with incorrect password"""
         login_data = {
@@ -239,6 +275,140 @@ class UserLogoutTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class TokenBlacklistFilterTestCase(APITestCase):
+    """Test cases for the Bloom-filtered blacklist check and token pruning"""
+
+    def setUp(self):
+        from accounts.blacklist import blacklist_filter
+
+        blacklist_filter.reset()
+        self.logout_url = reverse('logout')
+        self.user = User.objects.create_user(
+            username='bloomuser',
+            email='bloom@example.com',
+            password='bloompass123'
+        )
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test every added item is reported as present"""
+        from accounts.blacklist import BloomFilter
+
+        bloom = BloomFilter(1000, 0.01)
+        items = [f'jti-{i}' for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_clean_token_skips_blacklist_query(self):
+        """Test a token absent from the filter is not looked up in the blacklist table"""
+        from accounts.blacklist import blacklist_filter
+        from accounts.tokens import FilteredRefreshToken
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        blacklist_filter.update()  # what the background task does
+        with CaptureQueriesContext(connection) as ctx:
+            FilteredRefreshToken(str(self.refresh))
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_unbuilt_filter_falls_back_to_the_query(self):
+        """Test requests don't wait for the filter: until it is built, every token is looked up"""
+        from unittest import mock
+        from accounts.blacklist import blacklist_filter
+        from accounts.tokens import FilteredRefreshToken
+        from rest_framework_simplejwt.exceptions import TokenError
+
+        RefreshToken(str(self.refresh)).blacklist()
+        with mock.patch.object(blacklist_filter._task, 'start') as start:
+            with self.assertRaises(TokenError):
+                FilteredRefreshToken(str(self.refresh))
+        start.assert_called_once()
+
+    def test_refresh_and_verify_endpoints_use_the_filter(self):
+        """Test token refresh and verify skip the blacklist query for clean tokens and reject blacklisted ones"""
+        from accounts.blacklist import blacklist_filter
+
+        blacklist_filter.update()
+        data = {'refresh': str(self.refresh)}
+        with self.assertNumQueries(1):  # the user's is_active check
+            response = self.client.post(reverse('token-refresh'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.data)
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('token-verify'), {'token': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.client.post(self.logout_url, data, format='json').status_code,
+                         status.HTTP_205_RESET_CONTENT)
+        self.assertEqual(self.client.post(reverse('token-refresh'), data, format='json').status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.post(reverse('token-verify'), {'token': str(self.refresh)},
+                                          format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_token_blacklisted_by_another_process_is_rejected_once_the_filter_is_overdue(self):
+        """Test a blacklist row the filter hasn't seen is found by the query when a refresh is overdue"""
+        import time
+        from unittest import mock
+        from django.conf import settings
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+        from accounts.blacklist import blacklist_filter
+
+        blacklist_filter.update()
+        # another worker's logout: a row this process never saw
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=self.refresh['jti']))
+        idle = time.monotonic() + settings.BLACKLIST_FILTER_REFRESH_SECONDS + 600
+        with mock.patch('accounts.blacklist.time.monotonic', return_value=idle), \
+                mock.patch.object(blacklist_filter._task, 'start') as start:
+            response = self.client.post(reverse('token-refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        start.assert_called_once()
+
+    def test_blacklisted_token_rejected_on_reuse(self):
+        """Test logging out twice with the same refresh token fails the second time"""
+        data = {'refresh': str(self.refresh)}
+        self.assertEqual(self.client.post(self.logout_url, data, format='json').status_code,
+                         status.HTTP_205_RESET_CONTENT)
+        self.assertEqual(self.client.post(self.logout_url, data, format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_blacklist_written_elsewhere_is_picked_up_on_rebuild(self):
+        """Test rows blacklisted outside this process are found once the filter is rebuilt"""
+        from accounts.blacklist import blacklist_filter
+        from accounts.tokens import FilteredRefreshToken
+        from rest_framework_simplejwt.exceptions import TokenError
+
+        blacklist_filter.update()
+        FilteredRefreshToken(str(self.refresh))
+        RefreshToken(str(self.refresh)).blacklist()  # bypasses the filter, like another worker would
+        blacklist_filter.reset()
+        blacklist_filter.update()
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(str(self.refresh))
+
+    def test_prune_tokens_deletes_only_expired(self):
+        """Test the prune command removes expired outstanding and blacklisted tokens"""
+        from django.core.management import call_command
+        from django.utils import timezone
+        from io import StringIO
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+        for i in range(5):
+            token = OutstandingToken.objects.create(
+                jti=f'old-{i}', token='x', expires_at=timezone.now() - timezone.timedelta(days=1))
+            BlacklistedToken.objects.create(token=token)
+        live = OutstandingToken.objects.get(jti=self.refresh['jti'])
+
+        out = StringIO()
+        call_command('prune_tokens', '--batch-size', '2', stdout=out)
+        self.assertIn('Deleted 5', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('id', flat=True)), [live.id])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
 class UserProfileTestCase(APITestCase):
     """Test cases for user profile endpoint (authenticated user's own profile)"""
 
@@ -298,7 +468,7 @@ class UserProfileTestCase(APITestCase):
         self.assertEqual(response.data['phone_number'], '+1234567890')
 
 
-class UserDetailTestCase(APITestCase):
+class UserDetailTestCase(QueryBudgetMixin, APITestCase):
     """Test cases for public user detail endpoint"""
 
     def setUp(self):
@@ -323,6 +493,22 @@ class UserDetailTestCase(APITestCase):
         self.assertIn('info', response.data)
         self.assertEqual(response.data['info']['bio'], 'Public bio')
 
+    def test_user_detail_cache_follows_counter_changes(self):
+        """Test cached profiles are invalidated when a counter changes"""
+        from django.core.cache import cache
+        from social.models import Follow
+
+        cache.clear()
+        first = self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        follower = User.objects.create_user(username='fan', email='fan@example.com', password='fanpass123')
+        Follow.objects.create(follower=follower, following=self.user)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['info']['followers_count'], 1)
+
     def test_get_user_detail_nonexistent(self):
         """Test retrieving non-existent user returns 404"""
         nonexistent_url = reverse('detail', kwargs={'pk': 99999})
@@ -330,6 +516,40 @@ class UserDetailTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    @override_settings(USER_EMBEDDED_POSTS_LIMIT=3)
+    def test_user_detail_embeds_bounded_recent_posts(self):
+        """Test only the newest posts are embedded, with a cursor link for the rest"""
+        from posts.models import Post
+
+        posts = [Post.objects.create(author=self.user, content=f'Post {i}') for i in range(5)]
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.detail_url)
+
+        info = response.data['info']
+        self.assertEqual([p['id'] for p in info['posts']], [p.id for p in reversed(posts[2:])])
+        self.assertIn(f'/api/posts/user/{self.user.pk}/?cursor=', info['posts_next'])
+
+        rest = self.client.get(info['posts_next'])
+        self.assertEqual([p['id'] for p in rest.data['results']], [posts[1].id, posts[0].id])
+
+    def test_user_detail_query_budget(self):
+        """Test the profile, its info and embedded posts are read in a fixed number of queries"""
+        from django.core.cache import cache
+        from posts.models import Post
+
+        Post.objects.bulk_create([Post(author=self.user, content=f'Post {i}') for i in range(15)])
+        cache.clear()
+        with self.assertQueryBudget(2):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(len(response.data['info']['posts']), 10)
+
+    def test_user_detail_without_more_posts_has_no_next_link(self):
+        """Test posts_next is null when every post fits in the embedded window"""
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data['info']['posts'], [])
+        self.assertIsNone(response.data['info']['posts_next'])
+
     def test_user_detail_includes_info(self):
         """Test that user detail includes user info object"""
         response = self.client.get(self.detail_url)
@@ -378,6 +598,210 @@ class UserInfoModelTestCase(TestCase):
         self.assertEqual(user_info.birth_date, date(1990, 1, 1))
 
 
+class UserInfoCountersTestCase(TestCase):
+    """Test cases for the denormalized post/follower/following counters"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='counter1', email='counter1@example.com', password='pass123')
+        self.other = User.objects.create_user(username='counter2', email='counter2@example.com', password='pass123')
+
+    def test_post_counter_follows_create_and_delete(self):
+        from posts.models import Post
+
+        post = Post.objects.create(author=self.user, content='one')
+        Post.objects.create(author=self.user, content='two')
+        self.user.info.refresh_from_db()
+        self.assertEqual(self.user.info.posts_count, 2)
+
+        post.delete()
+        self.user.info.refresh_from_db()
+        self.assertEqual(self.user.info.posts_count, 1)
+
+    def test_follow_counters_follow_create_and_delete(self):
+        from social.models import Follow
+
+        follow = Follow.objects.create(follower=self.user, following=self.other)
+        self.user.info.refresh_from_db()
+        self.other.info.refresh_from_db()
+        self.assertEqual(self.user.info.following_count, 1)
+        self.assertEqual(self.other.info.followers_count, 1)
+
+        follow.delete()
+        self.other.info.refresh_from_db()
+        self.assertEqual(self.other.info.followers_count, 0)
+
+    def test_counters_are_read_only_through_the_api(self):
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.patch(reverse('profile'), {'followers_count': 1000}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['followers_count'], 0)
+
+    def test_reconcile_counters_command(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from posts.models import Post
+
+        Post.objects.create(author=self.user, content='one')
+        UserInfo.objects.filter(user=self.user).update(posts_count=7, followers_count=3)
+
+        out = StringIO()
+        call_command('reconcile_counters', '--batch-size', '1', stdout=out)
+        self.assertIn('fixed 1', out.getvalue())
+        self.user.info.refresh_from_db()
+        self.assertEqual((self.user.info.posts_count, self.user.info.followers_count), (1, 0))
+
+
+class ImportUsersCommandTestCase(TestCase):
+    """Test cases for the import_users management command"""
+
+    def test_imports_users_and_profiles_in_batches(self):
+        import tempfile
+        from io import StringIO
+        from django.contrib.auth.hashers import make_password
+        from django.core.management import call_command
+
+        User.objects.create_user(username='existing', email='existing@example.com', password='pass')
+        rows = [
+            '{"username": "alice", "email": "alice@example.com", "password": "secret123", "bio": "Hi", "tc": true}',
+            '{"username": "bob", "email": "bob@example.com", "password_hash": "%s"}' % make_password('hashed123'),
+            '{"username": "EXISTING", "email": "new@example.com", "password": "x"}',
+            '{"username": "Alice", "email": "alice2@example.com", "password": "x"}',
+            '{"username": "", "email": "nobody@example.com"}',
+            '{"username": "carol", "email": "carol@example.com", "birth_date": "1990-02-03"}',
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+            f.write('\n'.join(rows))
+
+        out = StringIO()
+        # per batch: 2 existence lookups, then User + UserInfo INSERTs in a transaction (savepoint here)
+        with self.assertNumQueries(14):
+            call_command('import_users', f.name, '--batch-size', '2', '--workers', '1', stdout=out, stderr=StringIO())
+        self.assertIn('Created 3 user(s), skipped 2 existing, 1 invalid', out.getvalue())
+
+        alice = User.objects.get(username='alice')
+        self.assertTrue(alice.check_password('secret123'))
+        self.assertTrue(alice.tc)
+        self.assertEqual(alice.info.bio, 'Hi')
+        self.assertTrue(User.objects.get(username='bob').check_password('hashed123'))
+        carol = User.objects.get(username='carol')
+        self.assertFalse(carol.has_usable_password())
+        self.assertEqual(carol.info.birth_date, date(1990, 2, 3))
+        self.assertEqual(UserInfo.objects.count(), User.objects.count())
+
+    def test_username_equal_to_another_email_is_not_a_duplicate(self):
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+
+        User.objects.create_user(username='taken@example.com', email='first@example.com', password='pass')
+        rows = [
+            '{"username": "dave", "email": "taken@example.com"}',  # an existing username, as an email
+            '{"username": "erin@example.com", "email": "erin2@example.com"}',
+            '{"username": "frank", "email": "erin@example.com"}',  # the row above's username, as an email
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+            f.write('\n'.join(rows))
+
+        out = StringIO()
+        call_command('import_users', f.name, '--workers', '1', stdout=out, stderr=StringIO())
+        self.assertIn('Created 3 user(s), skipped 0 existing', out.getvalue())
+
+
+class UserExportTestCase(APITestCase):
+    """Test cases for the streaming data export"""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from posts.models import ArchivedPost, Post
+        from social.models import Follow
+
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pass123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pass123')
+        self.carol = User.objects.create_user(username='carol', email='carol@example.com', password='pass123')
+        now = timezone.now()
+        self.posts = []
+        for i in range(3):
+            post = Post.objects.create(author=self.user, content=f'Post {i}, with "quotes"\nand a newline')
+            Post.objects.filter(pk=post.pk).update(created_at=now - timedelta(hours=3 - i))
+            self.posts.append(post.pk)
+        ArchivedPost.objects.create(id=self.posts[0] + 100, author=self.user, content='Archived',
+                                    created_at=now - timedelta(days=400))
+        Follow.objects.create(follower=self.bob, following=self.user)
+        Follow.objects.create(follower=self.user, following=self.carol)
+        Post.objects.create(author=self.bob, content='Not exported')
+        self.client.force_authenticate(user=self.user)
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_filename_is_encoded(self):
+        self.client.force_authenticate(user=User.objects.create_user(username='zoë', email='zoe@example.com'))
+        response = self.client.get(reverse('export'))
+        self.assertEqual(response['Content-Disposition'], "attachment; filename*=utf-8''zo%C3%AB.ndjson")
+
+    @override_settings(USER_EXPORT_CHUNK_SIZE=2)
+    def test_ndjson_export(self):
+        import json
+        response = self.client.get(reverse('export'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertIn('filename="alice.ndjson"', response['Content-Disposition'])
+        # one query per section however many chunks are fetched: hot posts, archived posts, followers, following
+        with self.assertNumQueries(4):
+            records = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([(r['type'], r['id']) for r in records], [
+            ('post', self.posts[2]), ('post', self.posts[1]), ('post', self.posts[0]),
+            ('post', self.posts[0] + 100), ('follower', self.bob.pk), ('following', self.carol.pk),
+        ])
+        self.assertEqual(records[0]['content'], 'Post 2, with "quotes"\nand a newline')
+        self.assertEqual(records[4]['username'], 'bob')
+
+    def test_csv_export(self):
+        import csv
+        from io import StringIO
+        response = self.client.get(reverse('export') + '?format=csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(StringIO(self.content(response), newline='')))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['content'], 'Post 2, with "quotes"\nand a newline')
+        self.assertEqual(rows[5], {'type': 'following', 'id': str(self.carol.pk), 'username': 'carol',
+                                   'content': '', 'created_at': rows[5]['created_at']})
+
+    def test_empty_csv_export_has_a_header(self):
+        self.client.force_authenticate(user=User.objects.create_user(
+            username='dave', email='dave@example.com', password='pass123'))
+        response = self.client.get(reverse('export'), HTTP_ACCEPT='text/csv')
+        self.assertEqual(self.content(response), 'type,id,username,content,created_at\r\n')
+
+    def test_export_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('export'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get(reverse('export') + '?format=xml').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_user_command(self):
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command, CommandError
+
+        out = StringIO()
+        call_command('export_user', 'alice', stdout=out, stderr=StringIO())
+        self.assertEqual(out.getvalue(), self.content(self.client.get(reverse('export'))))
+
+        with tempfile.NamedTemporaryFile(suffix='.csv') as f:
+            call_command('export_user', str(self.user.pk), '--format', 'csv', '--output', f.name,
+                         '--chunk-size', '1', stdout=StringIO(), stderr=StringIO())
+            self.assertEqual(f.read().decode(), self.content(self.client.get(reverse('export') + '?format=csv')))
+        with self.assertRaises(CommandError):
+            call_command('export_user', 'nobody', stdout=StringIO(), stderr=StringIO())
+
+
 class TokenTestCase(TestCase):
     """Test cases for token generation helper function"""
 
@@ -400,3 +824,60 @@ class TokenTestCase(TestCase):
         self.assertIsInstance(tokens['access'], str)
         self.assertTrue(len(tokens['refresh']) > 0)
         self.assertTrue(len(tokens['access']) > 0)
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+    """Test cases for the cached and stateless JWT user resolution"""
+
+    def setUp(self):
+        from accounts.cache import user_cache
+
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            username='cacheduser',
+            email='cached@example.com',
+            password='cachedpass123'
+        )
+        self.access_token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        self.profile_url = reverse('profile')
+
+    def _user_queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [q['sql'] for q in ctx.captured_queries if 'FROM "accounts_user"' in q['sql']]
+
+    def test_user_is_resolved_from_cache_after_first_request(self):
+        """Test the second request does not select the user again"""
+        self.assertEqual(len(self._user_queries(self.profile_url)), 1)
+        self.assertEqual(self._user_queries(self.profile_url), [])
+
+    def test_cache_invalidated_when_user_saved(self):
+        """Test saving the user drops the cached copy"""
+        self.client.get(self.profile_url)
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(self.profile_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_user_is_a_fresh_instance(self):
+        """Test requests don't share one mutable user object"""
+        from accounts.authentication import CachedJWTAuthentication
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        auth = CachedJWTAuthentication()
+        token = AccessToken(self.access_token)
+        first, second = auth.get_user(token), auth.get_user(token)
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.username, 'cacheduser')
+
+    @override_settings(JWT_STATELESS_READS=True)
+    def test_stateless_reads_skip_user_table(self):
+        """Test opted-in read-only views build the user from token claims"""
+        self.assertEqual(self._user_queries(reverse('feed')), [])
@@ -0,0 +1,23 @@
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.blacklist import blacklist_filter
+
+
+def is_blacklisted(jti):
+    """Whether the token with this jti is blacklisted; only the filter's "maybe" queries the table."""
+    return blacklist_filter.might_contain(jti) and BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+class FilteredRefreshToken(RefreshToken):
+    """RefreshToken whose blacklist check consults the in-process Bloom filter first."""
+
+    def check_blacklist(self):
+        if blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted
@@ -1,11 +1,16 @@
 from django.urls import path
+from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 
-from accounts.views import RegisterUserView, LoginUserView, LogoutView, UserProfileView, UserDetailView
+from accounts.views import RegisterUserView, LoginUserView, LogoutView, UserProfileView, UserDetailView, \
+    UserExportView
 
 urlpatterns = [
     path('register/', RegisterUserView.as_view(), name='register'),
     path('login/', LoginUserView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('token/verify/', TokenVerifyView.as_view(), name='token-verify'),
     path('profile/', UserProfileView.as_view(), name='profile'),
     path('users/<int:pk>/', UserDetailView.as_view(), name='detail'),
+    path('export/', UserExportView.as_view(), name='export'),
 ]
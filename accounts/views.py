@@ -1,4 +1,6 @@
 from django.contrib.auth import authenticate
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
 
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
@@ -6,9 +8,13 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from accounts import export
 from accounts.models import User
 from accounts.serializers import UserRegistrationSerializer, UserLoginSerializer, UserLogoutSerializer, \
     UserProfileSerializer, UserDetailSerializer, UserInfoSerializer
+from socialapi.caching import ConditionalCacheMixin
+from socialapi.renderers import CSVRenderer, NDJSONRenderer
+from socialapi.routers import ReplicaReadMixin
 
 
 def get_tokens_for_user(user):
@@ -36,21 +42,15 @@ class LoginUserView(APIView):
         serializer = UserLoginSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        serializer = UserLoginSerializer(data=request.data)
-        if serializer.is_valid():
-            username = serializer.validated_data['username']
-            password = serializer.validated_data['password']
-            user = authenticate(username=username, password=password)
-            if user is None:
-                return Response({'errors': {'non_field_errors': ['Email or Password is not Valid']}},
-                                status=status.HTTP_404_NOT_FOUND)
-            else:
-                token = get_tokens_for_user(user)
-                return Response(
-                    {'token': token, 'msg': 'Login Success'}, status=status.HTTP_200_OK)
-        return Response(data={
-            "Message": "Bad credentials"
-        }, status=status.HTTP_400_BAD_REQUEST)
+        username = serializer.validated_data['username']
+        password = serializer.validated_data['password']
+        user = authenticate(username=username, password=password)
+        if user is None:
+            return Response({'errors': {'non_field_errors': ['Email or Password is not Valid']}},
+                            status=status.HTTP_404_NOT_FOUND)
+        token = get_tokens_for_user(user)
+        return Response(
+            {'token': token, 'msg': 'Login Success'}, status=status.HTTP_200_OK)
 
 
 class LogoutView(APIView):
@@ -61,8 +61,7 @@ class LogoutView(APIView):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         try:
-            refresh_token = serializer.validated_data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = serializer.validated_data["token"]
             token.blacklist()
             return Response(
                 {"detail": "Successfully logged out."},
@@ -75,7 +74,7 @@ class LogoutView(APIView):
             )
 
 
-class UserProfileView(generics.RetrieveAPIView, generics.UpdateAPIView):
+class UserProfileView(ReplicaReadMixin, generics.RetrieveAPIView, generics.UpdateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserProfileSerializer
 
@@ -86,13 +85,30 @@ class UserProfileView(generics.RetrieveAPIView, generics.UpdateAPIView):
         print(request.data)
         user = getattr(self.request, "user", None)
         user_info = user.info
-        serializer = UserInfoSerializer(user_info, data=request.data, partial=True)
+        serializer = UserInfoSerializer(user_info, data=request.data, partial=True,
+                                        context=self.get_serializer_context())
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class UserDetailView(generics.RetrieveAPIView):
+class UserDetailView(ReplicaReadMixin, ConditionalCacheMixin, generics.RetrieveAPIView):
     serializer_class = UserDetailSerializer
     lookup_field = 'pk'
-    queryset = User.objects.get_queryset()
+    queryset = User.objects.select_related('info')
+    # profile fields, counters, embedded recent posts
+    cache_resources = ('user:{pk}', 'user-counts:{pk}', 'user-posts:{pk}')
+
+
+class UserExportView(APIView):  # (GET) - stream the user's posts, followers and following, ?format=ndjson|csv
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+
+    def get(self, request):
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(export.stream(request.user, renderer),
+                                         content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['Content-Disposition'] = content_disposition_header(
+            True, f'{request.user.username}.{renderer.format}',
+        )
+        return response
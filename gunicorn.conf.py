@@ -0,0 +1,40 @@
+"""
+Production serving profile.
+
+    gunicorn -c gunicorn.conf.py socialapi.wsgi            # threaded WSGI workers
+    GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker \\
+        gunicorn -c gunicorn.conf.py socialapi.asgi        # ASGI, for the async views
+
+Each worker process keeps its own database connections: one persistent
+connection per thread (DB_CONN_MAX_AGE), or with DB_POOL a psycopg pool
+shared by all threads of the process. Size DB_POOL_MAX_SIZE to about
+GUNICORN_THREADS, and keep workers * pool size under PostgreSQL's
+max_connections.
+
+Under ASGI persistent connections are off (socialapi.asgi), as Django
+requires, so every request connects anew unless DB_POOL=True: set it
+for the UvicornWorker profile.
+"""
+import multiprocessing
+
+from decouple import config
+
+bind = config('GUNICORN_BIND', default='0.0.0.0:8000')
+workers = config('WEB_CONCURRENCY', default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+worker_class = config('GUNICORN_WORKER_CLASS', default='gthread')
+threads = config('GUNICORN_THREADS', default=4, cast=int)
+timeout = config('GUNICORN_TIMEOUT', default=30, cast=int)
+keepalive = config('GUNICORN_KEEPALIVE', default=5, cast=int)
+# recycle workers now and then; jitter keeps them from restarting together
+max_requests = config('GUNICORN_MAX_REQUESTS', default=10000, cast=int)
+max_requests_jitter = config('GUNICORN_MAX_REQUESTS_JITTER', default=1000, cast=int)
+accesslog = '-'
+
+# the app (and so any connection or pool) must be created in each worker, not
+# inherited across fork
+preload_app = False
+
+
+def post_fork(server, worker):
+    from django.db import connections
+    connections.close_all()
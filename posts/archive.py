@@ -0,0 +1,74 @@
+"""
+Hot/cold tiers for posts.
+
+Posts older than POST_HOT_WINDOW_DAYS are moved from Post (hot) to
+ArchivedPost (cold) by `manage.py archive_posts`, oldest first, so at any
+moment every archived post sorts before every hot one in (created_at, id)
+order. A newest-first listing can therefore read the hot table alone and
+only continue into the archive once a page runs past the oldest hot row
+(and, paging backwards, the other way round). HotColdPosts does that for
+the post list views; HomeFeed uses hot_then_cold() for the feed.
+
+The archive is read-only: post detail falls back to it for GET only.
+Archiving leaves UserInfo.posts_count alone (archived posts still count).
+"""
+from posts.models import ArchivedPost, Post
+from socialapi.pagination import estimate_count, keyset_filter
+
+
+def hot_then_cold(seek_hot, seek_cold, position, reverse, limit):
+    """Rows from the hot tier, continued from the cold tier when it runs out (the other way when reversed)."""
+    first, second = (seek_cold, seek_hot) if reverse else (seek_hot, seek_cold)
+    rows = first(position, reverse, limit)
+    if len(rows) < limit:
+        rows += second(position, reverse, limit - len(rows))
+    return rows
+
+
+async def ahot_then_cold(seek_hot, seek_cold, position, reverse, limit):
+    first, second = (seek_cold, seek_hot) if reverse else (seek_hot, seek_cold)
+    rows = await first(position, reverse, limit)
+    if len(rows) < limit:
+        rows += await second(position, reverse, limit - len(rows))
+    return rows
+
+
+class HotColdPosts:
+    """
+    A hot and a cold queryset with the same filters, paged as one for
+    KeysetPagination (seek/aseek). `rows` turns each queryset into the
+    rows to return, e.g. posts.serializers.post_rows.
+    """
+
+    def __init__(self, hot, cold, rows=None):
+        self.hot = rows(hot) if rows else hot
+        self.cold = rows(cold) if rows else cold
+
+    @classmethod
+    def filter(cls, rows=None, **filters):
+        return cls(Post.objects.filter(**filters), ArchivedPost.objects.filter(**filters), rows)
+
+    def count(self):
+        return self.hot.count() + self.cold.count()
+
+    def estimate(self):
+        return estimate_count(self.hot) + estimate_count(self.cold)
+
+    @staticmethod
+    def _seeker(queryset):
+        def seek(position, reverse, limit):
+            return list(keyset_filter(queryset, position, reverse)[:limit])
+        return seek
+
+    @staticmethod
+    def _aseeker(queryset):
+        async def seek(position, reverse, limit):
+            return [row async for row in keyset_filter(queryset, position, reverse)[:limit]]
+        return seek
+
+    def seek(self, position, reverse, limit):
+        return hot_then_cold(self._seeker(self.hot), self._seeker(self.cold), position, reverse, limit)
+
+    async def aseek(self, position, reverse, limit):
+        return await ahot_then_cold(self._aseeker(self.hot), self._aseeker(self.cold), position, reverse, limit)
+
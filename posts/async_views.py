@@ -0,0 +1,40 @@
+from rest_framework.exceptions import NotFound
+
+from posts.archive import HotColdPosts
+from posts.models import ArchivedPost, Post
+from posts.serializers import post_data, post_rows, user_post_data, user_post_rows
+from posts.timeline import TimelinePosts
+from socialapi.async_views import AsyncAPIView
+from socialapi.pagination import KeysetPagination
+
+
+class AsyncPostListView(AsyncAPIView):  # (GET) async version of PostListCreateView's list
+    pagination_class = KeysetPagination
+
+    async def get(self, request, *args, **kwargs):
+        user = await self.authenticate(request)
+        hot, cold = Post.objects.all(), ArchivedPost.objects.all()
+        if user is not None:
+            hot, cold = hot.exclude(author_id=user.id), cold.exclude(author_id=user.id)
+        posts = TimelinePosts(HotColdPosts(hot, cold, rows=post_rows), user and user.id)
+        return await self.paginate(posts, request, post_data)
+
+
+class AsyncPostDetailView(AsyncAPIView):  # (GET) async version of PostDetailView's retrieve
+    async def get(self, request, *args, **kwargs):
+        await self.authenticate(request)
+        row = await post_rows(Post.objects.all()).filter(pk=kwargs['pk']).afirst()
+        if row is None:
+            row = await post_rows(ArchivedPost.objects.all()).filter(pk=kwargs['pk']).afirst()
+        if row is None:
+            raise NotFound('No Post matches the given query.')
+        return self.render(post_data([row])[0])
+
+
+class AsyncUserPostsView(AsyncAPIView):  # (GET) async version of UserPostsView
+    pagination_class = KeysetPagination
+
+    async def get(self, request, *args, **kwargs):
+        await self.authenticate(request)
+        posts = HotColdPosts.filter(rows=user_post_rows, author_id=kwargs['pk'])
+        return await self.paginate(posts, request, user_post_data)
@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import timeline
+from posts.models import ArchivedPost, Post
+from social.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = ('Move posts older than the hot window (POST_HOT_WINDOW_DAYS) to the archive table, '
+            'oldest first, in short transactions.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='hot window in days (default: POST_HOT_WINDOW_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between batches to leave room for live traffic.')
+        parser.add_argument('--dry-run', action='store_true', help='Report how many posts would move.')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.POST_HOT_WINDOW_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+        # oldest first, so every archived post always sorts before every hot one (posts.archive)
+        aged = Post.objects.filter(created_at__lt=cutoff).order_by('created_at', 'id')
+
+        if options['dry_run']:
+            self.stdout.write(f'Would archive {aged.count()} post(s) created before {cutoff.isoformat()}.')
+            return
+
+        moved = 0
+        while True:
+            with transaction.atomic():
+                batch = list(aged.select_for_update().values('id', 'author_id', 'content', 'created_at')
+                             [:options['batch_size']])
+                if not batch:
+                    break
+                ids = [row['id'] for row in batch]
+                ArchivedPost.objects.bulk_create([ArchivedPost(**row) for row in batch])
+                # raw deletes: no post_delete, so posts_count and the response cache are left alone
+                # (an archived post still counts and renders the same); its inbox entries go with it
+                entries = FeedEntry.objects.filter(post_id__in=ids)
+                entries._raw_delete(entries.db)
+                posts = Post.objects.filter(id__in=ids)
+                posts._raw_delete(posts.db)
+            moved += len(batch)
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        if moved:
+            timeline.invalidate()  # the raw deletes sent no post_delete
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} post(s) created before {cutoff.isoformat()}.'))
@@ -0,0 +1,95 @@
+import asyncio
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from posts.models import Post
+
+ROUTES = (
+    ('post list', '/api/posts/', '/api/posts/async/'),
+    ('post detail', '/api/posts/{post}/', '/api/posts/async/{post}/'),
+    ('user posts', '/api/posts/user/{author}/', '/api/posts/async/user/{author}/'),
+    ('feed', '/api/social/feed/', '/api/social/feed/async/'),
+)
+
+
+async def asgi_get(application, path, headers):
+    """One GET through the ASGI application, as an ASGI server would make it; returns the status."""
+    sent = {}
+    done = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            sent['status'] = message['status']
+        elif not message.get('more_body'):
+            done.set()
+
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'headers': [(b'host', b'localhost')] + headers,
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+    await application(scope, receive, send)
+    return sent.get('status')
+
+
+class Command(BaseCommand):
+    help = 'Throughput and latency of the sync and async read views under socialapi.asgi at a given concurrency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=500, help='requests per route and view kind')
+        parser.add_argument('--user', type=int, help='id of the user whose feed is read (default: first user)')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(pk=options['user']).first() if options['user'] else User.objects.first()
+        post = Post.objects.order_by('-id').first()
+        if user is None or post is None:
+            raise CommandError('Needs at least one user and one post in the database.')
+        token = str(RefreshToken.for_user(user).access_token)
+        headers = [(b'authorization', f'Bearer {token}'.encode())]
+
+        from socialapi.asgi import application
+        for name, sync_path, async_path in ROUTES:
+            for kind, path in (('sync', sync_path), ('async', async_path)):
+                path = path.format(post=post.pk, author=post.author_id)
+                rate, p50, p95, errors = asyncio.run(
+                    self.run(application, path, headers, options['concurrency'], options['requests'])
+                )
+                self.stdout.write(
+                    f'{name:12} {kind:5} {rate:8.0f} req/s  p50 {p50 * 1000:7.1f} ms  '
+                    f'p95 {p95 * 1000:7.1f} ms  errors {errors}'
+                )
+
+    async def run(self, application, path, headers, concurrency, total):
+        latencies, errors = [], 0
+        remaining = iter(range(total))
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                start = time.perf_counter()
+                status = await asgi_get(application, path, headers)
+                latencies.append(time.perf_counter() - start)
+                errors += status != 200
+
+        await asgi_get(application, path, headers)  # warm up
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return total / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95)], errors
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = ('Time a minimal query per simulated request with per-request connections, '
+            'persistent connections and the configured settings (e.g. DB_POOL).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        configured = connection.settings_dict['CONN_MAX_AGE']
+        pooled = 'pool' in connection.settings_dict.get('OPTIONS', {})
+        profiles = [
+            ('configured' + (' (pool)' if pooled else f' (CONN_MAX_AGE={configured})'), configured),
+        ]
+        if not pooled:
+            profiles = [('per-request connections (CONN_MAX_AGE=0)', 0),
+                        ('persistent (CONN_MAX_AGE=None)', None)] + profiles
+
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(count)
+        try:
+            for label, max_age in profiles:
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = max_age
+                opened.clear()
+                start = time.perf_counter()
+                for _ in range(options['requests']):
+                    # the same connection handling as a real request: closed or kept on request_finished
+                    request_started.send(sender=self.__class__)
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                    request_finished.send(sender=self.__class__)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'{label:45} {elapsed / options["requests"] * 1000:7.3f} ms/request  '
+                    f'{opened.count(connection.alias)} ' + ('pool checkouts' if pooled else 'connections opened')
+                )
+        finally:
+            connection_created.disconnect(count)
+            connection.settings_dict['CONN_MAX_AGE'] = configured
+            connection.close()
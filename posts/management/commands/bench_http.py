@@ -0,0 +1,259 @@
+import json
+import re
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import URLResolver, get_resolver
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from posts.models import Post
+
+
+def url_routes(patterns=None, prefix='', namespace=''):
+    """(name, route) of every URL pattern, e.g. ('posts:user-posts', 'api/posts/user/<int:pk>/')."""
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            inner = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            yield from url_routes(pattern.url_patterns, prefix + str(pattern.pattern), inner)
+        else:
+            yield f'{namespace}{pattern.name}', prefix + str(pattern.pattern)
+
+
+def percentile(ordered, fraction):
+    return ordered[max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))]
+
+
+class Fixture:
+    """The users, posts and tokens the requests are made with, read from the server's database."""
+
+    def __init__(self, user, password):
+        self.user = user
+        self.password = password
+        refresh = RefreshToken.for_user(user)
+        self.refresh = str(refresh)
+        self.token = str(refresh.access_token)
+        self.popular = User.objects.order_by('-info__followers_count').values_list('id', flat=True).first()
+        self.others = list(User.objects.exclude(pk=user.pk).order_by('id').values_list('id', flat=True)[:1000])
+        if not self.others:
+            raise CommandError('Needs at least two users; run seed_data first.')
+        self.post = Post.objects.order_by('-id').values_list('id', flat=True).first()
+        own = Post.objects.filter(author=user).values_list('id', flat=True).first()
+        self.own_post = own or Post.objects.create(author=user, content='bench_http').pk
+
+    def other(self, i):
+        return self.others[i % len(self.others)]
+
+    def several(self, i, count=20):
+        return [self.other(i * count + j) for j in range(count)]
+
+
+# (url name, method) -> i -> (path kwargs, query string, JSON body); every URL without an entry is a plain GET.
+# Bodies are built before the clock starts, so e.g. minting refresh tokens isn't timed.
+REQUESTS = {
+    ('register', 'POST'): lambda f, i: ({}, '', {
+        'username': f'bench{uuid.uuid4().hex[:12]}', 'email': f'bench{uuid.uuid4().hex[:12]}@example.com',
+        'password': f.password, 'password2': f.password, 'tc': True,
+    }),
+    ('login', 'POST'): lambda f, i: ({}, '', {'username': f.user.username, 'password': f.password}),
+    ('logout', 'POST'): lambda f, i: ({}, '', {'refresh': str(RefreshToken.for_user(f.user))}),
+    ('token-refresh', 'POST'): lambda f, i: ({}, '', {'refresh': f.refresh}),
+    ('token-verify', 'POST'): lambda f, i: ({}, '', {'token': f.refresh}),
+    ('profile', 'GET'): lambda f, i: ({}, '', None),
+    ('detail', 'GET'): lambda f, i: ({'pk': f.popular}, '', None),
+    ('posts:postsAll', 'GET'): lambda f, i: ({}, '', None),
+    ('posts:postsAll', 'POST'): lambda f, i: ({}, '', {'content': f'bench_http post {i}'}),
+    ('posts:post-batch', 'POST'): lambda f, i: ({}, '', [{'content': f'bench_http batch {i}.{j}'} for j in range(20)]),
+    ('posts:post-detail', 'GET'): lambda f, i: ({'pk': f.post}, '', None),
+    ('posts:post-detail', 'PATCH'): lambda f, i: ({'pk': f.own_post}, '', {'content': f'bench_http edit {i}'}),
+    ('posts:post-search', 'GET'): lambda f, i: ({}, 'q=coffee', None),
+    ('posts:user-posts', 'GET'): lambda f, i: ({'pk': f.popular}, '', None),
+    ('posts:async-post-detail', 'GET'): lambda f, i: ({'pk': f.post}, '', None),
+    ('posts:async-user-posts', 'GET'): lambda f, i: ({'pk': f.popular}, '', None),
+    ('follow-user', 'POST'): lambda f, i: ({'pk': f.other(i)}, '', None),
+    ('unfollow-user', 'DELETE'): lambda f, i: ({'pk': f.other(i)}, '', None),
+    ('bulk-follow', 'POST'): lambda f, i: ({}, '', {'user_ids': f.several(i)}),
+    ('bulk-unfollow', 'POST'): lambda f, i: ({}, '', {'user_ids': f.several(i)}),
+}
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+OK = range(200, 300)
+EXPECTED = {  # besides 2xx
+    ('unfollow-user', 'DELETE'): {400},  # wasn't following
+}
+
+
+class Command(BaseCommand):
+    help = ('HTTP load test of every URL in socialapi.urls against a running server (runserver, gunicorn, ...) '
+            'that uses this database. Prints one JSON document with throughput and p50/p95/p99 latency per '
+            'endpoint, to keep and compare across commits with --compare.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=8, help='client threads per endpoint')
+        parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5, help='untimed requests per endpoint first')
+        parser.add_argument('--user', help='username to make requests as (default: the first seeded user)')
+        parser.add_argument('--password', default='seedpass123', help="that user's password, for login")
+        parser.add_argument('--include', help='only endpoints whose "METHOD name" matches this regex')
+        parser.add_argument('--exclude', default=r'\badmin:', help='skip endpoints matching this regex')
+        parser.add_argument('--read-only', action='store_true', help='skip POST/PUT/PATCH/DELETE endpoints')
+        parser.add_argument('--output', help='write the JSON here instead of stdout')
+        parser.add_argument('--compare', help='JSON from an earlier run, to print the change per endpoint')
+
+    def handle(self, *args, **options):
+        user = (User.objects.filter(username=options['user']) if options['user']
+                else User.objects.filter(username__startswith='seed').order_by('id')).first() or User.objects.first()
+        if user is None:
+            raise CommandError('No users in the database; run seed_data first.')
+        fixture = Fixture(user, options['password'])
+
+        parts = urlsplit(options['base_url'])
+        self.connection_class = HTTPSConnection if parts.scheme == 'https' else HTTPConnection
+        self.netloc, self.base_path = parts.netloc, parts.path.rstrip('/')
+        self.headers = {'Authorization': f'Bearer {fixture.token}', 'Content-Type': 'application/json'}
+
+        results = []
+        for name, method, route in self.endpoints(options):
+            spec = REQUESTS.get((name, method), lambda f, i: ({}, '', None))
+            total = options['warmup'] + options['requests']
+            try:
+                requests = [self.build(route, *spec(fixture, i)) for i in range(total)]
+            except KeyError as e:
+                self.stderr.write(f'skipped {method} {name}: no value for URL parameter {e}')
+                continue
+            result = self.run(name, method, route, requests, options)
+            results.append(result)
+            self.stderr.write(
+                f'{method:6} {name:28} {result["rps"]:8.1f} req/s  p50 {result["p50_ms"]:7.1f}  '
+                f'p95 {result["p95_ms"]:7.1f}  p99 {result["p99_ms"]:7.1f} ms  errors {result["errors"]}'
+            )
+
+        report = {
+            'commit': self.commit(),
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'base_url': options['base_url'],
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def endpoints(self, options):
+        include = re.compile(options['include']) if options['include'] else None
+        exclude = re.compile(options['exclude']) if options['exclude'] else None
+        for name, route in url_routes():
+            methods = sorted({method for (spec_name, method) in REQUESTS if spec_name == name} or {'GET'})
+            for method in methods:
+                label = f'{method} {name}'
+                if (include and not include.search(label)) or (exclude and exclude.search(label)):
+                    continue
+                if options['read_only'] and method in WRITE_METHODS:
+                    continue
+                yield name, method, route
+
+    def build(self, route, kwargs, query, body):
+        path = re.sub(r'<(?:\w+:)?(\w+)>', lambda match: str(kwargs[match.group(1)]), route)
+        path = f'{self.base_path}/{path}' + (f'?{query}' if query else '')
+        return path, None if body is None else json.dumps(body).encode()
+
+    def run(self, name, method, route, requests, options):
+        warmup, timed = requests[:options['warmup']], iter(requests[options['warmup']:])
+        lock = threading.Lock()
+        latencies, statuses = [], {}
+        expected = EXPECTED.get((name, method), set())
+
+        def client(requests, record):
+            connection = self.connection_class(self.netloc, timeout=30)
+            try:
+                for path, body in requests:
+                    started = time.perf_counter()
+                    try:
+                        connection.request(method, path, body=body, headers=self.headers)
+                        response = connection.getresponse()
+                        response.read()
+                        status = response.status
+                    except (OSError, ValueError):
+                        connection.close()
+                        status = 0  # connection failed
+                    if record:
+                        elapsed = time.perf_counter() - started
+                        with lock:
+                            latencies.append(elapsed)
+                            statuses[status] = statuses.get(status, 0) + 1
+            finally:
+                connection.close()
+
+        client(warmup, record=False)
+        # each thread takes the next request from the shared iterator
+        shared = _Locked(timed)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            for _ in range(options['concurrency']):
+                pool.submit(client, shared, True)
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        errors = sum(count for status, count in statuses.items() if status not in OK and status not in expected)
+        return {
+            'name': name,
+            'method': method,
+            'route': '/' + route,
+            'requests': len(latencies),
+            'errors': errors,
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        }
+
+    def commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def compare(self, path, results):
+        with open(path) as f:
+            previous = json.load(f)
+        before = {(row['method'], row['name']): row for row in previous['endpoints']}
+        self.stderr.write(f'\nchange since {previous.get("commit") or path}:')
+        for row in results:
+            old = before.get((row['method'], row['name']))
+            if not old or not old['rps'] or not old['p95_ms']:
+                continue
+            self.stderr.write(
+                f'{row["method"]:6} {row["name"]:28} rps {(row["rps"] / old["rps"] - 1) * 100:+6.1f}%  '
+                f'p95 {(row["p95_ms"] / old["p95_ms"] - 1) * 100:+6.1f}%'
+            )
+
+
+class _Locked:
+    """An iterator several threads can take items from."""
+
+    def __init__(self, iterator):
+        self.iterator = iterator
+        self.lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self.lock:
+            return next(self.iterator)
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import User
+from posts.models import Post
+from posts.serializers import PostSerializer, post_data, post_rows
+from socialapi.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of the serializer path and the values_list fast path for post lists.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='posts per rendered list')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with transaction.atomic():
+            # sample posts are created with bulk_create (no fan-out or counters) and rolled back
+            author = User.objects.create_user(username='bench-post-lists', email='bench@example.com')
+            Post.objects.bulk_create(Post(author=author, content=f'Benchmark post {i} ' * 8) for i in range(rows))
+            queryset = Post.objects.filter(author=author).order_by('-created_at', '-id')
+
+            def serializer_path():
+                return JSONRenderer().render(PostSerializer(queryset.select_related('author')[:rows], many=True).data)
+
+            def fast_path():
+                return FastJSONRenderer().render(post_data(post_rows(queryset)[:rows]))
+
+            if serializer_path() != fast_path():
+                self.stderr.write('outputs differ')
+            for name, path in (('serializer', serializer_path), ('fast', fast_path)):
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    path()
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'{name}: {rows * repeat / elapsed:,.0f} rows/sec')
+            transaction.set_rollback(True)
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from posts import search
+
+
+def forwards(apps, schema_editor):
+    search.install(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    search.uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+    # PostgreSQL: generated tsvector column + GIN index; SQLite: FTS5 table + triggers (see posts.search)
+
+    dependencies = [
+        ('posts', '0002_post_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
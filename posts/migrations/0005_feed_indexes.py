@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from posts import search
+
+
+def reinstall_sqlite_fts(apps, schema_editor):
+    # SQLite rebuilds posts_post to drop the author_id index, which drops the FTS triggers
+    if schema_editor.connection.vendor == 'sqlite':
+        search.install_sqlite_fts(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_archivedpost'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # reinstalls the triggers when unapplied; reversed operations run bottom-up
+        migrations.RunPython(migrations.RunPython.noop, reinstall_sqlite_fts),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='posts_post_author_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='archivedpost',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_posts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(reinstall_sqlite_fts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from posts import search
+
+
+def forwards(apps, schema_editor):
+    search.install(schema_editor, 'posts_archivedpost')
+
+
+def backwards(apps, schema_editor):
+    search.uninstall(schema_editor, 'posts_archivedpost')
+
+
+class Migration(migrations.Migration):
+    # the archive is searched too: the same index as posts_post's (see posts.search)
+
+    dependencies = [
+        ('posts', '0005_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -1,10 +1,92 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
 
+from accounts import counters
 from accounts.models import User
+from posts import timeline
+from socialapi.caching import bump_versions
 
 
 # Create your models here.
 class Post(models.Model):
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
+    # db_index=False: posts_post_author_created_idx starts with author_id
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts', db_index=False)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # keyset pagination order for the public post list (socialapi.pagination)
+            models.Index(fields=['-created_at', '-id'], name='posts_post_created_idx'),
+            # one author's posts in the same order: user posts, pulled feed authors, follow backfill
+            models.Index(fields=['author', '-created_at', '-id'], name='posts_post_author_created_idx'),
+        ]
+
+
+class ArchivedPost(models.Model):
+    """
+    Cold tier of Post: rows older than POST_HOT_WINDOW_DAYS, moved here by
+    archive_posts with their ids unchanged. Read-only; see posts.archive.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_posts', db_index=False)
+    content = models.TextField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='posts_archived_created_idx'),
+            models.Index(fields=['author', '-created_at', '-id'], name='posts_archived_author_idx'),
+        ]
+
+
+# bulk_create sends no post_save: whoever bulk-creates posts sends this once for the batch,
+# with posts=[Post, ...], so counters, cache versions and feed fan-out run once per batch
+posts_created = Signal()
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, **kwargs):
+    if created:
+        counters.posts_created([instance.author_id])
+    bump_versions(f'post:{instance.pk}', f'user-posts:{instance.author_id}')
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.posts_deleted([instance.author_id])
+    bump_versions(f'post:{instance.pk}', f'user-posts:{instance.author_id}')
+
+
+@receiver(posts_created, sender=Post)
+def count_created_posts(sender, posts, **kwargs):
+    counters.posts_created([post.author_id for post in posts])
+    bump_versions(*(f'post:{post.pk}' for post in posts), *{f'user-posts:{post.author_id}' for post in posts})
+
+
+# the global timeline buffer behind the first page of the public post list (posts.timeline)
+
+@receiver(post_save, sender=Post)
+def update_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.add([instance])
+    else:
+        timeline.replace(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_timeline(sender, instance, **kwargs):
+    timeline.remove([instance.pk])
+
+
+@receiver(posts_created, sender=Post)
+def add_to_timeline(sender, posts, **kwargs):
+    timeline.add(posts)
+
+
+@receiver(post_save, sender=User)
+def rename_in_timeline(sender, instance, created, **kwargs):
+    if not created:
+        timeline.rename(instance)
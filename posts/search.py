@@ -0,0 +1,200 @@
+"""
+Full-text search over Post.content, in both tiers: posts_post and the
+archive, posts_archivedpost (see posts.archive).
+
+Each table's index lives outside the Django model and is maintained by the
+database itself, so every write path (save, bulk_create, update, delete,
+archive_posts moving rows) keeps it current:
+
+- PostgreSQL: a generated `search_vector` tsvector column with a GIN index;
+- SQLite: an external-content FTS5 table, <table>_fts, kept in sync by
+  triggers on the table.
+
+Other backends fall back to an unindexed icontains match. PostSearch pages
+through the matches of both tiers, merged and ordered by (rank, id), best
+first. On SQLite the bm25 rank is relative to each FTS5 table's own term
+statistics, so hot and archived matches interleave only roughly by
+relevance.
+
+On SQLite, a migration that rebuilds a searched table (most column changes
+do) drops its triggers; call install_sqlite_fts() again at the end of it.
+"""
+import heapq
+import re
+
+from collections import namedtuple
+from itertools import islice
+
+from django.db import connections, router
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from socialapi.pagination import keyset_filter
+
+SEARCH_CONFIG = 'english'
+
+SearchRow = namedtuple('SearchRow', ('id', 'author_id', 'author_username', 'content', 'created_at', 'rank'))
+
+def postgres_install(table):
+    return [
+        f"ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', coalesce(content, ''))) STORED",
+        f"CREATE INDEX {table}_search_idx ON {table} USING GIN (search_vector)",
+    ]
+
+
+def postgres_uninstall(table):
+    return [
+        f"DROP INDEX IF EXISTS {table}_search_idx",
+        f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector",
+    ]
+
+
+def sqlite_install(table):
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(content, content='{table}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF content ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content); "
+        f"INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def sqlite_uninstall(table):
+    fts = f'{table}_fts'
+    return [
+        f"DROP TRIGGER IF EXISTS {fts}_ai",
+        f"DROP TRIGGER IF EXISTS {fts}_ad",
+        f"DROP TRIGGER IF EXISTS {fts}_au",
+        f"DROP TABLE IF EXISTS {fts}",
+    ]
+
+
+def install_sqlite_fts(schema_editor, table='posts_post'):
+    for sql in sqlite_install(table):
+        schema_editor.execute(sql)
+
+
+def install(schema_editor, table='posts_post'):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in postgres_install(table):
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        install_sqlite_fts(schema_editor, table)
+
+
+def uninstall(schema_editor, table='posts_post'):
+    vendor = schema_editor.connection.vendor
+    for sql in {'postgresql': postgres_uninstall, 'sqlite': sqlite_uninstall}.get(vendor, lambda table: [])(table):
+        schema_editor.execute(sql)
+
+
+def terms(q):
+    """The words of a user query; punctuation and search operators are dropped."""
+    return re.findall(r'\w+', q)
+
+
+def _match(words):
+    # every word as a quoted FTS5 string, so input can't be read as query syntax
+    return ' '.join('"%s"' % word for word in words)
+
+
+def _merge(tiers, reverse, limit):
+    """The best `limit` of the tiers' rows, each tier already in (rank, id) order."""
+    merged = heapq.merge(*tiers, key=lambda row: (row.rank, row.id), reverse=not reverse)
+    return list(islice(merged, limit))
+
+
+class PostSearch:
+    """
+    Posts and archived posts matching every word of q, best match first, for
+    KeysetPagination: seek() returns post_rows() with an extra `rank`
+    (higher is better). Post ids are kept when archived, so (rank, id) is a
+    position in both tiers.
+    """
+
+    def __init__(self, q):
+        from posts.models import ArchivedPost, Post
+        self.words = terms(q)
+        self.models = (Post, ArchivedPost)
+        self.db = router.db_for_read(Post)
+        self.vendor = connections[self.db].vendor
+
+    def queryset(self, model):
+        """Matching rows of one tier annotated with `rank`; on SQLite the rank is computed per row, see seek()."""
+        queryset = model.objects.using(self.db)
+        table = model._meta.db_table
+
+        if self.vendor == 'postgresql':
+            tsquery = f"plainto_tsquery('{SEARCH_CONFIG}', %s)"
+            text = ' '.join(self.words)
+            return queryset.alias(
+                matched=RawSQL(f'{table}.search_vector @@ {tsquery}', [text], output_field=BooleanField()),
+            ).filter(matched=True).annotate(
+                rank=RawSQL(f'ts_rank_cd({table}.search_vector, {tsquery})', [text], output_field=FloatField()),
+            )
+
+        if self.vendor == 'sqlite':
+            match, fts = _match(self.words), f'{table}_fts'
+            return queryset.filter(
+                id__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [match]),
+            ).annotate(rank=RawSQL(
+                f'(SELECT -bm25({fts}) FROM {fts} WHERE {fts} MATCH %s AND {fts}.rowid = {table}.id)',
+                [match], output_field=FloatField(),
+            ))
+
+        condition = Q()
+        for word in self.words:
+            condition &= Q(content__icontains=word)
+        return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
+
+    def count(self):
+        return sum(self.queryset(model).count() for model in self.models)
+
+    def seek(self, position, reverse, limit):
+        from posts.serializers import post_rows
+        if self.vendor == 'sqlite':
+            return self._seek_fts5(position, reverse, limit)
+        tiers = [
+            keyset_filter(post_rows(self.queryset(model), 'rank'), position, reverse, fields=('rank', 'id'))[:limit]
+            for model in self.models
+        ]
+        return _merge(tiers, reverse, limit)
+
+    def _hits(self, position, reverse, limit):
+        """(rank, id, tier) of the next `limit` matches: one pass over each tier's FTS5 index, in one query."""
+        direction, op = ('ASC', '>') if reverse else ('DESC', '<')
+        selects, params = [], []
+        for tier, model in enumerate(self.models):
+            fts = f'{model._meta.db_table}_fts'
+            sql = f'SELECT -bm25({fts}) AS score, rowid, {tier} AS tier FROM {fts} WHERE {fts} MATCH %s'
+            params.append(_match(self.words))
+            if position is not None:
+                rank, pk = position
+                sql += f' AND (score {op} %s OR (score = %s AND rowid {op} %s))'
+                params += [rank, rank, pk]
+            selects.append(f'SELECT * FROM ({sql} ORDER BY score {direction}, rowid {direction} LIMIT %s)')
+            params.append(limit)
+        sql = ' UNION ALL '.join(selects) + f' ORDER BY score {direction}, rowid {direction} LIMIT %s'
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, [*params, limit])
+            return cursor.fetchall()
+
+    def _seek_fts5(self, position, reverse, limit):
+        # ranked in one pass over each FTS5 index, then one query per tier for the page's posts;
+        # a per-row rank subquery (queryset()) would re-run the match for every row
+        from posts.serializers import post_rows
+
+        hits = self._hits(position, reverse, limit)
+        posts = {}
+        for tier, model in enumerate(self.models):
+            ids = [pk for _, pk, hit_tier in hits if hit_tier == tier]
+            if ids:
+                posts.update((row.id, row) for row in post_rows(model.objects.using(self.db).filter(id__in=ids)))
+        return [SearchRow(*posts[pk], rank) for rank, pk, _ in hits if pk in posts]
@@ -1,7 +1,11 @@
+from collections import namedtuple
+
 from django.db.migrations import serializer
+from django.db.models import F
 from rest_framework import serializers
 
-from posts.models import Post
+from posts.models import Post, posts_created
+from socialapi.instrumentation import timed
 
 
 class PostSerializer(serializers.ModelSerializer):
@@ -16,18 +20,67 @@ class PostSerializer(serializers.ModelSerializer):
         return {'id': user.id, 'username': getattr(user, 'username', None)}
 
 
+class PostBatchSerializer(serializers.ListSerializer):
+    """PostCreateSerializer with many=True: every post is inserted by one bulk_create."""
+
+    def create(self, validated_data):
+        posts = Post.objects.bulk_create([Post(**attrs) for attrs in validated_data])
+        posts_created.send(sender=Post, posts=posts)
+        return posts
+
+
 class PostCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = ('content',)  # author will be set in the view
-
-    def create(self, validated_data):
-        print(validated_data)
-        # actual author is attached in view.perform_create
-        return super().create(validated_data)
+        list_serializer_class = PostBatchSerializer
 
 
 class UserPostsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = ['id', 'content', 'created_at']
+
+
+# Fast read path for post lists: rows fetched with values_list() and turned
+# into the same dicts PostSerializer / UserPostsSerializer would produce,
+# without building model instances or running the serializer fields per row.
+
+POST_ROW_FIELDS = ('id', 'author_id', 'author_username', 'content', 'created_at')
+USER_POST_ROW_FIELDS = ('id', 'content', 'created_at')
+PostRow = namedtuple('PostRow', POST_ROW_FIELDS)  # for rows built by hand, e.g. from FeedEntry
+
+_created_at_field = serializers.DateTimeField()
+
+
+def post_rows(queryset, *extra_fields):
+    """Named (id, author_id, author_username, content, created_at, *extra_fields) rows for post_data()."""
+    return queryset.annotate(author_username=F('author__username')).values_list(
+        *POST_ROW_FIELDS, *extra_fields, named=True,
+    )
+
+
+def post_data(rows):
+    """PostSerializer(rows, many=True).data, for rows from post_rows()."""
+    created_at = _created_at_field.to_representation
+    with timed('serialize'):
+        return [
+            {
+                'id': row.id,
+                'author': {'id': row.author_id, 'username': row.author_username},
+                'content': row.content,
+                'created_at': created_at(row.created_at),
+            }
+            for row in rows
+        ]
+
+
+def user_post_rows(queryset):
+    return queryset.values_list(*USER_POST_ROW_FIELDS, named=True)
+
+
+def user_post_data(rows):
+    """UserPostsSerializer(rows, many=True).data, for rows from user_post_rows()."""
+    created_at = _created_at_field.to_representation
+    with timed('serialize'):
+        return [{'id': row.id, 'content': row.content, 'created_at': created_at(row.created_at)} for row in rows]
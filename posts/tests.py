@@ -1,8 +1,13 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import LiveServerTestCase, TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from accounts.models import User
 from posts.models import Post
+from posts.serializers import PostSerializer, UserPostsSerializer
+from socialapi.renderers import FastJSONRenderer
+from socialapi.testing import QueryBudgetMixin, QueryPlanMixin, analyze
 
 
 class PostModelTests(TestCase):
@@ -63,6 +68,174 @@ class PostListCreateViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class PostBatchCreateTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='testpass123')
+        self.user2 = User.objects.create_user(username='user2', email='user2@example.com', password='testpass123')
+        self.user3 = User.objects.create_user(username='user3', email='user3@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user1)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_batch_is_created_with_one_insert(self):
+        from social.models import FeedEntry, Follow
+        Follow.objects.create(follower=self.user2, following=self.user1)
+        Follow.objects.create(follower=self.user3, following=self.user1)
+        payload = [{'content': f'Scheduled post {i} about otters'} for i in range(40)]
+        # INSERT posts, posts_count UPDATE, pull-author set, followers, INSERT feed entries
+        with self.assertQueryBudget(5, max_repeats=1):
+            response = self.client.post('/api/posts/batch/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.json()['results']
+        self.assertEqual([post['content'] for post in results], [item['content'] for item in payload])
+        self.assertEqual(results[0]['author'], {'id': self.user1.id, 'username': 'user1'})
+        self.assertEqual(sorted(post['id'] for post in results),
+                         list(Post.objects.filter(author=self.user1).order_by('id').values_list('id', flat=True)))
+
+        self.user1.info.refresh_from_db()
+        self.assertEqual(self.user1.info.posts_count, 40)
+        self.assertEqual(FeedEntry.objects.filter(user=self.user2).count(), 40)
+        self.assertEqual(FeedEntry.objects.filter(user=self.user3).count(), 40)
+        # the search index is kept by database triggers, which bulk inserts fire too
+        search = self.client.get('/api/posts/search/?q=otters').json()
+        self.assertEqual(len(search['results']), 20)
+        self.assertIsNotNone(search['next'])
+
+    def test_batch_invalidates_cached_user_posts(self):
+        self.client.post('/api/posts/', {'content': 'First'})
+        url = f'/api/posts/user/{self.user1.pk}/'
+        self.assertEqual(len(self.client.get(url).json()['results']), 1)
+        self.client.post('/api/posts/batch/', [{'content': 'Second'}, {'content': 'Third'}], format='json')
+        self.assertEqual(len(self.client.get(url).json()['results']), 3)
+
+    @override_settings(POST_BATCH_MAX=2)
+    def test_invalid_batches_create_nothing(self):
+        for payload in ([], [{'content': 'a'}] * 3, [{'content': 'ok'}, {'content': ''}], {'content': 'not a list'}):
+            response = self.client.post('/api/posts/batch/', payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, payload)
+        self.assertFalse(Post.objects.exists())
+
+        self.client.force_authenticate(user=None)
+        response = self.client.post('/api/posts/batch/', [{'content': 'a'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(POST_TIMELINE_SIZE=200)
+class TimelineTests(APITestCase):
+    """The first page of the public post list is served from the cached global timeline"""
+
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='testpass123')
+        self.user2 = User.objects.create_user(username='user2', email='user2@example.com', password='testpass123')
+        # user1 writes a third of the posts, user2 the rest
+        self.posts = [Post.objects.create(author=self.user2 if i % 3 else self.user1, content=f'Post {i}')
+                      for i in range(45)]
+
+    def tearDown(self):
+        cache.clear()
+
+    def without_timeline(self, url):
+        with override_settings(POST_TIMELINE_SIZE=0):
+            return self.client.get(url).json()
+
+    def assertServedFromTimeline(self, url='/api/posts/'):
+        self.client.get(url)  # builds the buffer if needed
+        with self.assertNumQueries(0):
+            response = self.client.get(url).json()
+        self.assertEqual(response, self.without_timeline(url))
+        return response
+
+    def test_first_page_needs_no_query(self):
+        response = self.assertServedFromTimeline()
+        self.assertEqual([p['id'] for p in response['results']], [p.id for p in reversed(self.posts)][:20])
+
+    def test_readers_own_posts_are_left_out_in_memory(self):
+        self.client.force_authenticate(user=self.user1)
+        response = self.assertServedFromTimeline()
+        self.assertEqual({p['author']['id'] for p in response['results']}, {self.user2.id})
+
+    def test_later_pages_and_short_buffers_read_the_database(self):
+        self.client.force_authenticate(user=self.user1)
+        first = self.client.get('/api/posts/').json()
+        with self.assertNumQueries(2):  # the rest of the hot table, then the archive
+            second = self.client.get(first['next']).json()
+        self.assertEqual(second, self.without_timeline(first['next']))
+
+        # a 12-post buffer holds only 4 posts of user1's, not a page for user2
+        self.client.force_authenticate(user=self.user2)
+        with override_settings(POST_TIMELINE_SIZE=12):
+            cache.clear()
+            self.client.get('/api/posts/')
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/posts/').json()
+        self.assertEqual(response, self.without_timeline('/api/posts/'))
+
+    def test_buffer_follows_creates_edits_and_deletes(self):
+        self.assertServedFromTimeline()
+        self.client.force_authenticate(user=self.user2)
+        created = self.client.post('/api/posts/', {'content': 'Brand new'})
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        self.client.post('/api/posts/batch/', [{'content': 'Batch 1'}, {'content': 'Batch 2'}], format='json')
+        self.client.patch(f'/api/posts/{self.posts[44].pk}/', {'content': 'Edited'})
+        self.client.force_authenticate(user=self.user1)
+        self.client.delete(f'/api/posts/{self.posts[42].pk}/')
+
+        self.client.force_authenticate(user=None)
+        response = self.assertServedFromTimeline()
+        contents = [p['content'] for p in response['results']]
+        self.assertEqual(contents[:4], ['Batch 2', 'Batch 1', 'Brand new', 'Edited'])
+        self.assertNotIn('Post 42', contents)
+
+    def test_username_change(self):
+        self.assertServedFromTimeline()
+        self.user2.username = 'renamed'
+        self.user2.save()
+        response = self.assertServedFromTimeline()
+        self.assertIn('renamed', {p['author']['username'] for p in response['results']})
+
+    def test_writer_without_the_lock_marks_the_buffer_stale(self):
+        from posts import timeline
+        self.assertServedFromTimeline()
+        cache.set(timeline.LOCK_KEY, 'someone else', 5)
+        timeline.LOCK_WAIT, wait = 0, timeline.LOCK_WAIT
+        try:
+            post = Post.objects.create(author=self.user2, content='Written while locked')
+        finally:
+            timeline.LOCK_WAIT = wait
+        self.assertIsNone(timeline.rows())  # stale, and the rebuild can't get the lock either
+        self.assertEqual(self.client.get('/api/posts/').json()['results'][0]['id'], post.pk)
+        cache.delete(timeline.LOCK_KEY)
+        response = self.assertServedFromTimeline()
+        self.assertEqual(response['results'][0]['id'], post.pk)
+
+    @override_settings(POST_TIMELINE_TTL_SECONDS=30)
+    def test_write_from_another_process_shows_up_after_expiry(self):
+        import time
+        from unittest import mock
+        self.assertServedFromTimeline()
+        # no signals: as if another server, or a script, had written it
+        hidden, = Post.objects.bulk_create([Post(author=self.user2, content='Written elsewhere')])
+        self.assertNotEqual(self.client.get('/api/posts/').json()['results'][0]['id'], hidden.pk)
+        # an update from this process doesn't extend the buffer's life
+        Post.objects.create(author=self.user2, content='Written here')
+
+        with mock.patch('time.time', return_value=time.time() + 31):
+            results = self.client.get('/api/posts/').json()['results']
+            self.assertEqual([p['content'] for p in results[:2]], ['Written here', 'Written elsewhere'])
+            self.assertServedFromTimeline()
+
+    def test_async_list_matches(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user1).access_token}')
+        expected = self.without_timeline('/api/posts/async/')
+        self.client.get('/api/posts/async/')
+        with self.assertNumQueries(0):  # the token's user is cached too
+            self.assertEqual(self.client.get('/api/posts/async/').json(), expected)
+
+
 class PostDetailViewTests(APITestCase):
     def setUp(self):
         self.client = APIClient()
@@ -118,3 +291,516 @@ class UserPostsViewTests(APITestCase):
         response = self.client.get(f'/api/posts/user/{self.user1.pk}/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 2)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            username='user1',
+            email='user1@example.com',
+            password='testpass123'
+        )
+        self.posts = [Post.objects.create(author=self.user1, content=f'Post {i}') for i in range(45)]
+
+    def test_walks_every_post_once_newest_first(self):
+        url = f'/api/posts/user/{self.user1.pk}/'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(post['id'] for post in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [post.id for post in reversed(self.posts)])
+
+    def test_previous_link_returns_preceding_page(self):
+        first = self.client.get('/api/posts/')
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(back.data['previous'])
+
+    def test_estimated_count_is_opt_in(self):
+        response = self.client.get('/api/posts/?count=estimate')
+        self.assertEqual(response.data['count'], 45)
+
+    def test_estimated_count_plans_each_tier(self):
+        from unittest import mock
+        from django.db.models import QuerySet
+        from posts import archive
+
+        for url in ('/api/posts/?count=estimate', f'/api/posts/user/{self.user1.pk}/?count=estimate'):
+            with mock.patch.object(archive, 'estimate_count', return_value=10) as estimate:
+                response = self.client.get(url)
+            self.assertEqual(response.data['count'], 20)
+            # the hot and the archive querysets, each planned rather than counted
+            self.assertEqual([type(call.args[0]) for call in estimate.call_args_list], [QuerySet, QuerySet])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/posts/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_key_of_the_wrong_type(self):
+        import base64
+        import json
+
+        def cursor(*values):
+            return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+        self.client.force_authenticate(user=self.user1)
+        urls = ['/api/posts/', f'/api/posts/user/{self.user1.pk}/', '/api/posts/async/',
+                '/api/social/feed/', '/api/social/followers/']
+        # numeric keys, a naive datetime, an id out of range
+        cursors = [cursor(5, 1, 0), cursor(1e308, 1, 0), cursor('2024-01-01T00:00:00', 1, 0),
+                   cursor('2024-01-01T00:00:00+00:00', 1e30, 0), cursor('2024-01-01T00:00:00+00:00', 2 ** 70, 0)]
+        for url in urls:
+            for value in cursors:
+                with self.subTest(url=url, cursor=value):
+                    response = self.client.get(url, {'cursor': value})
+                    self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/posts/', {'cursor': cursor('2024-01-01T00:00:00+00:00', 1, 0)})
+                         .status_code, status.HTTP_200_OK)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(
+            username='user1',
+            email='user1@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(author=self.user1, content='Cached content')
+        self.url = f'/api/posts/{self.post.pk}/'
+
+    def test_etag_revalidation_skips_the_database(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.json(), first.json())
+
+    def test_update_invalidates_cached_response(self):
+        first = self.client.get(self.url)
+        self.client.force_authenticate(user=self.user1)
+        self.client.put(self.url, {'content': 'Edited'})
+        self.client.force_authenticate(user=None)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['content'], 'Edited')
+
+    def test_change_within_the_same_second_is_modified(self):
+        from datetime import datetime, timezone as dt_timezone
+        from unittest import mock
+        from django.utils.http import parse_http_date
+        with mock.patch('socialapi.caching.datetime') as clock:
+            clock.now.return_value = datetime(2026, 1, 1, 12, 0, 0, 100000, tzinfo=dt_timezone.utc)
+            first = self.client.get(self.url)
+            self.post.content = 'Edited'
+            self.post.save()
+            clock.now.return_value = datetime(2026, 1, 1, 12, 0, 0, 900000, tzinfo=dt_timezone.utc)
+            response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['content'], 'Edited')
+        self.assertEqual(parse_http_date(response['Last-Modified']), parse_http_date(first['Last-Modified']) + 1)
+
+        # a matching ETag still wins over an If-Modified-Since that says otherwise
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'],
+                                   HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 1970 00:00:00 GMT')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_username_change_invalidates_post_detail(self):
+        self.client.get(self.url)
+        self.user1.username = 'renamed'
+        self.user1.save()
+        self.assertEqual(self.client.get(self.url).json()['author']['username'], 'renamed')
+
+    def test_new_post_invalidates_user_posts_list(self):
+        url = f'/api/posts/user/{self.user1.pk}/'
+        self.assertEqual(len(self.client.get(url).json()['results']), 1)
+        Post.objects.create(author=self.user1, content='Another')
+        self.assertEqual(len(self.client.get(url).json()['results']), 2)
+
+
+class FastReadPathTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='testpass123')
+        self.user2 = User.objects.create_user(username='us\u00e9r2', email='user2@example.com', password='testpass123')
+        for i in range(3):
+            Post.objects.create(author=self.user1, content=f'Post {i} \u2028 "quoted" \u00fcnicode')
+            Post.objects.create(author=self.user2, content=f'Other {i}')
+
+    def expected(self, serializer_class, queryset):
+        posts = queryset.order_by('-created_at', '-id')
+        return JSONRenderer().render(serializer_class(posts, many=True).data)
+
+    def results_bytes(self, response):
+        return FastJSONRenderer().render(response.json()['results'])
+
+    def test_post_list_matches_serializer_output(self):
+        response = self.client.get('/api/posts/')
+        self.assertEqual(self.results_bytes(response), self.expected(PostSerializer, Post.objects.all()))
+        self.assertIn(b'\\u2028', response.content)
+
+    def test_user_posts_match_serializer_output(self):
+        response = self.client.get(f'/api/posts/user/{self.user1.pk}/')
+        posts = Post.objects.filter(author=self.user1)
+        self.assertEqual(self.results_bytes(response), self.expected(UserPostsSerializer, posts))
+
+    def test_renderer_matches_json_renderer(self):
+        data = {'results': PostSerializer(Post.objects.all(), many=True).data, 'next': None, 'n': [1, True]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class AsyncPostViewsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='testpass123')
+        self.user2 = User.objects.create_user(username='user2', email='user2@example.com', password='testpass123')
+        for i in range(45):
+            Post.objects.create(author=self.user1 if i % 2 else self.user2, content=f'Post {i}')
+
+    def authorize(self, user):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def test_post_list_matches_sync_view(self):
+        self.authorize(self.user1)
+        sync = self.client.get('/api/posts/').json()
+        response = self.client.get('/api/posts/async/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'], sync['results'])
+        self.assertTrue(all(post['author']['id'] == self.user2.id for post in sync['results']))
+
+        next_page = self.client.get(response.json()['next']).json()
+        self.assertEqual(len(next_page['results']), 3)
+        self.assertIsNone(next_page['next'])
+
+    def test_user_posts_and_detail_match_sync_views(self):
+        url = f'/api/posts/user/{self.user1.pk}/'
+        async_url = f'/api/posts/async/user/{self.user1.pk}/'
+        self.assertEqual(self.client.get(async_url).json()['results'], self.client.get(url).json()['results'])
+
+        post = Post.objects.first()
+        self.assertEqual(self.client.get(f'/api/posts/async/{post.pk}/').json(),
+                         self.client.get(f'/api/posts/{post.pk}/').json())
+
+    def test_missing_post_and_bad_token(self):
+        response = self.client.get('/api/posts/async/999999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json(), {'detail': 'No Post matches the given query.'})
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        response = self.client.get('/api/posts/async/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+        self.assertIn('WWW-Authenticate', response)
+
+
+class PostSearchTests(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='testpass123')
+        self.url = '/api/posts/search/'
+        self.best = Post.objects.create(author=self.user1, content='django django django tips')
+        self.other = Post.objects.create(author=self.user1, content='Tips for baking bread')
+        self.weak = Post.objects.create(author=self.user1, content='A long post that mentions django once ' + 'filler ' * 50)
+
+    def test_ranked_matches(self):
+        response = self.client.get(self.url, {'q': 'Django'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.json()['results']], [self.best.id, self.weak.id])
+        self.assertEqual(response.json()['results'][0]['author'], {'id': self.user1.id, 'username': 'user1'})
+
+        response = self.client.get(self.url, {'q': 'django tips'})
+        self.assertEqual([p['id'] for p in response.json()['results']], [self.best.id])
+
+    def test_index_follows_writes(self):
+        Post.objects.bulk_create([Post(author=self.user1, content='bulk created sourdough')])
+        self.other.content = 'Now about sourdough'
+        self.other.save()
+        self.best.delete()
+        found = {p['content'] for p in self.client.get(self.url, {'q': 'sourdough'}).json()['results']}
+        self.assertEqual(found, {'bulk created sourdough', 'Now about sourdough'})
+        self.assertEqual(len(self.client.get(self.url, {'q': 'bread'}).json()['results']), 0)
+        self.assertEqual(len(self.client.get(self.url, {'q': 'django'}).json()['results']), 1)
+
+    def test_cursor_pagination_walks_all_matches(self):
+        for i in range(25):
+            Post.objects.create(author=self.user1, content=f'match {"word " * (i % 4 + 1)} number {i}')
+        seen, url, params = [], self.url, {'q': 'word'}
+        while url:
+            page = self.client.get(url, params).json()
+            seen.extend(p['id'] for p in page['results'])
+            url, params = page['next'], None
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_archived_posts_are_searchable(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        old = [Post.objects.create(author=self.user1, content=f'old django note {i}') for i in range(12)]
+        Post.objects.filter(pk__in=[post.pk for post in old]).update(created_at=timezone.now() - timedelta(days=365))
+        call_command('archive_posts', '--days', '90', stdout=StringIO())
+
+        found = self.client.get(self.url, {'q': 'note'}).json()
+        self.assertEqual(sorted(p['id'] for p in found['results']), sorted(post.pk for post in old))
+        from unittest import mock
+        from posts.views import SearchPagination
+        seen, url, params = [], self.url, {'q': 'django'}
+        with mock.patch.object(SearchPagination, 'page_size', 4):
+            while url:
+                page = self.client.get(url, params).json()
+                seen.extend(p['id'] for p in page['results'])
+                url, params = page['next'], None
+        # hot and archived matches, each once
+        self.assertEqual(sorted(seen), sorted([self.best.pk, self.weak.pk] + [post.pk for post in old]))
+        self.assertEqual(seen[0], self.best.pk)
+
+    def test_cursor_with_a_datetime_key(self):
+        import base64
+        cursor = base64.urlsafe_b64encode(b'["2024-01-01T00:00:00+00:00",1,0]').decode().rstrip('=')
+        response = self.client.get(self.url, {'q': 'django', 'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        cursor = base64.urlsafe_b64encode(b'[NaN,1,0]').decode().rstrip('=')
+        response = self.client.get(self.url, {'q': 'django', 'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.client.get(self.url, {'q': '"django" OR NEAR(*'}).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url, {'q': '  !! '}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PostArchiveTests(APITestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='testpass123')
+        self.posts = [Post.objects.create(author=self.user1, content=f'Post {i}') for i in range(45)]
+        # the 30 oldest fall outside a 90 day hot window
+        now = timezone.now()
+        for i, post in enumerate(self.posts):
+            Post.objects.filter(pk=post.pk).update(created_at=now - timedelta(days=200 - i if i < 30 else 45 - i))
+
+    def tearDown(self):
+        cache.clear()
+
+    def archive(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('archive_posts', '--days', '90', '--batch-size', '7', stdout=out)
+        return out.getvalue()
+
+    def walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            page = response.json()
+            seen.extend(post['id'] for post in page['results'])
+            url = page['next']
+        return seen
+
+    def test_moves_aged_posts_and_keeps_counters(self):
+        from posts.models import ArchivedPost
+        before = self.client.get(f'/api/posts/{self.posts[0].pk}/').json()
+
+        self.assertIn('Archived 30 post(s)', self.archive())
+        self.assertEqual(Post.objects.count(), 15)
+        self.assertEqual(ArchivedPost.objects.count(), 30)
+        self.assertEqual(Post.objects.order_by('created_at').first(), self.posts[30])
+        self.user1.info.refresh_from_db()
+        self.assertEqual(self.user1.info.posts_count, 45)
+        self.assertIn('Archived 0 post(s)', self.archive())
+
+        cache.clear()
+        response = self.client.get(f'/api/posts/{self.posts[0].pk}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), before)
+
+    def test_lists_continue_into_the_archive(self):
+        self.archive()
+        expected = [post.id for post in reversed(self.posts)]
+        self.assertEqual(self.walk(f'/api/posts/user/{self.user1.pk}/'), expected)
+        self.assertEqual(self.walk('/api/posts/'), expected)
+        self.assertEqual(self.walk(f'/api/posts/async/user/{self.user1.pk}/'), expected)
+
+        last = self.client.get('/api/posts/')
+        while last.data['next']:
+            last = self.client.get(last.data['next'])
+        back = self.client.get(last.data['previous'])
+        self.assertEqual([p['id'] for p in back.data['results']], expected[20:40])
+
+    def test_archived_posts_are_read_only(self):
+        self.archive()
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.delete(f'/api/posts/{self.posts[0].pk}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reconcile_counts_archived_posts(self):
+        from io import StringIO
+        from django.core.management import call_command
+        self.archive()
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('fixed 0', out.getvalue())
+
+
+class PostQueryPlanTests(QueryPlanMixin, TestCase):
+    """The post list queries stay index seeks as the tables grow"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from datetime import timedelta
+        from django.utils import timezone
+        from posts.models import ArchivedPost
+
+        users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com', password='!') for i in range(200)
+        ])
+        Post.objects.bulk_create([Post(author=users[i % 200], content=f'Post {i}') for i in range(5000)])
+        long_ago = timezone.now() - timedelta(days=365)
+        ArchivedPost.objects.bulk_create([
+            ArchivedPost(id=100000 + i, author=users[i % 200], content=f'Old {i}', created_at=long_ago)
+            for i in range(2000)
+        ])
+        analyze()
+        cls.author = users[7]
+        cls.position = (timezone.now(), 2500)
+
+    def test_post_list(self):
+        from posts.serializers import post_rows
+        from socialapi.pagination import keyset_filter
+        for position in (None, self.position):
+            page = keyset_filter(post_rows(Post.objects.all()), position)[:21]
+            self.assertUsesIndex(page, 'posts_post_created_idx')
+
+    def test_user_posts(self):
+        from posts.models import ArchivedPost
+        from posts.serializers import user_post_rows
+        from socialapi.pagination import keyset_filter
+        for position in (None, self.position):
+            page = keyset_filter(user_post_rows(Post.objects.filter(author_id=self.author.id)), position)[:21]
+            self.assertUsesIndex(page, 'posts_post_author_created_idx')
+            archived = keyset_filter(user_post_rows(ArchivedPost.objects.filter(author_id=self.author.id)), position)
+            self.assertUsesIndex(archived[:21], 'posts_archived_author_idx')
+
+
+class PostQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Post endpoints run a fixed number of queries, however many rows they return"""
+
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(10)
+        ]
+        self.posts = [Post.objects.create(author=self.users[i % 10], content=f'Post {i} about cats') for i in range(30)]
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_post_list_and_search(self):
+        for url in ('/api/posts/', '/api/posts/async/', '/api/posts/search/?q=cats'):
+            with self.assertQueryBudget(2):
+                response = self.client.get(url)
+            self.assertEqual(len(response.json()['results']), 20)
+
+    def test_user_posts_and_detail(self):
+        author = self.users[3]
+        with self.assertQueryBudget(2):
+            response = self.client.get(f'/api/posts/user/{author.pk}/')
+        self.assertEqual(len(response.json()['results']), 3)
+        with self.assertQueryBudget(1):
+            self.client.get(f'/api/posts/{self.posts[0].pk}/')
+
+
+@override_settings(SERVER_TIMING=True)
+class ServerTimingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='testpass123')
+        Post.objects.create(author=self.user1, content='Hello')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_header_reports_queries_and_phases(self):
+        import re
+        response = self.client.get(f'/api/posts/user/{self.user1.pk}/')
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries"')
+        for name in ('view', 'serialize', 'render', 'total'):
+            self.assertRegex(timing, rf'\b{name};dur=[\d.]+')
+        self.assertNotIn('nplus1', timing)
+        # served from the response cache: no queries at all
+        self.assertIn('desc="0 queries"', self.client.get(f'/api/posts/user/{self.user1.pk}/')['Server-Timing'])
+        self.assertTrue(re.search(r'db;dur=[\d.]+;desc="\d+ queries"',
+                                  self.client.get('/api/posts/async/')['Server-Timing']))
+
+    def test_serialize_is_timed_at_the_renderer(self):
+        from rest_framework.serializers import BaseSerializer
+        data = BaseSerializer.__dict__['data']
+        self.client.force_authenticate(user=self.user1)
+        # a serializer-backed view: its renderer's encoding is the serialize phase
+        timing = self.client.get('/api/user/profile/')['Server-Timing']
+        self.assertRegex(timing, r'\bserialize;dur=[\d.]+')
+        self.assertIs(BaseSerializer.__dict__['data'], data)  # DRF itself is left alone
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=3)
+    def test_repeated_queries_are_flagged(self):
+        from django.http import JsonResponse
+        from django.test import RequestFactory
+        from socialapi.instrumentation import ServerTimingMiddleware, query_shape
+
+        def view(request):
+            return JsonResponse({'authors': [post.author.username for post in Post.objects.all()]})
+
+        for i in range(3):
+            Post.objects.create(author=User.objects.create_user(
+                username=f'author{i}', email=f'author{i}@example.com', password='x'), content='Hi')
+        with self.assertLogs('socialapi.instrumentation', 'WARNING') as logs:
+            response = ServerTimingMiddleware(view)(RequestFactory().get('/n-plus-one/'))
+        self.assertIn('nplus1;desc="1 repeated query shapes"', response['Server-Timing'])
+        self.assertIn('Possible N+1: 4 x SELECT', logs.output[0])
+        self.assertIn('/n-plus-one/', logs.output[0])
+
+        self.assertEqual(query_shape('SELECT 1 WHERE id IN (%s, %s, %s)'), query_shape('SELECT 1 WHERE id IN (%s, %s)'))
+
+
+class BenchHttpCommandTests(LiveServerTestCase):
+    def test_every_url_is_requested(self):
+        import json
+        from io import StringIO
+        from django.core.management import call_command
+        from posts.management.commands.bench_http import url_routes
+
+        users = [User.objects.create_user(username=f'seed{i}', email=f'seed{i}@example.com', password='seedpass123')
+                 for i in range(3)]
+        Post.objects.create(author=users[1], content='coffee time')
+
+        out = StringIO()
+        call_command('bench_http', '--base-url', self.live_server_url, '--requests', '2', '--warmup', '0',
+                     '--concurrency', '1', stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        requested = {row['name'] for row in report['endpoints']}
+        self.assertEqual(requested, {name for name, _ in url_routes() if not name.startswith('admin:')})
+        for row in report['endpoints']:
+            self.assertEqual(row['errors'], 0, row)
+            self.assertEqual(row['requests'], 2)
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
@@ -0,0 +1,223 @@
+"""
+Global timeline: the newest POST_TIMELINE_SIZE posts, kept in the shared cache.
+
+The first page of the public post list (GET /api/posts/ and its async
+version) is the same for every reader except for the reader's own posts,
+so it is served from one cached list of post rows instead of a query: the
+reader's posts are dropped in memory, and the buffer is used only if it
+still holds more than a page after that. Requests with a cursor, and first
+pages the buffer can't fill, read HotColdPosts through its indexes as before.
+
+The buffer is always the newest rows of posts_post, in (created_at, id)
+order. The receivers in posts.models keep it that way as posts are
+created, edited and deleted, each change under a cache lock so concurrent
+writers don't lose each other's updates. A writer that can't get the lock
+in time marks the buffer stale instead, as do commands that write posts
+without signals (invalidate()), and the next reader rebuilds it.
+
+Writes that reach neither (another deployment's, or straight to the
+database) stay hidden until the buffer expires: it is rebuilt at least
+every POST_TIMELINE_TTL_SECONDS, and updates keep its expiry. The buffer
+needs a cache every server process shares, so settings turn it off
+without one (SHARED_CACHE).
+"""
+import time
+import uuid
+from contextlib import contextmanager
+from itertools import islice
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+
+BUFFER_KEY = 'posts:timeline'
+STALE_KEY = 'posts:timeline:stale'
+LOCK_KEY = 'posts:timeline:lock'
+LOCK_TIMEOUT = 5  # seconds; a crashed holder's lock expires
+LOCK_WAIT = 0.5  # seconds a writer waits for the lock before marking the buffer stale
+
+# buffered rows are plain tuples in POST_ROW_FIELDS order, which unpickle a few times faster
+# than namedtuples; only the rows of the page served become PostRows
+ID, AUTHOR_ID, AUTHOR_USERNAME = 0, 1, 2
+_sort_key = itemgetter(4, ID)  # (created_at, id)
+
+
+def _post_rows():
+    # posts.models imports this module for its signal receivers
+    from posts.models import Post
+    from posts.serializers import post_rows
+    # from the primary even in a request reading a replica: every reader shares the buffer
+    return post_rows(Post.objects.using(router.db_for_write(Post)).order_by('-created_at', '-id'))
+
+
+def _row(post):
+    return post.id, post.author_id, post.author.username, post.content, post.created_at
+
+
+@contextmanager
+def _locked(wait):
+    """Yields whether the lock was taken within `wait` seconds."""
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    while not cache.add(LOCK_KEY, token, LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            yield False
+            return
+        time.sleep(0.005)
+    try:
+        yield True
+    finally:
+        if cache.get(LOCK_KEY) == token:
+            cache.delete(LOCK_KEY)
+
+
+def rebuild():
+    """Reload the buffer from the database; returns its rows, or None if another process holds the lock."""
+    with _locked(wait=0) as locked:
+        if not locked:
+            return None
+        cache.delete(STALE_KEY)  # before reading, so a change made meanwhile marks it stale again
+        size = settings.POST_TIMELINE_SIZE
+        rows = [tuple(row) for row in _post_rows()[:size]]
+        # complete: every post is buffered, so new posts join it whatever their created_at
+        timeout = settings.POST_TIMELINE_TTL_SECONDS
+        buffer = {'rows': rows, 'complete': len(rows) < size, 'expires': time.time() + timeout}
+        cache.set(BUFFER_KEY, buffer, timeout=timeout)
+        return rows
+
+
+def invalidate():
+    """For writes that send no signals (raw SQL, _raw_delete): the next reader rebuilds the buffer."""
+    # outlives any buffer built before it
+    cache.set(STALE_KEY, True, timeout=settings.POST_TIMELINE_TTL_SECONDS)
+
+
+def rows():
+    """The buffered rows, newest first, or None when the buffer can't be used right now."""
+    if not settings.POST_TIMELINE_SIZE:
+        return None
+    found = cache.get_many([BUFFER_KEY, STALE_KEY])
+    if BUFFER_KEY in found and STALE_KEY not in found:
+        return found[BUFFER_KEY]['rows']
+    return rebuild()
+
+
+def _update(change):
+    if not settings.POST_TIMELINE_SIZE:
+        return
+    with _locked(wait=LOCK_WAIT) as locked:
+        if not locked:
+            invalidate()
+            return
+        buffer = cache.get(BUFFER_KEY)
+        if buffer is not None:  # otherwise the next reader builds it from the database
+            change(buffer)
+            # the rebuild's expiry: updates mustn't keep a buffer alive past it
+            timeout = buffer['expires'] - time.time()
+            if timeout > 0:
+                cache.set(BUFFER_KEY, buffer, timeout=timeout)
+            else:
+                cache.delete(BUFFER_KEY)
+
+
+def add(posts):
+    """New posts, e.g. from one bulk_create."""
+    new = [_row(post) for post in posts]
+
+    def change(buffer):
+        rows = buffer['rows']
+        if not buffer['complete'] and rows:
+            # posts older than the buffered ones may have unbuffered posts before them
+            oldest = _sort_key(rows[-1])
+            new_rows = [row for row in new if _sort_key(row) > oldest]
+        else:
+            new_rows = new
+        ids = {row[ID] for row in new_rows}
+        rows = sorted([row for row in rows if row[ID] not in ids] + new_rows, key=_sort_key, reverse=True)
+        size = settings.POST_TIMELINE_SIZE
+        buffer['complete'] = buffer['complete'] and len(rows) <= size
+        buffer['rows'] = rows[:size]
+
+    _update(change)
+
+
+def replace(post):
+    """An edited post; only its buffered row (if any) changes."""
+    row = _row(post)
+
+    def change(buffer):
+        if not any(old[ID] == row[ID] for old in buffer['rows']):
+            return
+        rows = [row if old[ID] == row[ID] else old for old in buffer['rows']]
+        buffer['rows'] = sorted(rows, key=_sort_key, reverse=True)
+
+    _update(change)
+
+
+def remove(post_ids):
+    post_ids = set(post_ids)
+
+    def change(buffer):
+        buffer['rows'] = [row for row in buffer['rows'] if row[ID] not in post_ids]
+
+    _update(change)
+
+
+def rename(user):
+    """A user's username changed: the buffered rows of their posts carry the old one."""
+    if not settings.POST_TIMELINE_SIZE:
+        return
+    buffer = cache.get(BUFFER_KEY)
+    if buffer is None or not any(
+            row[AUTHOR_ID] == user.pk and row[AUTHOR_USERNAME] != user.username for row in buffer['rows']):
+        return
+
+    def change(buffer):
+        buffer['rows'] = [(*row[:AUTHOR_USERNAME], user.username, *row[AUTHOR_USERNAME + 1:])
+                          if row[AUTHOR_ID] == user.pk else row for row in buffer['rows']]
+
+    _update(change)
+
+
+class TimelinePosts:
+    """
+    The public post list for KeysetPagination: HotColdPosts of post rows,
+    with the first page read from the buffer. `reader_id` is the signed-in
+    reader, whose own posts the list leaves out.
+    """
+
+    def __init__(self, posts, reader_id=None):
+        self.posts = posts
+        self.reader_id = reader_id
+
+    def count(self):
+        return self.posts.count()
+
+    def estimate(self):
+        return self.posts.estimate()
+
+    def first_page(self, limit):
+        buffered = rows()
+        if buffered is None:
+            return None
+        from posts.serializers import PostRow
+        others = (row for row in buffered if row[AUTHOR_ID] != self.reader_id)
+        page = [PostRow(*row) for row in islice(others, limit)]
+        # a short page might continue past the buffer or into the archive
+        return page if len(page) == limit else None
+
+    def seek(self, position, reverse, limit):
+        if position is None and not reverse:
+            page = self.first_page(limit)
+            if page is not None:
+                return page
+        return self.posts.seek(position, reverse, limit)
+
+    async def aseek(self, position, reverse, limit):
+        if position is None and not reverse:
+            page = await sync_to_async(self.first_page)(limit)
+            if page is not None:
+                return page
+        return await self.posts.aseek(position, reverse, limit)
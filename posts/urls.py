@@ -1,11 +1,17 @@
 from django.urls import path
 
-from posts.views import PostListCreateView, PostDetailView, UserPostsView
+from posts.async_views import AsyncPostListView, AsyncPostDetailView, AsyncUserPostsView
+from posts.views import PostListCreateView, PostBatchCreateView, PostDetailView, UserPostsView, PostSearchView
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', PostListCreateView.as_view(), name='postsAll'),
+    path('batch/', PostBatchCreateView.as_view(), name='post-batch'),
     path('<int:pk>/', PostDetailView.as_view(), name='post-detail'),
-    path('user/<int:pk>/', UserPostsView.as_view(), name='user-posts')
+    path('search/', PostSearchView.as_view(), name='post-search'),
+    path('user/<int:pk>/', UserPostsView.as_view(), name='user-posts'),
+    path('async/', AsyncPostListView.as_view(), name='async-postsAll'),
+    path('async/<int:pk>/', AsyncPostDetailView.as_view(), name='async-post-detail'),
+    path('async/user/<int:pk>/', AsyncUserPostsView.as_view(), name='async-user-posts'),
 ]
@@ -1,13 +1,28 @@
 from rest_framework.generics import RetrieveAPIView, ListCreateAPIView, ListAPIView, UpdateAPIView, DestroyAPIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.http import HttpResponseForbidden, HttpResponse
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework import status
+from django.conf import settings
+from django.http import HttpResponseForbidden, HttpResponse, Http404
+from django.shortcuts import get_object_or_404
 
-from posts.models import Post
-from posts.serializers import PostCreateSerializer, PostSerializer, UserPostsSerializer
+from posts.archive import HotColdPosts
+from posts.models import ArchivedPost, Post
+from posts.serializers import PostCreateSerializer, PostSerializer, UserPostsSerializer, post_data, post_rows, \
+    user_post_data, user_post_rows
+from posts.search import PostSearch, terms
+from posts.timeline import TimelinePosts
+from socialapi.caching import ConditionalCacheMixin
+from socialapi.pagination import KeysetPagination
+from socialapi.renderers import FastJSONRenderer
+from socialapi.routers import ReplicaReadMixin
 
 
-class PostListCreateView(ListCreateAPIView):
+class PostListCreateView(ReplicaReadMixin, ListCreateAPIView):
     queryset = Post.objects.all()
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     def get_permissions(self):
         if self.request.method == "POST":
@@ -18,7 +33,6 @@ class PostListCreateView(ListCreateAPIView):
     def get_queryset(self):
         qs = super().get_queryset()
         user = getattr(self.request, "user", None)
-        print(user)
         if self.request.method == "GET" and user and user.is_authenticated:
             return qs.exclude(author=user)
         return qs
@@ -28,14 +42,45 @@ class PostListCreateView(ListCreateAPIView):
             return PostCreateSerializer  # post serializer class and has authentication in here
         return PostSerializer
 
+    def list(self, request, *args, **kwargs):
+        # tuples straight to dicts, same output as PostSerializer (see posts.serializers.post_data);
+        # the archive is only read once a page runs past the oldest hot post (posts.archive)
+        archived = ArchivedPost.objects.all()
+        reader_id = None
+        if request.user and request.user.is_authenticated:
+            archived = archived.exclude(author=request.user)
+            reader_id = request.user.id
+        posts = HotColdPosts(self.filter_queryset(self.get_queryset()), archived, rows=post_rows)
+        # the first page comes from the cached global timeline when it can (posts.timeline)
+        page = self.paginate_queryset(TimelinePosts(posts, reader_id))
+        if page is None:
+            return Response(post_data([*posts.hot, *posts.cold]))
+        return self.get_paginated_response(post_data(page))
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)  # in perform create setting the author
 
 
-class PostDetailView(RetrieveAPIView, DestroyAPIView, UpdateAPIView):
+class PostBatchCreateView(APIView):  # (POST) - publish a list of posts at once, e.g. scheduling or migration clients
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = PostCreateSerializer(data=request.data, many=True, allow_empty=False,
+                                          max_length=settings.POST_BATCH_MAX)
+        serializer.is_valid(raise_exception=True)
+        # one bulk_create; counters, cache versions and feed fan-out run once for the batch (posts.models)
+        posts = serializer.save(author=request.user)
+        return Response({'results': PostSerializer(posts, many=True).data}, status=status.HTTP_201_CREATED)
+
+
+class PostDetailView(ReplicaReadMixin, ConditionalCacheMixin, RetrieveAPIView, DestroyAPIView, UpdateAPIView):
     serializer_class = PostSerializer
-    queryset = Post.objects.all()
+    queryset = Post.objects.select_related('author')
     lookup_field = 'pk'
+    cache_resources = ('post:{pk}',)
+
+    def get_cache_dependencies(self, data):
+        return [f"user:{data['author']['id']}"]  # for the embedded username
 
     def get_permissions(self):
         if self.request.method in ['DELETE', 'PUT', 'PATCH']:
@@ -43,6 +88,15 @@ class PostDetailView(RetrieveAPIView, DestroyAPIView, UpdateAPIView):
         else:
             return [AllowAny()]
 
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # posts past the hot window are served read-only from the archive
+            if self.request.method != 'GET':
+                raise
+            return get_object_or_404(ArchivedPost.objects.select_related('author'), pk=self.kwargs['pk'])
+
     def delete(self, request, *args, **kwargs):
         post = self.get_object()
         if post.author != request.user:
@@ -57,11 +111,40 @@ class PostDetailView(RetrieveAPIView, DestroyAPIView, UpdateAPIView):
         return super().update(request, *args, **kwargs)
 
 
-class UserPostsView(ListAPIView):
+class UserPostsView(ReplicaReadMixin, ConditionalCacheMixin, ListAPIView):
     serializer_class = UserPostsSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    cache_resources = ('user-posts:{pk}',)
 
     def get_queryset(self):
         user_id = self.kwargs.get('pk')
         return Post.objects.filter(
             author_id=user_id
-        ).select_related('author').order_by('-created_at')
+        ).order_by('-created_at')
+
+    def list(self, request, *args, **kwargs):
+        archived = ArchivedPost.objects.filter(author_id=self.kwargs.get('pk'))
+        posts = HotColdPosts(self.filter_queryset(self.get_queryset()), archived, rows=user_post_rows)
+        page = self.paginate_queryset(posts)
+        if page is None:
+            return Response(user_post_data([*posts.hot, *posts.cold]))
+        return self.get_paginated_response(user_post_data(page))
+
+
+class SearchPagination(KeysetPagination):
+    ordering_fields = ('rank', 'id')  # best match first
+    key_type = float
+
+
+class PostSearchView(ReplicaReadMixin, ListAPIView):  # (GET) ?q= full-text search, see posts.search
+    serializer_class = PostSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    pagination_class = SearchPagination
+    permission_classes = [AllowAny]
+
+    def list(self, request, *args, **kwargs):
+        q = request.query_params.get('q', '')
+        if not terms(q):
+            return Response({'q': ['This query parameter is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        page = self.paginate_queryset(PostSearch(q))
+        return self.get_paginated_response(post_data(page))
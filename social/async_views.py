@@ -0,0 +1,18 @@
+from social.feed import HomeFeed
+from social.ranking import RankedFeed
+from social.views import RankedFeedPagination, StandardResultsSetPagination, feed_ranking
+from posts.serializers import post_data
+from socialapi.async_views import AsyncAPIView
+
+
+class AsyncFeedView(AsyncAPIView):  # (GET) async version of FeedView
+    authentication_required = True
+    pagination_class = StandardResultsSetPagination
+
+    async def get(self, request, *args, **kwargs):
+        user = await self.authenticate(request)
+        if feed_ranking(request) == 'relevance':
+            self.pagination_class = RankedFeedPagination
+            return await self.paginate(RankedFeed(user), request, post_data)
+        feed = await HomeFeed.acreate(user, rows=True)
+        return await self.paginate(feed, request, post_data)
@@ -0,0 +1,269 @@
+"""
+Materialized home feed (fan-out on write).
+
+Every new post is copied into a FeedEntry row for each follower of its author,
+so reading a home feed is an index range scan over (user, created_at) instead
+of a join over everyone the user follows.
+
+Authors with more than FEED_FANOUT_MAX_FOLLOWERS followers are "pull" authors:
+their posts are not fanned out (that would be one INSERT per follower), and
+are merged into the feed at read time by HomeFeed instead.
+"""
+import heapq
+from functools import reduce
+from operator import attrgetter, or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from accounts.models import UserInfo
+from posts.archive import ahot_then_cold, hot_then_cold
+from posts.models import ArchivedPost, Post
+from posts.serializers import PostRow, post_rows
+from social import graph
+from socialapi.pagination import estimate_count, keyset_filter
+
+PULL_AUTHORS_CACHE_KEY = 'feed:pull-authors'
+PULL_AUTHORS_CACHE_TIMEOUT = 60
+# followed authors whose archive seeks are merged in one query
+ARCHIVE_SEEK_BATCH = 100
+
+
+def _feed_entry_model():
+    # social.models imports this module for its signal receivers
+    from social.models import FeedEntry
+    return FeedEntry
+
+
+def _follow_model():
+    from social.models import Follow
+    return Follow
+
+
+def pull_author_ids():
+    """Ids of authors whose posts are merged at read time rather than fanned out."""
+    ids = cache.get(PULL_AUTHORS_CACHE_KEY)
+    if ids is None:
+        ids = frozenset(
+            UserInfo.objects.filter(followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS)
+            .values_list('user_id', flat=True)
+        )
+        cache.set(PULL_AUTHORS_CACHE_KEY, ids, PULL_AUTHORS_CACHE_TIMEOUT)
+    return ids
+
+
+async def apull_author_ids():
+    ids = await cache.aget(PULL_AUTHORS_CACHE_KEY)
+    if ids is None:
+        query = UserInfo.objects.filter(followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS)
+        ids = frozenset([user_id async for user_id in query.values_list('user_id', flat=True)])
+        await cache.aset(PULL_AUTHORS_CACHE_KEY, ids, PULL_AUTHORS_CACHE_TIMEOUT)
+    return ids
+
+
+def is_pull_author(author_id):
+    return author_id in pull_author_ids()
+
+
+def _entry(post, follower_id):
+    FeedEntry = _feed_entry_model()
+    return FeedEntry(user_id=follower_id, post_id=post.id, author_id=post.author_id, created_at=post.created_at)
+
+
+def fan_out(posts):
+    """Push freshly created posts into the inboxes of their authors' followers."""
+    FeedEntry = _feed_entry_model()
+    Follow = _follow_model()
+    batch_size = settings.FEED_FANOUT_BATCH_SIZE
+
+    by_author = {}
+    for post in posts:
+        by_author.setdefault(post.author_id, []).append(post)
+
+    for author_id, author_posts in by_author.items():
+        if is_pull_author(author_id):
+            continue
+        follower_ids = Follow.objects.filter(following_id=author_id).values_list('follower_id', flat=True)
+        batch = []
+        for follower_id in follower_ids.iterator(chunk_size=batch_size):
+            batch.extend(_entry(post, follower_id) for post in author_posts)
+            if len(batch) >= batch_size:
+                FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill(follower_id, author_ids):
+    """Copy the recent posts of newly followed authors into the follower's inbox."""
+    pull_ids = pull_author_ids()
+    author_ids = [author_id for author_id in author_ids if author_id not in pull_ids]
+    if not author_ids:
+        return
+    FeedEntry = _feed_entry_model()
+    recent = Post.objects.filter(author_id__in=author_ids).annotate(
+        rank=Window(RowNumber(), partition_by=F('author_id'), order_by=[F('created_at').desc(), F('id').desc()]),
+    ).filter(rank__lte=settings.FEED_BACKFILL_LIMIT).only('id', 'author_id', 'created_at')
+    FeedEntry.objects.bulk_create([_entry(post, follower_id) for post in recent], ignore_conflicts=True)
+
+
+def purge(follower_id, author_ids):
+    """Drop unfollowed authors' posts from a former follower's inbox."""
+    _feed_entry_model().objects.filter(user_id=follower_id, author_id__in=author_ids).delete()
+
+
+class HomeFeed:
+    """
+    A user's home feed: their inbox merged with the posts of followed pull
+    authors, newest first.
+
+    Implements seek() and aseek() for KeysetPagination, reading at most `limit` rows from
+    each source per page however many accounts the user follows. Past the
+    inbox, the archive is read per followed author, `limit` rows apiece, and
+    merged. With rows=True, seek() returns post_rows() tuples instead of Post
+    instances.
+    """
+
+    def __init__(self, user, rows=False, pull_ids=None):
+        self.user = user
+        self.rows = rows
+        if pull_ids is None:
+            pull_ids = pull_author_ids()
+            if pull_ids:
+                pull_ids = graph.followed_among(user.id, pull_ids)
+        self.pull_ids = list(pull_ids)
+
+    @classmethod
+    async def acreate(cls, user, rows=False):
+        """HomeFeed(user, rows) with the followed pull authors looked up with the async ORM."""
+        pull_ids = await apull_author_ids()
+        if pull_ids:
+            pull_ids = await graph.afollowed_among(user.id, pull_ids)
+        return cls(user, rows, pull_ids=pull_ids)
+
+    def inbox(self):
+        return _feed_entry_model().objects.filter(user_id=self.user.id)
+
+    def pulled(self):
+        return Post.objects.filter(author_id__in=self.pull_ids)
+
+    def archived(self):
+        # inbox entries go when their post is archived; older posts come from here (posts.archive)
+        followed = _follow_model().objects.filter(follower_id=self.user.id).values('following_id')
+        return ArchivedPost.objects.filter(author_id__in=followed)
+
+    def followed_ids(self):
+        return _follow_model().objects.filter(follower_id=self.user.id).values_list('following_id', flat=True)
+
+    def count(self):
+        total = self.inbox().count() + self.archived().count()
+        if self.pull_ids:
+            total += self.pulled().count()
+        return total
+
+    def estimate(self):
+        total = estimate_count(self.inbox()) + estimate_count(self.archived())
+        if self.pull_ids:
+            total += estimate_count(self.pulled())
+        return total
+
+    def _inbox_page(self, position, reverse, limit):
+        """(queryset, function turning each of its rows into a post)"""
+        inbox = keyset_filter(self.inbox(), position, reverse, fields=('created_at', 'post_id'))
+        if self.rows:
+            fields = ('post_id', 'author_id', 'post__author__username', 'post__content', 'created_at')
+            return inbox.values_list(*fields)[:limit], PostRow._make
+        return inbox.select_related('post__author')[:limit], attrgetter('post')
+
+    def _pulled_page(self, position, reverse, limit):
+        pulled = keyset_filter(self.pulled(), position, reverse)
+        return (post_rows(pulled) if self.rows else pulled.select_related('author'))[:limit]
+
+    @staticmethod
+    def _archived_seeks(author_ids, position, reverse, limit):
+        """The next `limit` archived posts of each author: one index range scan apiece."""
+        return [
+            keyset_filter(ArchivedPost.objects.filter(author_id=author_id), position, reverse)[:limit]
+            for author_id in author_ids
+        ]
+
+    def _archived_keys(self, author_ids, position, reverse, limit):
+        """
+        Queries for the (created_at, id) of the next `limit` archived posts,
+        each merging the seeks of up to ARCHIVE_SEEK_BATCH followed authors.
+        """
+        ordering = ('created_at', 'id') if reverse else ('-created_at', '-id')
+        compound = connections[ArchivedPost.objects.db].features.supports_slicing_ordering_in_compound
+        queries = []
+        for start in range(0, len(author_ids), ARCHIVE_SEEK_BATCH):
+            seeks = self._archived_seeks(author_ids[start:start + ARCHIVE_SEEK_BATCH], position, reverse, limit)
+            if compound:
+                keys = [seek.values_list('created_at', 'id') for seek in seeks]
+                merged = keys[0].union(*keys[1:], all=True)
+            else:
+                # no LIMIT inside a UNION (SQLite): the same seeks as IN subqueries
+                merged = ArchivedPost.objects.filter(reduce(or_, (Q(id__in=seek.values('id')) for seek in seeks)))
+                merged = merged.values_list('created_at', 'id')
+            queries.append(merged.order_by(*ordering)[:limit])
+        return queries
+
+    def _archived_page(self, keys, reverse, limit):
+        keys = (heapq.nsmallest if reverse else heapq.nlargest)(limit, keys)
+        archived = keyset_filter(ArchivedPost.objects.filter(id__in=[pk for _, pk in keys]), None, reverse)
+        return post_rows(archived) if self.rows else archived.select_related('author')
+
+    def _merge(self, inbox_posts, pulled_posts, reverse, limit):
+        merged = heapq.merge(
+            inbox_posts, pulled_posts,
+            key=lambda post: (post.created_at, post.id), reverse=not reverse,
+        )
+        seen = set()
+        posts = []
+        for post in merged:
+            # a post can be in both sources if its author became a pull author
+            if post.id in seen:
+                continue
+            seen.add(post.id)
+            posts.append(post)
+            if len(posts) == limit:
+                break
+        return posts
+
+    def _seek_hot(self, position, reverse, limit):
+        inbox, to_post = self._inbox_page(position, reverse, limit)
+        inbox_posts = [to_post(entry) for entry in inbox]
+        if not self.pull_ids:
+            return inbox_posts
+        pulled_posts = list(self._pulled_page(position, reverse, limit))
+        return self._merge(inbox_posts, pulled_posts, reverse, limit)
+
+    def _seek_cold(self, position, reverse, limit):
+        author_ids = list(self.followed_ids())
+        keys = [key for query in self._archived_keys(author_ids, position, reverse, limit) for key in query]
+        if not keys:
+            return []
+        return list(self._archived_page(keys, reverse, limit))
+
+    def seek(self, position, reverse, limit):
+        return hot_then_cold(self._seek_hot, self._seek_cold, position, reverse, limit)
+
+    async def _aseek_hot(self, position, reverse, limit):
+        inbox, to_post = self._inbox_page(position, reverse, limit)
+        inbox_posts = [to_post(entry) async for entry in inbox]
+        if not self.pull_ids:
+            return inbox_posts
+        pulled_posts = [post async for post in self._pulled_page(position, reverse, limit)]
+        return self._merge(inbox_posts, pulled_posts, reverse, limit)
+
+    async def _aseek_cold(self, position, reverse, limit):
+        author_ids = [author_id async for author_id in self.followed_ids()]
+        keys = [key for query in self._archived_keys(author_ids, position, reverse, limit) async for key in query]
+        if not keys:
+            return []
+        return [post async for post in self._archived_page(keys, reverse, limit)]
+
+    async def aseek(self, position, reverse, limit):
+        return await ahot_then_cold(self._aseek_hot, self._aseek_cold, position, reverse, limit)
@@ -0,0 +1,311 @@
+"""
+Optional in-process index of the follow graph.
+
+Both directions of the graph are held in CSR form: for user u,
+`indices[indptr[u]:indptr[u + 1]]` is the sorted array of ids u follows
+(or is followed by). Lookups are array slices, and set operations such as
+mutual followers are sorted-array intersections, with no SQL involved.
+
+Follows made in this process are applied as small deltas on top of the CSR
+arrays (social.models.follows_created/follows_deleted). The index is
+rebuilt from the database, picking up follows made by other processes and
+folding the deltas in, every SOCIAL_GRAPH_INDEX_REBUILD_SECONDS or once
+there are SOCIAL_GRAPH_INDEX_COMPACT_EVERY deltas, by a background task
+(socialapi.background): no request builds it or waits for it.
+
+The read paths that can take an answer up to one rebuild interval stale
+use it through followed_among() and mutual_follows(), which fall back to a
+query while there is no index: the followed pull authors of the home feed
+(social.feed), the mutual-follow boost of the ranked feed (social.ranking)
+and the already-followed filter of suggestions. Use the ORM where a stale
+answer would be wrong (e.g. before writing).
+
+Enabled with SOCIAL_GRAPH_INDEX; if the arrays would exceed
+SOCIAL_GRAPH_INDEX_MAX_BYTES the index is not built and get_graph() returns
+None.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from socialapi.background import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+EMPTY = np.empty(0, dtype=np.int64)
+
+
+class CSR:
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_edges(cls, src, dst, n_nodes):
+        order = np.lexsort((dst, src))
+        src, dst = src[order], dst[order]
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n_nodes), out=indptr[1:])
+        return cls(indptr, dst)
+
+    @property
+    def n_nodes(self):
+        return len(self.indptr) - 1
+
+    def row(self, node):
+        if node < 0 or node >= self.n_nodes:
+            return EMPTY
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def edges(self):
+        src = np.repeat(np.arange(self.n_nodes, dtype=self.indices.dtype), np.diff(self.indptr))
+        return src, self.indices
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes
+
+
+def estimate_bytes(n_edges, max_id):
+    index_size = 4 if max_id < 2 ** 31 else 8
+    # two directions, each an indptr of int64 plus one index per edge
+    return 2 * ((max_id + 2) * 8 + n_edges * index_size)
+
+
+class FollowGraph:
+    def __init__(self, following, followers):
+        self._following = following  # u -> ids u follows
+        self._followers = followers  # u -> ids following u
+        self._added = {}    # (direction, u) -> set of ids, applied on top of the CSR rows
+        self._removed = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_edges(cls, src, dst):
+        max_id = int(max(src.max(initial=0), dst.max(initial=0)))
+        dtype = np.int32 if max_id < 2 ** 31 else np.int64
+        src, dst = src.astype(dtype, copy=False), dst.astype(dtype, copy=False)
+        n_nodes = max_id + 1
+        return cls(CSR.from_edges(src, dst, n_nodes), CSR.from_edges(dst, src, n_nodes))
+
+    @classmethod
+    def build(cls, max_bytes=None):
+        """Load the graph from Follow; returns None if it would exceed max_bytes."""
+        from django.db.models import Count, Max
+        from social.models import Follow
+
+        stats = Follow.objects.aggregate(n=Count('id'), a=Max('follower_id'), b=Max('following_id'))
+        max_id = max(stats['a'] or 0, stats['b'] or 0)
+        if max_bytes is not None and estimate_bytes(stats['n'], max_id) > max_bytes:
+            logger.warning('Follow graph index skipped: %d edges would need ~%d bytes (limit %d)',
+                           stats['n'], estimate_bytes(stats['n'], max_id), max_bytes)
+            return None
+
+        dtype = np.int32 if max_id < 2 ** 31 else np.int64
+        src = np.empty(stats['n'], dtype=dtype)
+        dst = np.empty(stats['n'], dtype=dtype)
+        n = 0
+        for follower_id, following_id in Follow.objects.values_list('follower_id', 'following_id') \
+                .order_by().iterator(chunk_size=10000):
+            if n == len(src):  # rows added since the count
+                src, dst = np.resize(src, n * 2 + 16), np.resize(dst, n * 2 + 16)
+            src[n], dst[n] = follower_id, following_id
+            n += 1
+        graph = cls.from_edges(src[:n], dst[:n])
+        logger.info('Follow graph index built: %d edges, %d bytes', n, graph.memory_usage())
+        return graph
+
+    # -- incremental updates ------------------------------------------------
+
+    def _apply(self, edges, add):
+        with self._lock:
+            for follower_id, following_id in edges:
+                for key, other in ((('out', follower_id), following_id), (('in', following_id), follower_id)):
+                    (self._removed if add else self._added).get(key, set()).discard(other)
+                    (self._added if add else self._removed).setdefault(key, set()).add(other)
+                self._pending += 1
+
+    def edges_added(self, edges):
+        self._apply(edges, add=True)
+
+    def edges_removed(self, edges):
+        self._apply(edges, add=False)
+
+    def _compact(self):
+        src, dst = self._following.edges()
+        src, dst = src.astype(np.int64), dst.astype(np.int64)
+        removed = [(u, v) for (direction, u), vs in self._removed.items() if direction == 'out' for v in vs]
+        added = [(u, v) for (direction, u), vs in self._added.items() if direction == 'out' for v in vs]
+        if removed:
+            width = int(max(src.max(initial=0), max(max(e) for e in removed))) + 1
+            keep = ~np.isin(src * width + dst, [u * width + v for u, v in removed])
+            src, dst = src[keep], dst[keep]
+        if added:
+            src = np.concatenate([src, np.array([u for u, _ in added], dtype=np.int64)])
+            dst = np.concatenate([dst, np.array([v for _, v in added], dtype=np.int64)])
+            # an added edge may already be in the base arrays
+            width = int(max(src.max(initial=0), dst.max(initial=0))) + 1
+            _, first = np.unique(src * width + dst, return_index=True)
+            src, dst = src[first], dst[first]
+        compacted = FollowGraph.from_edges(src, dst)
+        self._following, self._followers = compacted._following, compacted._followers
+        self._added, self._removed, self._pending = {}, {}, 0
+
+    # -- queries --------------------------------------------------------------
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def following_csr(self):
+        """The who-follows-whom CSR arrays, with any pending changes folded in (for batch jobs)."""
+        with self._lock:
+            if self._pending:
+                self._compact()
+            return self._following
+
+    def _row(self, direction, user_id):
+        with self._lock:
+            csr = self._following if direction == 'out' else self._followers
+            removed = list(self._removed.get((direction, user_id), ()))
+            added = list(self._added.get((direction, user_id), ()))
+        row = csr.row(user_id)
+        if removed:
+            row = row[~np.isin(row, removed)]
+        if added:
+            row = np.union1d(row, added)
+        return row
+
+    def following(self, user_id):
+        """Sorted array of the ids user_id follows."""
+        return self._row('out', user_id)
+
+    def followers(self, user_id):
+        """Sorted array of the ids following user_id."""
+        return self._row('in', user_id)
+
+    def is_following(self, user_id, target_ids):
+        """Boolean array: does user_id follow each of target_ids?"""
+        return np.isin(np.asarray(target_ids), self.following(user_id))
+
+    def mutual_followers(self, user_id, other_id):
+        """Ids following both users."""
+        return np.intersect1d(self.followers(user_id), self.followers(other_id), assume_unique=True)
+
+    def mutual_follows(self, user_id):
+        """Ids that user_id follows and that follow user_id back."""
+        return np.intersect1d(self.following(user_id), self.followers(user_id), assume_unique=True)
+
+    def memory_usage(self):
+        """Bytes held by the CSR arrays, plus a rough allowance for pending deltas."""
+        return self._following.nbytes + self._followers.nbytes + self._pending * 2 * 64
+
+    def stats(self):
+        return {
+            'edges': int(len(self._following.indices)),
+            'nodes': self._following.n_nodes,
+            'pending_changes': self._pending,
+            'bytes': self.memory_usage(),
+        }
+
+
+_graph = None
+_built_at = None
+_changes = None  # follow changes made while a rebuild reads the table, replayed onto the result
+_lock = threading.Lock()
+
+
+def rebuild():
+    """Build the index from the database on the calling thread and swap it in; the background task runs this."""
+    global _graph, _built_at, _changes
+    with _lock:
+        _changes = []
+    graph = None
+    try:
+        graph = FollowGraph.build(max_bytes=settings.SOCIAL_GRAPH_INDEX_MAX_BYTES)
+    finally:
+        with _lock:
+            if graph is not None:
+                for edges, add in _changes:
+                    graph._apply(edges, add)
+            _graph, _built_at, _changes = graph, time.monotonic(), None
+    return graph
+
+
+_task = BackgroundTask(rebuild, 'follow-graph-index')
+
+
+def get_graph():
+    """
+    The process-wide index; None when disabled, too large or not built yet.
+    A missing, stale or heavily patched index is rebuilt in the background.
+    """
+    if not settings.SOCIAL_GRAPH_INDEX:
+        return None
+    graph, built_at = _graph, _built_at
+    if built_at is None or time.monotonic() - built_at >= settings.SOCIAL_GRAPH_INDEX_REBUILD_SECONDS \
+            or (graph is not None and graph.pending >= settings.SOCIAL_GRAPH_INDEX_COMPACT_EVERY):
+        _task.start()
+    return graph
+
+
+def _changed(edges, add):
+    with _lock:
+        if _graph is not None:
+            _graph._apply(edges, add)
+        if _changes is not None:
+            _changes.append((edges, add))
+
+
+def edges_added(edges):
+    _changed(edges, add=True)
+
+
+def edges_removed(edges):
+    _changed(edges, add=False)
+
+
+def _follows(user_id, ids):
+    from social.models import Follow
+    return Follow.objects.filter(follower_id=user_id, following_id__in=ids).values_list('following_id', flat=True)
+
+
+def _among(graph, user_id, ids):
+    ids = np.asarray(ids, dtype=np.int64)
+    return ids[graph.is_following(user_id, ids)].tolist()
+
+
+def followed_among(user_id, ids):
+    """The ids among `ids` that user_id follows."""
+    graph = get_graph()
+    if graph is not None:
+        return _among(graph, user_id, list(ids))
+    return list(_follows(user_id, ids))
+
+
+async def afollowed_among(user_id, ids):
+    graph = get_graph()
+    if graph is not None:
+        return _among(graph, user_id, list(ids))
+    return [following_id async for following_id in _follows(user_id, ids)]
+
+
+def mutual_follows(user_id):
+    """Set of ids user_id follows that follow user_id back."""
+    graph = get_graph()
+    if graph is not None:
+        return set(graph.mutual_follows(user_id).tolist())
+    from social.models import Follow
+    follows_back = Follow.objects.filter(following_id=user_id).values('follower_id')
+    return set(_follows(user_id, follows_back))
+
+
+def reset():
+    global _graph, _built_at
+    _task.join()
+    with _lock:
+        _graph, _built_at = None, None
@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from social.graph import FollowGraph
+from social.models import Follow, FollowSuggestion, StaleSuggestions
+from social.suggestions import adjacency, top_candidates
+
+
+class Command(BaseCommand):
+    help = ('Precompute "who to follow" suggestions. By default only users whose two-hop network '
+            'gained or lost follows since the last run are recomputed; --full recomputes everyone.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--top-k', type=int, default=settings.SOCIAL_SUGGESTIONS_TOP_K)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        now = timezone.now()
+        graph = FollowGraph.build(max_bytes=None)
+        adj = adjacency(graph)
+
+        since = None if options['full'] else FollowSuggestion.objects.aggregate(t=Max('computed_at'))['t']
+        if since is None:
+            user_ids = np.flatnonzero(np.diff(adj.indptr))
+        else:
+            # a new or removed edge u -> v changes the candidates of u and of everyone following u
+            changed = set(Follow.objects.filter(created_at__gte=since).values_list('follower_id', flat=True))
+            changed.update(StaleSuggestions.objects.filter(marked_at__lte=now).values_list('user_id', flat=True))
+            dirty = set(changed)
+            for user_id in changed:
+                dirty.update(graph.followers(user_id).tolist())
+            user_ids = np.array(sorted(dirty), dtype=np.int64)
+
+        batch_size = options['batch_size']
+        stored = 0
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            rows = [
+                FollowSuggestion(user_id=user_id, suggested_id=candidate, score=score, computed_at=now)
+                for user_id, candidates in top_candidates(adj, batch, options['top_k'])
+                for candidate, score in candidates
+            ]
+            with transaction.atomic():
+                FollowSuggestion.objects.filter(user_id__in=batch.tolist()).delete()
+                FollowSuggestion.objects.bulk_create(rows)
+            stored += len(rows)
+
+        if since is None:
+            # users who no longer follow anyone
+            FollowSuggestion.objects.filter(computed_at__lt=now).delete()
+        # unfollows after `now` may be missing from the graph: those stay marked for the next run
+        StaleSuggestions.objects.filter(marked_at__lte=now).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Computed suggestions for {len(user_ids)} user(s), stored {stored} '
+            f'in {time.monotonic() - started:.2f}s.'
+        ))
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from social.graph import FollowGraph
+
+
+class Command(BaseCommand):
+    help = 'Build the follow graph index once and report its size, to size SOCIAL_GRAPH_INDEX_MAX_BYTES.'
+
+    def handle(self, *args, **options):
+        graph = FollowGraph.build(max_bytes=None)
+        stats = graph.stats()
+        limit = settings.SOCIAL_GRAPH_INDEX_MAX_BYTES
+        self.stdout.write(
+            f"edges={stats['edges']} nodes={stats['nodes']} bytes={stats['bytes']} "
+            f"limit={limit} fits={'yes' if stats['bytes'] <= limit else 'no'}"
+        )
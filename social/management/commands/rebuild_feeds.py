@@ -0,0 +1,24 @@
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+
+from social import feed
+from social.models import Follow, FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild home feed inboxes from the follow graph (backfills recent posts for every follow).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help='Delete all existing inbox entries first.')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            FeedEntry.objects.all().delete()
+
+        edges = Follow.objects.values_list('follower_id', 'following_id').order_by('follower_id')
+        users = 0
+        for follower_id, group in groupby(edges.iterator(chunk_size=2000), key=lambda edge: edge[0]):
+            feed.backfill(follower_id, [following_id for _, following_id in group])
+            users += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt inboxes for {users} user(s).'))
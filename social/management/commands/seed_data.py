@@ -0,0 +1,145 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from accounts.models import User, UserInfo
+from posts import timeline
+from posts.models import Post
+from social.models import Follow
+
+WORDS = (
+    'the a and of to in is it you that was for on are with as his they be at one have this from or had by '
+    'hot word but what some we can out other were all there when up use your how said an each she which do '
+    'their time if will way about many then them write would like so these her long make thing see him two '
+    'has look more day could go come did number sound no most people my over know water than call first who '
+    'may down side been now find django python api feed post follow coffee music travel photo game code '
+    'weekend news sport movie book city food cat dog art design startup data cloud release bug fix'
+).split()
+
+
+def zipf_cdf(n, alpha, rng):
+    """Cumulative weights of n items with popularity rank**-alpha, ranks shuffled over the items."""
+    weights = np.arange(1, n + 1, dtype=np.float64) ** -alpha
+    rng.shuffle(weights)
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+class Command(BaseCommand):
+    help = ('Seed synthetic users, power-law follow edges and posts with bulk inserts, for benchmarks '
+            '(see bench_http). Counters are reconciled and feed inboxes rebuilt at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--follows', type=float, default=20,
+                            help='mean accounts followed per user, before repeated edges are dropped')
+        parser.add_argument('--posts', type=float, default=10, help='mean posts per user')
+        parser.add_argument('--alpha', type=float, default=1.0,
+                            help='power-law exponent of follower counts and posting activity')
+        parser.add_argument('--days', type=int, default=365, help='posts are spread over this many past days')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed', help='usernames are <prefix><n>, emails <prefix><n>@example.com')
+        parser.add_argument('--password', default='seedpass123', help='password of every seeded user')
+        parser.add_argument('--seed', type=int, default=0, help='random seed, for reproducible data sets')
+        parser.add_argument('--skip-feeds', action='store_true', help="don't rebuild feed inboxes afterwards")
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        rng = np.random.default_rng(options['seed'])
+        started = time.perf_counter()
+
+        user_ids = self.create_users(options['users'], options['prefix'], options['password'])
+        self.step(f'{len(user_ids)} users', started)
+
+        follows = self.create_follows(user_ids, options['follows'], options['alpha'], rng)
+        self.step(f'{follows} follows', started)
+
+        posts = self.create_posts(user_ids, options['posts'], options['alpha'], options['days'], rng)
+        self.step(f'{posts} posts', started)
+
+        # bulk inserts skip the counter, fan-out and timeline receivers
+        timeline.invalidate()
+        call_command('reconcile_counters', stdout=self.stderr)
+        if not options['skip_feeds']:
+            call_command('rebuild_feeds', stdout=self.stderr)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(user_ids)} users, {follows} follows and {posts} posts '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
+
+    def step(self, message, started):
+        self.stderr.write(f'{message} ({time.perf_counter() - started:.1f}s)')
+
+    def create_users(self, count, prefix, password):
+        offset = User.objects.filter(username__startswith=prefix).count()
+        hashed = make_password(password)  # hashed once: every seeded user shares it
+        ids = []
+        for start in range(offset, offset + count, self.batch_size):
+            stop = min(start + self.batch_size, offset + count)
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f'{prefix}{n}', email=f'{prefix}{n}@example.com', password=hashed, tc=True)
+                    for n in range(start, stop)
+                ])
+                UserInfo.objects.bulk_create([UserInfo(user_id=user.pk) for user in users])
+            ids.extend(user.pk for user in users)
+        return np.array(ids, dtype=np.int64)
+
+    def create_follows(self, user_ids, mean, alpha, rng):
+        """Out-degrees are geometric around `mean`; who gets followed follows a power law."""
+        n = len(user_ids)
+        if n < 2 or mean <= 0:
+            return 0
+        popularity = zipf_cdf(n, alpha, rng)
+        created = 0
+        # edges are generated a batch of followers at a time, so duplicates can be dropped per batch
+        followers_per_batch = max(1, int(self.batch_size / mean))
+        for start in range(0, n, followers_per_batch):
+            followers = np.arange(start, min(start + followers_per_batch, n))
+            degrees = np.minimum(rng.geometric(1 / (mean + 1), len(followers)) - 1, n - 1)
+            sources = np.repeat(followers, degrees)
+            targets = np.minimum(np.searchsorted(popularity, rng.random(len(sources))), n - 1)
+            edges = np.unique(sources[sources != targets] * n + targets[sources != targets])
+            Follow.objects.bulk_create(
+                [Follow(follower_id=user_ids[edge // n], following_id=user_ids[edge % n]) for edge in edges.tolist()],
+                batch_size=self.batch_size,
+            )
+            created += len(edges)
+        return created
+
+    def create_posts(self, user_ids, mean, alpha, days, rng):
+        """Authors follow a power law of activity; created_at grows with the id, as in production."""
+        total = int(len(user_ids) * mean)
+        if not total:
+            return 0
+        activity = zipf_cdf(len(user_ids), alpha, rng)
+        now = timezone.now()
+        span = timedelta(days=days).total_seconds()
+        db = router.db_for_write(Post)
+        connection = connections[db]
+        table = Post._meta.db_table
+        columns = ', '.join(connection.ops.quote_name(Post._meta.get_field(name).column)
+                            for name in ('author', 'content', 'created_at'))
+        # raw INSERTs: bulk_create would overwrite created_at (auto_now_add) with the current time
+        sql = f'INSERT INTO {connection.ops.quote_name(table)} ({columns}) VALUES (%s, %s, %s)'
+        for start in range(0, total, self.batch_size):
+            size = min(self.batch_size, total - start)
+            authors = user_ids[np.minimum(np.searchsorted(activity, rng.random(size)), len(user_ids) - 1)]
+            offsets = np.sort(rng.uniform(start, start + size, size)) / total * span
+            lengths = rng.integers(3, 30, size)
+            words = rng.integers(0, len(WORDS), int(lengths.sum()))
+            rows, position = [], 0
+            for author, offset, length in zip(authors.tolist(), offsets.tolist(), lengths.tolist()):
+                content = ' '.join(WORDS[word] for word in words[position:position + length])
+                position += length
+                created_at = now - timedelta(seconds=span - offset)
+                rows.append((author, content, connection.ops.adapt_datetimefield_value(created_at)))
+            with transaction.atomic(using=db), connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+        return total
@@ -1,16 +1,157 @@
-from django.db import models
+from django.db import connections, models, router
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 
+from accounts import counters
 from accounts.models import User
+from posts.models import Post, posts_created
+from social import feed, graph
 
 
 class Follow(models.Model):
-    follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following')
-    following = models.ForeignKey(User, on_delete=models.CASCADE, related_name='followers')
+    # db_index=False: the composite indexes below start with these columns
+    follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following', db_index=False)
+    following = models.ForeignKey(User, on_delete=models.CASCADE, related_name='followers', db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('follower', 'following')
+        # follower and following lists are paged newest first (socialapi.pagination)
         indexes = [
-            models.Index(fields=['follower']),
-            models.Index(fields=['following']),
+            models.Index(fields=['follower', '-created_at', '-id'], name='social_follow_follower_idx'),
+            models.Index(fields=['following', '-created_at', '-id'], name='social_follow_following_idx'),
         ]
+
+
+class FeedEntry(models.Model):
+    """A post materialized into one follower's home feed inbox (see social.feed)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries', db_index=False)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='feed_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # copy of post.created_at so the inbox can be read in order from its own index
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='social_feed_user_created_idx'),
+            models.Index(fields=['user', 'author'], name='social_feed_user_author_idx'),
+        ]
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out([instance])
+    else:
+        # keep the inbox sort key in step if created_at was rewritten
+        FeedEntry.objects.filter(post=instance).exclude(created_at=instance.created_at).update(
+            created_at=instance.created_at)
+
+
+@receiver(posts_created, sender=Post)
+def fan_out_posts(sender, posts, **kwargs):
+    feed.fan_out(posts)
+
+
+class FollowSuggestion(models.Model):
+    """A precomputed "who to follow" candidate (see social.suggestions)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='follow_suggestions')
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # number of accounts the user follows that follow the suggested account
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'suggested')
+        indexes = [
+            models.Index(fields=['user', '-score'], name='social_suggestion_user_idx'),
+        ]
+
+
+class StaleSuggestions(models.Model):
+    """
+    A user whose suggestions an unfollow made stale, recomputed by the next
+    compute_suggestions run. No foreign key constraint: deleting a user
+    deletes their follows, which marks that same user, and the run simply
+    finds nothing to compute for an id that no longer exists.
+    """
+    user = models.OneToOneField(User, on_delete=models.DO_NOTHING, db_constraint=False, primary_key=True,
+                                related_name='+')
+    marked_at = models.DateTimeField()
+
+
+def _returning(sql, params):
+    connection = connections[router.db_for_write(Follow)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(table=connection.ops.quote_name(Follow._meta.db_table)), params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def insert_follows(follower_id, following_ids):
+    """
+    Follow many users at once, skipping edges that already exist (also ones
+    made concurrently); returns the ids actually followed. Sends no
+    post_save, so the caller runs follows_created() for the batch.
+    """
+    if not following_ids:
+        return []
+    connection = connections[router.db_for_write(Follow)]
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    values = ', '.join(['(%s, %s, %s)'] * len(following_ids))
+    params = [value for following_id in following_ids for value in (follower_id, following_id, now)]
+    return _returning(
+        f'INSERT INTO {{table}} (follower_id, following_id, created_at) VALUES {values} '
+        f'ON CONFLICT DO NOTHING RETURNING following_id', params)
+
+
+def delete_follows(follower_id, following_ids):
+    """Unfollow many users at once; returns the ids whose rows this DELETE removed. Sends no post_delete."""
+    if not following_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(following_ids))
+    return _returning(
+        f'DELETE FROM {{table}} WHERE follower_id = %s AND following_id IN ({placeholders}) RETURNING following_id',
+        [follower_id, *following_ids])
+
+
+def follows_created(edges):
+    """Downstream work for new (follower_id, following_id) edges, once per batch."""
+    edges = list(edges)
+    counters.follows_created(edges)
+    graph.edges_added(edges)
+    for follower_id, following_ids in _group(edges).items():
+        feed.backfill(follower_id, following_ids)
+
+
+def follows_deleted(edges):
+    edges = list(edges)
+    counters.follows_deleted(edges)
+    # unfollows leave no row behind for compute_suggestions to find
+    now = timezone.now()
+    StaleSuggestions.objects.bulk_create(
+        [StaleSuggestions(user_id=follower_id, marked_at=now) for follower_id in {edge[0] for edge in edges}],
+        update_conflicts=True, unique_fields=['user'], update_fields=['marked_at'],
+    )
+    graph.edges_removed(edges)
+    for follower_id, following_ids in _group(edges).items():
+        feed.purge(follower_id, following_ids)
+
+
+def _group(edges):
+    grouped = {}
+    for follower_id, following_id in edges:
+        grouped.setdefault(follower_id, []).append(following_id)
+    return grouped
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        follows_created([(instance.follower_id, instance.following_id)])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follows_deleted([(instance.follower_id, instance.following_id)])
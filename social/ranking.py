@@ -0,0 +1,158 @@
+"""
+Relevance-ranked home feed (?ranking=relevance on the feed views).
+
+The newest FEED_RANKING_CANDIDATES posts of the home feed (read through
+HomeFeed, so inbox, pull authors and archive alike) created before the
+feed's snapshot time `as_of` are scored in one NumPy pass:
+
+    score = ln 2 * created_at / half-life      recency, halving every FEED_RANKING_HALF_LIFE_HOURS
+          + ln affinity(author)                how close the reader is to the author
+          - 0.5 * ln frequency(author)         the author's posts among the candidates
+
+i.e. the log of recency decay * affinity / sqrt(frequency), without the
+"now" term, which is the same for every candidate.
+
+Affinity is 1, plus FEED_RANKING_MUTUAL_BOOST when the author follows the
+reader back, plus up to 1 for how long the reader had followed the author
+at `as_of` (log scale, a year or more counts fully). There is no likes or
+replies model yet, so the mutual follow stands in for interaction history.
+
+Both the candidates and the follow tenures depend on when the ranking is
+computed, so a ranking is computed as of a snapshot time: the first page
+takes the current time and the pagination links carry it (?as_of=, see
+social.views.RankedFeedPagination), and every later page is a slice of the
+same ranking, recomputed from the same inputs if it dropped out of the
+cache, so (score, id) cursors neither skip nor repeat posts. Posts made
+after `as_of` appear when the client starts again from the first page.
+Follows, unfollows and deletions made while paging do change the scores
+of a recomputed ranking.
+
+Rankings are cached per user and snapshot for FEED_RANKING_CACHE_SECONDS,
+so later pages are usually a slice of the cached ranking plus one query
+for the page's posts.
+"""
+import math
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from posts.models import ArchivedPost, Post
+from posts.serializers import POST_ROW_FIELDS, post_rows
+from social import graph
+from social.feed import HomeFeed
+from social.models import Follow
+
+RANKINGS = ('recent', 'relevance')
+CACHE_PREFIX = 'feed-ranking:'
+FULL_TENURE_DAYS = 365
+
+RankedRow = namedtuple('RankedRow', POST_ROW_FIELDS + ('score',))
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_as_of(as_of):
+    """A snapshot time as a query parameter: integer microseconds since the epoch, so it round-trips exactly."""
+    return str((as_of - EPOCH) // MICROSECOND)
+
+
+def decode_as_of(value):
+    """The snapshot time of an ?as_of= parameter, or raises ValueError."""
+    try:
+        return EPOCH + int(value) * MICROSECOND
+    except OverflowError as e:
+        raise ValueError('Invalid as_of') from e
+
+
+def score(created_at, author_ids, affinity, half_life):
+    """
+    Scores of candidate posts (higher is better), from arrays of their
+    created_at (POSIX seconds), author ids and author affinity (>= 1).
+    """
+    _, inverse, counts = np.unique(author_ids, return_inverse=True, return_counts=True)
+    return created_at * (math.log(2) / half_life) + np.log(affinity) - 0.5 * np.log(counts[inverse])
+
+
+class RankedFeed:
+    """
+    A user's home feed ordered by score as of `as_of` (default: now), for
+    KeysetPagination with ordering_fields ('score', 'id').
+    """
+
+    def __init__(self, user, as_of=None):
+        self.user = user
+        self.as_of = timezone.now() if as_of is None else as_of
+
+    def affinities(self):
+        """{author id: affinity} of everyone the user follows."""
+        follows = Follow.objects.filter(follower_id=self.user.id).values_list('following_id', 'created_at')
+        mutual = graph.mutual_follows(self.user.id)
+        full = math.log1p(FULL_TENURE_DAYS)
+        return {
+            author_id: 1 + settings.FEED_RANKING_MUTUAL_BOOST * (author_id in mutual)
+            + min(math.log1p(max((self.as_of - followed_at).total_seconds(), 0) / 86400) / full, 1.0)
+            for author_id, followed_at in follows
+        }
+
+    def rank(self):
+        """(ids, scores) of the candidates, best first."""
+        # strictly before as_of: the position of a (nonexistent) post at as_of with id 0
+        rows = HomeFeed(self.user, rows=True).seek((self.as_of, 0), False, settings.FEED_RANKING_CANDIDATES)
+        count = len(rows)
+        ids = np.fromiter((row.id for row in rows), np.int64, count)
+        if not count:
+            return ids, np.zeros(0)
+        created_at = np.fromiter((row.created_at.timestamp() for row in rows), np.float64, count)
+        author_ids = np.fromiter((row.author_id for row in rows), np.int64, count)
+        by_author = self.affinities()
+        # authors unfollowed since their posts reached the inbox count as plain follows
+        affinity = np.fromiter((by_author.get(author_id, 1.0) for author_id in author_ids.tolist()),
+                               np.float64, count)
+        scores = score(created_at, author_ids, affinity, settings.FEED_RANKING_HALF_LIFE_HOURS * 3600)
+        order = np.lexsort((ids, scores))[::-1]  # score, then id, descending
+        return ids[order], scores[order]
+
+    def ranking(self):
+        key = f'{CACHE_PREFIX}{self.user.id}:{encode_as_of(self.as_of)}'
+        ranked = cache.get(key)
+        if ranked is None:
+            ranked = self.rank()
+            cache.set(key, ranked, settings.FEED_RANKING_CACHE_SECONDS)
+        return ranked
+
+    def count(self):
+        return len(self.ranking()[0])
+
+    def seek(self, position, reverse, limit):
+        ids, scores = self.ranking()
+        if position is None:
+            start = stop = 0
+        else:
+            value, pk = position
+            # how many rank strictly before the position, and how many up to and including it
+            start = int(np.count_nonzero((scores > value) | ((scores == value) & (ids > pk))))
+            stop = len(ids) - int(np.count_nonzero((scores < value) | ((scores == value) & (ids < pk))))
+        if reverse:
+            page = slice(max(start - limit, 0), start)
+            return self.rows(ids[page][::-1], scores[page][::-1])
+        page = slice(stop, stop + limit)
+        return self.rows(ids[page], scores[page])
+
+    async def aseek(self, position, reverse, limit):
+        return await sync_to_async(self.seek)(position, reverse, limit)
+
+    @staticmethod
+    def rows(ids, scores):
+        ids = ids.tolist()
+        posts = {row.id: row for row in post_rows(Post.objects.filter(id__in=ids))}
+        missing = [pk for pk in ids if pk not in posts]
+        if missing:  # archived since they were ranked
+            posts.update((row.id, row) for row in post_rows(ArchivedPost.objects.filter(id__in=missing)))
+        # deleted posts drop out of the page
+        return [RankedRow(*posts[pk], value) for pk, value in zip(ids, scores.tolist()) if pk in posts]
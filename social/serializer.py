@@ -1,7 +1,8 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from accounts.models import User
-from social.models import Follow
+from social.models import Follow, FollowSuggestion
 
 
 class UserBasicSerializer(serializers.ModelSerializer):
@@ -40,3 +41,21 @@ class FollowingListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Follow
         fields = ['following', 'created_at']
+
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    """A suggested account and its shared-connection score."""
+    user = UserBasicSerializer(source='suggested', read_only=True)
+
+    class Meta:
+        model = FollowSuggestion
+        fields = ['user', 'score']
+
+
+class BulkFollowSerializer(serializers.Serializer):
+    """A list of user ids to follow or unfollow in one request."""
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.SOCIAL_BULK_FOLLOW_MAX,
+    )
@@ -0,0 +1,48 @@
+"""
+"Who to follow" suggestions from shared connections.
+
+With A the follow adjacency matrix (A[u, v] = 1 when u follows v), row u of
+A @ A counts, for every candidate c, how many of the accounts u follows
+themselves follow c. Those counts are computed for a batch of users at a
+time as one sparse matrix product, accounts u already follows (and u) are
+masked out, and the top SOCIAL_SUGGESTIONS_TOP_K are stored in
+FollowSuggestion. The API only ever reads the stored rows.
+"""
+import numpy as np
+from scipy import sparse
+
+from social.graph import FollowGraph
+
+
+def adjacency(graph):
+    following = graph.following_csr()
+    n = following.n_nodes
+    data = np.ones(len(following.indices), dtype=np.float32)
+    return sparse.csr_matrix((data, following.indices, following.indptr), shape=(n, n))
+
+
+def top_candidates(adj, user_ids, k):
+    """Yields (user_id, [(candidate_id, score), ...]) for each of user_ids."""
+    user_ids = np.asarray([u for u in user_ids if u < adj.shape[0]], dtype=np.int64)
+    if not len(user_ids):
+        return
+    rows = adj[user_ids]
+    scores = (rows @ adj).tocsr()
+    # drop accounts already followed, and the user themselves
+    own = sparse.csr_matrix(
+        (np.ones(len(user_ids), dtype=np.float32), (np.arange(len(user_ids)), user_ids)), shape=rows.shape)
+    scores = (scores - scores.multiply((rows + own).sign())).tocsr()
+    scores.eliminate_zeros()
+
+    for i, user_id in enumerate(user_ids):
+        start, end = scores.indptr[i], scores.indptr[i + 1]
+        candidates, values = scores.indices[start:end], scores.data[start:end]
+        if len(values) > k:
+            best = np.argpartition(-values, k - 1)[:k]
+            candidates, values = candidates[best], values[best]
+        order = np.lexsort((candidates, -values))
+        yield int(user_id), [(int(candidates[j]), float(values[j])) for j in order]
+
+
+def load_adjacency():
+    return adjacency(FollowGraph.build(max_bytes=None))
@@ -1,10 +1,13 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from accounts.models import User
 from posts.models import Post
-from social.models import Follow
+from social.models import Follow, FeedEntry, FollowSuggestion
+from socialapi.testing import QueryBudgetMixin, QueryPlanMixin, analyze
 from django.utils import timezone
 from datetime import timedelta
 
@@ -78,6 +81,79 @@ class UnfollowUserViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class BulkFollowViewTests(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', email='user1@test.com', password='pass123')
+        self.others = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@test.com', password='pass123')
+            for i in range(2, 7)
+        ]
+        self.client.force_authenticate(user=self.user1)
+
+    def test_bulk_follow_reports_status_per_id(self):
+        Follow.objects.create(follower=self.user1, following=self.others[0])
+        ids = [self.others[0].id, self.others[1].id, self.user1.id, 9999, self.others[2].id]
+        response = self.client.post(reverse('bulk-follow'), {'user_ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in response.data['results']], [
+            'already_following', 'followed', 'cannot_follow_self', 'not_found', 'followed',
+        ])
+        self.assertEqual(Follow.objects.filter(follower=self.user1).count(), 3)
+
+    def test_bulk_follow_updates_counters_and_backfills_feed(self):
+        Post.objects.create(author=self.others[0], content='Earlier post')
+        ids = [user.id for user in self.others]
+        with self.assertNumQueries(6):  # independent of how many ids are followed
+            self.client.post(reverse('bulk-follow'), {'user_ids': ids}, format='json')
+        self.user1.info.refresh_from_db()
+        self.assertEqual(self.user1.info.following_count, 5)
+        self.others[0].info.refresh_from_db()
+        self.assertEqual(self.others[0].info.followers_count, 1)
+        self.assertTrue(FeedEntry.objects.filter(user=self.user1, author=self.others[0]).exists())
+
+    def test_bulk_unfollow(self):
+        for user in self.others[:3]:
+            Follow.objects.create(follower=self.user1, following=user)
+        Post.objects.create(author=self.others[0], content='Post')
+        ids = [self.others[0].id, self.others[1].id, self.others[4].id]
+        response = self.client.post(reverse('bulk-unfollow'), {'user_ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in response.data['results']],
+                         ['unfollowed', 'unfollowed', 'not_following'])
+        self.assertEqual(Follow.objects.filter(follower=self.user1).count(), 1)
+        self.assertFalse(FeedEntry.objects.filter(user=self.user1).exists())
+        self.user1.info.refresh_from_db()
+        self.assertEqual(self.user1.info.following_count, 1)
+
+    def test_bulk_follow_counts_only_rows_it_inserted(self):
+        from unittest import mock
+        from social import models, views
+        target = self.others[0]
+
+        def follow_concurrently(follower_id, following_ids):
+            Follow.objects.create(follower=self.user1, following=target)  # a single follow in between
+            return models.insert_follows(follower_id, following_ids)
+
+        with mock.patch.object(views, 'insert_follows', follow_concurrently):
+            response = self.client.post(reverse('bulk-follow'), {'user_ids': [target.id, self.others[1].id]},
+                                        format='json')
+        self.assertEqual([r['status'] for r in response.data['results']], ['already_following', 'followed'])
+        self.user1.info.refresh_from_db()
+        self.assertEqual(self.user1.info.following_count, 2)
+        target.info.refresh_from_db()
+        self.assertEqual(target.info.followers_count, 1)
+
+    def test_bulk_unfollow_counts_only_rows_it_deleted(self):
+        from social.models import delete_follows
+        Follow.objects.create(follower=self.user1, following=self.others[0])
+        self.assertEqual(delete_follows(self.user1.id, [self.others[0].id, self.others[1].id]), [self.others[0].id])
+        self.assertEqual(delete_follows(self.user1.id, [self.others[0].id]), [])
+
+    def test_bulk_follow_rejects_empty_list(self):
+        response = self.client.post(reverse('bulk-follow'), {'user_ids': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class FollowersListViewTests(APITestCase):
     def setUp(self):
         self.user1 = User.objects.create_user(username='user1', email='user1@test.com', password='pass123')
@@ -109,6 +185,12 @@ class FollowersListViewTests(APITestCase):
         self.assertIsNotNone(response.data.get('next'))
         self.assertTrue(len(response.data['results']) <= 10)
 
+    def test_list_following(self):
+        Follow.objects.create(follower=self.user1, following=self.user2)
+        response = self.client.get(reverse('following'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['following']['username'], 'user2')
+
     def test_list_followers_unauthenticated(self):
         self.client.force_authenticate(user=None)
         url = reverse('followers')
@@ -181,6 +263,638 @@ class FeedViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class FeedInboxTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', email='user1@test.com', password='pass123')
+        self.user2 = User.objects.create_user(username='user2', email='user2@test.com', password='pass123')
+        self.user3 = User.objects.create_user(username='user3', email='user3@test.com', password='pass123')
+        self.client.force_authenticate(user=self.user1)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        Follow.objects.create(follower=self.user1, following=self.user2)
+        Follow.objects.create(follower=self.user3, following=self.user2)
+        post = Post.objects.create(author=self.user2, content='Hello')
+        self.assertEqual(FeedEntry.objects.filter(post=post).count(), 2)
+        self.assertFalse(FeedEntry.objects.filter(user=self.user2).exists())
+
+    def test_follow_backfills_and_unfollow_purges(self):
+        Post.objects.create(author=self.user2, content='Before follow')
+        follow = Follow.objects.create(follower=self.user1, following=self.user2)
+        self.assertEqual(FeedEntry.objects.filter(user=self.user1, author=self.user2).count(), 1)
+        follow.delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.user1).exists())
+
+    @override_settings(FEED_BACKFILL_LIMIT=2)
+    def test_backfill_is_capped(self):
+        for i in range(5):
+            Post.objects.create(author=self.user2, content=f'Post {i}')
+        Follow.objects.create(follower=self.user1, following=self.user2)
+        self.assertEqual(FeedEntry.objects.filter(user=self.user1).count(), 2)
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_pull_author_posts_merged_at_read_time(self):
+        Follow.objects.create(follower=self.user1, following=self.user2)
+        Follow.objects.create(follower=self.user3, following=self.user2)
+        Follow.objects.create(follower=self.user1, following=self.user3)
+        cache.clear()
+        now = timezone.now()
+        celebrity_post = Post.objects.create(author=self.user2, content='From celebrity')
+        regular_post = Post.objects.create(author=self.user3, content='From regular')
+        Post.objects.filter(pk=celebrity_post.pk).update(created_at=now)
+        Post.objects.filter(pk=regular_post.pk).update(created_at=now - timedelta(seconds=5))
+        FeedEntry.objects.filter(post=regular_post).update(created_at=now - timedelta(seconds=5))
+
+        self.assertFalse(FeedEntry.objects.filter(post=celebrity_post).exists())
+        response = self.client.get(reverse('feed'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['content'] for p in response.data['results']], ['From celebrity', 'From regular'])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_feed_rows_match_serializer_output(self):
+        from posts.serializers import PostSerializer
+        Follow.objects.create(follower=self.user1, following=self.user2)
+        Follow.objects.create(follower=self.user3, following=self.user2)
+        Follow.objects.create(follower=self.user1, following=self.user3)
+        cache.clear()
+        Post.objects.create(author=self.user2, content='From celebrity')
+        Post.objects.create(author=self.user3, content='From regular')
+
+        response = self.client.get(reverse('feed'))
+        posts = Post.objects.order_by('-created_at', '-id')
+        self.assertEqual(response.json()['results'], PostSerializer(posts, many=True).data)
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_async_feed_matches_sync_feed(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        Follow.objects.create(follower=self.user1, following=self.user2)
+        Follow.objects.create(follower=self.user3, following=self.user2)
+        Follow.objects.create(follower=self.user1, following=self.user3)
+        cache.clear()
+        for i in range(8):
+            Post.objects.create(author=self.user2 if i % 2 else self.user3, content=f'Post {i}')
+        expected = self.client.get(reverse('feed') + '?page_size=5').json()
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(reverse('async-feed')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user1).access_token}')
+        response = self.client.get(reverse('async-feed') + '?page_size=5')
+        self.assertEqual(response.json()['results'], expected['results'])
+        self.assertEqual(len(self.client.get(response.json()['next']).json()['results']), 3)
+
+    def test_feed_read_query_count_does_not_grow_with_following(self):
+        for i in range(4, 30):
+            author = User.objects.create_user(username=f'user{i}', email=f'user{i}@test.com', password='pass123')
+            Follow.objects.create(follower=self.user1, following=author)
+            Post.objects.create(author=author, content=f'Post {i}')
+        cache.clear()
+        with self.assertNumQueries(2):  # pull-author set, page
+            response = self.client.get(reverse('feed'))
+        self.assertEqual(len(response.data['results']), 10)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 10)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertIsNone(response.data['next'])
+
+    def test_feed_continues_into_the_archive(self):
+        from io import StringIO
+        from django.core.management import call_command
+        Follow.objects.create(follower=self.user1, following=self.user2)
+        now = timezone.now()
+        posts = [Post.objects.create(author=self.user2, content=f'Post {i}') for i in range(25)]
+        for i, post in enumerate(posts):
+            Post.objects.filter(pk=post.pk).update(created_at=now - timedelta(days=(200 if i < 15 else 25) - i))
+        call_command('archive_posts', '--days', '90', stdout=StringIO())
+        self.assertEqual(FeedEntry.objects.filter(user=self.user1).count(), 10)
+
+        seen, url = [], reverse('feed')
+        while url:
+            response = self.client.get(url)
+            seen.extend(p['id'] for p in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [post.id for post in reversed(posts)])
+
+    def test_archive_is_merged_per_followed_author(self):
+        from unittest import mock
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from posts.models import ArchivedPost
+        from social import feed
+
+        authors = [self.user2, self.user3] + [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@test.com', password='pass123')
+            for i in range(4, 8)
+        ]
+        outsider = authors.pop()
+        for author in authors:
+            Follow.objects.create(follower=self.user1, following=author)
+        long_ago = timezone.now() - timedelta(days=365)
+        ArchivedPost.objects.bulk_create([
+            ArchivedPost(id=1000 + i, author=authors[i % 5], content=f'Old {i}', created_at=long_ago + timedelta(hours=i))
+            for i in range(23)
+        ])
+        ArchivedPost.objects.create(id=999, author=outsider, content='Not followed', created_at=long_ago)
+        expected = list(range(1022, 999, -1))
+
+        for client in ('sync', 'async'):
+            if client == 'async':
+                self.client.force_authenticate(user=None)
+                self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user1).access_token}')
+            seen, url = [], reverse('feed' if client == 'sync' else 'async-feed') + '?page_size=4'
+            with mock.patch.object(feed, 'ARCHIVE_SEEK_BATCH', 2):
+                while url:
+                    response = self.client.get(url)
+                    seen.extend(p['id'] for p in response.json()['results'])
+                    url = response.json()['next']
+                self.assertEqual(seen, expected)
+                back = self.client.get(response.json()['previous']).json()['results']
+            self.assertEqual([p['id'] for p in back], expected[-7:-3])
+
+
+class RankedFeedTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', email='user1@test.com', password='pass123')
+        self.user2 = User.objects.create_user(username='user2', email='user2@test.com', password='pass123')
+        self.user3 = User.objects.create_user(username='user3', email='user3@test.com', password='pass123')
+        Follow.objects.create(follower=self.user1, following=self.user2)
+        Follow.objects.create(follower=self.user1, following=self.user3)
+        self.client.force_authenticate(user=self.user1)
+
+    def tearDown(self):
+        cache.clear()
+
+    def post(self, author, content, age):
+        post = Post.objects.create(author=author, content=content)
+        created_at = timezone.now() - age
+        Post.objects.filter(pk=post.pk).update(created_at=created_at)
+        FeedEntry.objects.filter(post=post).update(created_at=created_at)
+        return post
+
+    def test_score(self):
+        import numpy as np
+        from social.ranking import score
+        hour = 3600
+        # newer is better; a doubled affinity is worth one half-life
+        scores = score(np.array([10 * hour, 0, 0]), np.array([1, 2, 3]), np.array([1.0, 1.0, 2.0]), 10 * hour)
+        self.assertGreater(scores[0], scores[1])
+        self.assertAlmostEqual(scores[0], scores[2])
+        # an author's posts are damped by how many they have among the candidates
+        scores = score(np.zeros(5), np.array([1, 1, 1, 1, 2]), np.ones(5), hour)
+        self.assertAlmostEqual(scores[0], scores[4] - np.log(2))
+
+    def test_recent_is_the_default(self):
+        older = self.post(self.user2, 'older', timedelta(hours=2))
+        newer = self.post(self.user3, 'newer', timedelta(hours=1))
+        Follow.objects.create(follower=self.user2, following=self.user1)
+        ids = [[p['id'] for p in self.client.get(reverse('feed') + query).data['results']]
+               for query in ('', '?ranking=recent')]
+        self.assertEqual(ids, [[newer.id, older.id]] * 2)
+
+    def test_mutual_follow_ranks_first(self):
+        mutual = self.post(self.user2, 'from a friend', timedelta(hours=2))
+        newer = self.post(self.user3, 'newer', timedelta(hours=1))
+        Follow.objects.create(follower=self.user2, following=self.user1)
+        response = self.client.get(reverse('feed') + '?ranking=relevance')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data['results']], [mutual.id, newer.id])
+        self.assertNotIn('score', response.data['results'][0])
+
+    def test_frequent_poster_is_damped(self):
+        for i in range(4):
+            self.post(self.user2, f'busy {i}', timedelta(minutes=10 + i))
+        quiet = self.post(self.user3, 'quiet', timedelta(minutes=30))
+        response = self.client.get(reverse('feed') + '?ranking=relevance')
+        self.assertEqual(response.data['results'][0]['id'], quiet.id)
+
+    def test_cursor_walk_uses_the_cached_ranking(self):
+        posts = [self.post(self.user2 if i % 3 else self.user3, f'Post {i}', timedelta(minutes=i)) for i in range(25)]
+        Follow.objects.create(follower=self.user3, following=self.user1)
+        response = self.client.get(reverse('feed') + '?ranking=relevance')
+        seen = [p['id'] for p in response.data['results']]
+        self.assertIn('ranking=relevance', response.data['next'])
+        with self.assertQueryBudget(1):  # the page's posts
+            response = self.client.get(response.data['next'])
+        seen.extend(p['id'] for p in response.data['results'])
+        response = self.client.get(response.data['next'])
+        seen.extend(p['id'] for p in response.data['results'])
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(sorted(seen), sorted(post.id for post in posts))
+
+        previous = self.client.get(response.data['previous']).data['results']
+        self.assertEqual([p['id'] for p in previous], seen[10:20])
+
+    def test_cursor_walk_keeps_its_snapshot_when_recomputed(self):
+        posts = [self.post(self.user2 if i % 3 else self.user3, f'Post {i}', timedelta(minutes=i)) for i in range(25)]
+        response = self.client.get(reverse('feed') + '?ranking=relevance')
+        seen = [p['id'] for p in response.data['results']]
+        self.assertIn('as_of=', response.data['next'])
+        # new posts change every author's frequency, and the cached ranking expires
+        later = [self.post(self.user3, f'Later {i}', timedelta(0)) for i in range(5)]
+        cache.clear()
+        url = response.data['next']
+        while url:
+            response = self.client.get(url)
+            seen.extend(p['id'] for p in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(sorted(seen), sorted(post.id for post in posts))
+
+        fresh = [p['id'] for p in self.client.get(reverse('feed') + '?ranking=relevance&page_size=30').data['results']]
+        self.assertEqual(sorted(fresh), sorted(post.id for post in posts + later))
+        response = self.client.get(reverse('feed') + '?ranking=relevance&as_of=soon')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_a_datetime_key(self):
+        import base64
+        self.post(self.user2, 'ranked', timedelta(hours=1))
+        from rest_framework_simplejwt.tokens import RefreshToken
+        cursor = base64.urlsafe_b64encode(b'["2024-01-01T00:00:00+00:00",1,0]').decode().rstrip('=')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user1).access_token}')
+        for url in (reverse('feed'), reverse('async-feed')):
+            response = self.client.get(url, {'ranking': 'relevance', 'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleted_post_drops_out_of_the_ranking(self):
+        kept = self.post(self.user2, 'kept', timedelta(hours=1))
+        deleted = self.post(self.user3, 'deleted', timedelta(hours=2))
+        self.client.get(reverse('feed') + '?ranking=relevance')
+        deleted.delete()
+        response = self.client.get(reverse('feed') + '?ranking=relevance')
+        self.assertEqual([p['id'] for p in response.data['results']], [kept.id])
+
+    def test_invalid_ranking(self):
+        response = self.client.get(reverse('feed') + '?ranking=popular')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ranking', response.data)
+
+    def test_async_feed_matches_sync_feed(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        for i in range(8):
+            self.post(self.user2 if i % 2 else self.user3, f'Post {i}', timedelta(minutes=i))
+        Follow.objects.create(follower=self.user2, following=self.user1)
+        expected = self.client.get(reverse('feed') + '?ranking=relevance&page_size=5').json()
+
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user1).access_token}')
+        response = self.client.get(reverse('async-feed') + '?ranking=relevance&page_size=5')
+        self.assertEqual(response.json()['results'], expected['results'])
+        self.assertEqual(len(self.client.get(response.json()['next']).json()['results']), 3)
+        response = self.client.get(reverse('async-feed') + '?ranking=popular')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FollowGraphIndexTests(TestCase):
+    def setUp(self):
+        from social import graph
+        graph.reset()
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@test.com', password='pass123')
+            for i in range(5)
+        ]
+        a, b, c, d, e = self.users
+        for follower, following in [(a, b), (a, c), (b, c), (d, c), (c, a), (e, a)]:
+            Follow.objects.create(follower=follower, following=following)
+
+    def tearDown(self):
+        from social import graph
+        graph.reset()
+
+    def ids(self, *users):
+        return [user.id for user in users]
+
+    @override_settings(SOCIAL_GRAPH_INDEX=True)
+    def test_lookups_match_the_database(self):
+        from social.graph import rebuild
+        a, b, c, d, e = self.users
+        graph = rebuild()
+        self.assertEqual(list(graph.following(a.id)), sorted(self.ids(b, c)))
+        self.assertEqual(list(graph.followers(c.id)), sorted(self.ids(a, b, d)))
+        self.assertEqual(list(graph.is_following(a.id, self.ids(b, d, c))), [True, False, True])
+        self.assertEqual(list(graph.mutual_followers(c.id, b.id)), [a.id])
+        self.assertEqual(list(graph.mutual_follows(a.id)), [c.id])
+        self.assertEqual(list(graph.followers(9999)), [])
+
+    @override_settings(SOCIAL_GRAPH_INDEX=True, SOCIAL_GRAPH_INDEX_COMPACT_EVERY=3)
+    def test_follow_changes_are_applied_incrementally(self):
+        from unittest import mock
+        from social import graph
+        a, b, c, d, e = self.users
+        index = graph.rebuild()
+        Follow.objects.create(follower=a, following=d)
+        Follow.objects.filter(follower=a, following=b).delete()
+        self.assertEqual(list(index.following(a.id)), sorted(self.ids(c, d)))
+        self.assertEqual(list(index.followers(b.id)), [])
+
+        Follow.objects.create(follower=b, following=e)
+        self.assertEqual(index.stats()['pending_changes'], 3)  # not compacted on the follow's thread
+        with mock.patch.object(graph._task, 'start') as start:
+            self.assertIs(graph.get_graph(), index)
+        start.assert_called_once()  # but rebuilt in the background
+
+        index = graph.rebuild()
+        self.assertEqual(index.stats()['pending_changes'], 0)
+        self.assertEqual(list(index.following(a.id)), sorted(self.ids(c, d)))
+        self.assertEqual(list(index.followers(e.id)), [b.id])
+
+    @override_settings(SOCIAL_GRAPH_INDEX=True)
+    def test_requests_never_build_the_index(self):
+        from unittest import mock
+        from social import graph
+        a, b, c, d, e = self.users
+        with mock.patch.object(graph._task, 'start') as start:
+            self.assertIsNone(graph.get_graph())
+            # until the background build is done, lookups fall back to queries
+            self.assertEqual(graph.followed_among(a.id, self.ids(b, d)), [b.id])
+            self.assertEqual(graph.mutual_follows(a.id), {c.id})
+        self.assertTrue(start.called)
+
+        graph.rebuild()
+        with self.assertNumQueries(0):
+            self.assertEqual(graph.followed_among(a.id, self.ids(b, d)), [b.id])
+            self.assertEqual(graph.mutual_follows(a.id), {c.id})
+
+    @override_settings(SOCIAL_GRAPH_INDEX=True)
+    def test_feed_and_suggestions_read_the_index(self):
+        from social import graph
+        a, b, c, d, e = self.users
+        FollowSuggestion.objects.create(user=a, suggested=d, score=2, computed_at=timezone.now())
+        FollowSuggestion.objects.create(user=a, suggested=e, score=1, computed_at=timezone.now())
+        graph.rebuild()
+        Follow.objects.create(follower=a, following=e)  # applied as a delta
+        client = APIClient()
+        client.force_authenticate(user=a)
+        response = client.get(reverse('suggestions'))
+        self.assertEqual([s['user']['id'] for s in response.json()], [d.id])
+
+        with override_settings(FEED_FANOUT_MAX_FOLLOWERS=0):  # every author is a pull author
+            from social.feed import HomeFeed
+            cache.clear()
+            with self.assertNumQueries(1):  # the pull authors; who a follows comes from the index
+                feed = HomeFeed(a)
+        self.assertEqual(sorted(feed.pull_ids), sorted(self.ids(b, c, e)))
+
+    @override_settings(SOCIAL_GRAPH_INDEX=True, FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_async_feed_starts_a_due_rebuild(self):
+        from unittest import mock
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from social import graph
+        a, b, c, d, e = self.users
+        Post.objects.create(author=b, content='Hello')
+        cache.clear()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(a).access_token}')
+        # no index yet, so a rebuild is due; the event loop thread mustn't touch the connection to start it
+        with mock.patch.object(graph._task, '_start') as start:
+            response = client.get(reverse('async-feed'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['content'] for p in response.json()['results']], ['Hello'])
+        start.assert_called_once()
+
+    @override_settings(SOCIAL_GRAPH_INDEX=True, SOCIAL_GRAPH_INDEX_MAX_BYTES=64)
+    def test_index_not_built_over_memory_bound(self):
+        from social import graph
+        with self.assertLogs('social.graph', level='WARNING'):
+            self.assertIsNone(graph.rebuild())
+        self.assertIsNone(graph.get_graph())
+
+    def test_disabled_by_default(self):
+        from social.graph import get_graph
+        self.assertIsNone(get_graph())
+
+
+class SuggestionsTests(APITestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@test.com', password='pass123')
+            for i in range(6)
+        ]
+        me, a, b, c, d, e = self.users
+        # me follows a and b; a and b both follow c, only a follows d
+        for follower, following in [(me, a), (me, b), (a, c), (b, c), (a, d), (b, me)]:
+            Follow.objects.create(follower=follower, following=following)
+        self.client.force_authenticate(user=me)
+
+    def compute(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('compute_suggestions', *args, stdout=StringIO())
+
+    def test_ranked_by_shared_connections(self):
+        me, a, b, c, d, e = self.users
+        self.compute()
+        response = self.client.get(reverse('suggestions'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(s['user']['id'], s['score']) for s in response.data], [(c.id, 2.0), (d.id, 1.0)])
+
+    def test_read_is_a_single_query(self):
+        self.compute()
+        with self.assertNumQueries(1):
+            self.client.get(reverse('suggestions'))
+
+    def test_followed_suggestions_are_hidden_before_recompute(self):
+        me, a, b, c, d, e = self.users
+        self.compute()
+        Follow.objects.create(follower=me, following=c)
+        response = self.client.get(reverse('suggestions'))
+        self.assertEqual([s['user']['id'] for s in response.data], [d.id])
+
+    def test_incremental_run_recomputes_affected_users(self):
+        me, a, b, c, d, e = self.users
+        self.compute()
+        self.assertFalse(FollowSuggestion.objects.filter(user=me, suggested=e).exists())
+        Follow.objects.create(follower=a, following=e)
+        self.compute()
+        self.assertTrue(FollowSuggestion.objects.filter(user=me, suggested=e).exists())
+
+    def test_incremental_run_recomputes_after_unfollows(self):
+        from social.models import StaleSuggestions
+        me, a, b, c, d, e = self.users
+        self.compute()
+        self.assertTrue(FollowSuggestion.objects.filter(user=me, suggested=d).exists())
+        Follow.objects.get(follower=a, following=d).delete()  # d was suggested to me through a
+        self.client.post(reverse('bulk-unfollow'), {'user_ids': [b.id]}, format='json')  # me unfollows b
+        self.assertEqual(set(StaleSuggestions.objects.values_list('user_id', flat=True)), {a.id, me.id})
+
+        self.compute()
+        self.assertEqual(list(FollowSuggestion.objects.filter(user=me).values_list('suggested_id', flat=True)),
+                         [c.id])
+        self.assertFalse(StaleSuggestions.objects.exists())
+
+    def test_deleting_a_follower(self):
+        from django.db import connection
+        from social.models import StaleSuggestions
+        me, a, b, c, d, e = self.users
+        self.compute()
+        deleted_id = a.id
+        a.delete()  # a followed c and d
+        connection.check_constraints()
+        self.assertIn(deleted_id, StaleSuggestions.objects.values_list('user_id', flat=True))
+
+        self.compute()
+        self.assertFalse(StaleSuggestions.objects.exists())
+        self.assertEqual(list(FollowSuggestion.objects.filter(user=me).values_list('suggested_id', flat=True)),
+                         [c.id])
+
+    def test_deleting_a_followed_user(self):
+        from django.db import connection
+        from social.models import StaleSuggestions
+        me, a, b, c, d, e = self.users
+        self.compute()
+        c.delete()  # followed by a and b
+        connection.check_constraints()
+        self.assertEqual(set(StaleSuggestions.objects.values_list('user_id', flat=True)), {a.id, b.id})
+
+        self.compute()
+        self.assertFalse(FollowSuggestion.objects.filter(suggested_id=c.id).exists())
+        self.assertEqual(list(FollowSuggestion.objects.filter(user=me).values_list('suggested_id', flat=True)),
+                         [d.id])
+
+    def test_top_candidates_excludes_self_and_followed(self):
+        import numpy as np
+        from scipy import sparse
+        from social.suggestions import top_candidates
+
+        # 0 -> 1, 0 -> 2, 1 -> 0, 1 -> 3, 2 -> 3, 2 -> 1
+        src, dst = [0, 0, 1, 1, 2, 2], [1, 2, 0, 3, 3, 1]
+        adj = sparse.csr_matrix((np.ones(6, dtype=np.float32), (src, dst)), shape=(4, 4))
+        self.assertEqual(dict(top_candidates(adj, [0], k=5)), {0: [(3, 2.0)]})
+
+
+class FeedQueryPlanTests(QueryPlanMixin, TestCase):
+    """The feed and follow list queries stay index seeks as the tables grow"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from posts.models import ArchivedPost
+
+        users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@test.com', password='!') for i in range(300)
+        ])
+        # bulk_create skips the fan-out and counter receivers; the inbox is seeded directly
+        Follow.objects.bulk_create([
+            Follow(follower=users[i], following=users[(i + step) % 300]) for i in range(300) for step in range(1, 21)
+        ])
+        posts = Post.objects.bulk_create([Post(author=users[i % 300], content=f'Post {i}') for i in range(6000)])
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user=users[(post.author_id + step) % 300], post=post, author_id=post.author_id,
+                      created_at=post.created_at)
+            for post in posts[:3000] for step in range(1, 4)
+        ])
+        long_ago = timezone.now() - timedelta(days=365)
+        ArchivedPost.objects.bulk_create([
+            ArchivedPost(id=100000 + i, author=users[i % 300], content=f'Old {i}', created_at=long_ago)
+            for i in range(3000)
+        ])
+        analyze()
+        cls.user = users[42]
+        cls.position = (timezone.now(), 3000)
+
+    def test_feed_inbox_and_pulled_authors(self):
+        from social.feed import HomeFeed
+        feed = HomeFeed(self.user, rows=True, pull_ids=[self.user.id + 1])
+        for position in (None, self.position):
+            inbox, _ = feed._inbox_page(position, False, 21)
+            self.assertUsesIndex(inbox, 'social_feed_user_created_idx')
+            self.assertUsesIndex(feed._pulled_page(position, False, 21), 'posts_post_author_created_idx')
+            # one bounded index range per followed author, merged by a sort of at most their newest rows
+            author_ids = list(feed.followed_ids())
+            for seek in feed._archived_seeks(author_ids, position, False, 21):
+                self.assertUsesIndex(seek, 'posts_archived_author_idx')
+            for keys in feed._archived_keys(author_ids, position, False, 21):
+                self.assertUsesIndex(keys, 'posts_archived_author_idx', ordered=False)
+
+    def test_follow_lists(self):
+        from socialapi.pagination import keyset_filter
+        for position in (None, self.position):
+            followers = keyset_filter(Follow.objects.filter(following_id=self.user.id), position)[:21]
+            self.assertUsesIndex(followers, 'social_follow_following_idx')
+            following = keyset_filter(Follow.objects.filter(follower_id=self.user.id), position)[:21]
+            self.assertUsesIndex(following, 'social_follow_follower_idx')
+
+    def test_fan_out_follower_lookup(self):
+        followers = Follow.objects.filter(following_id=self.user.id).values_list('follower_id', flat=True)
+        self.assertUsesIndex(followers, 'social_follow_following_idx', ordered=False)
+
+class QueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Social endpoints run a fixed number of queries, however many rows they return"""
+
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@test.com', password='pass123')
+            for i in range(12)
+        ]
+        self.me = self.users[0]
+        for other in self.users[1:]:
+            Follow.objects.create(follower=self.me, following=other)
+            Follow.objects.create(follower=other, following=self.me)
+            Post.objects.create(author=other, content=f'From {other.username}')
+        FollowSuggestion.objects.bulk_create([
+            FollowSuggestion(user=self.users[1], suggested=other, score=1, computed_at=timezone.now())
+            for other in self.users[2:]
+        ])
+        self.client.force_authenticate(user=self.me)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_follow_lists(self):
+        for name in ('followers', 'following'):
+            with self.assertQueryBudget(2):
+                response = self.client.get(reverse(name))
+            self.assertEqual(len(response.data['results']), 10)
+
+    def test_feed(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.me).access_token}')
+        for url in (reverse('feed'), reverse('async-feed')):
+            with self.assertQueryBudget(4) as metrics:
+                response = self.client.get(url)
+            self.assertEqual(len(response.json()['results']), 10)
+            self.assertGreater(metrics.queries, 0)  # the async ORM's queries are recorded too
+
+    def test_suggestions(self):
+        self.client.force_authenticate(user=self.users[1])
+        with self.assertQueryBudget(2):
+            response = self.client.get(reverse('suggestions'))
+        self.assertEqual(len(response.data), 10)
+
+class SeedDataCommandTests(TestCase):
+    def test_seeds_consistent_data(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from accounts.models import UserInfo
+
+        out = StringIO()
+        call_command('seed_data', '--users', '60', '--follows', '5', '--posts', '3', '--batch-size', '25',
+                     stdout=out, stderr=StringIO())
+        self.assertIn('Seeded 60 users', out.getvalue())
+        self.assertEqual(User.objects.filter(username__startswith='seed').count(), 60)
+        self.assertEqual(Post.objects.count(), 180)
+        self.assertGreater(Follow.objects.count(), 100)
+        self.assertFalse(Follow.objects.filter(follower=F('following')).exists())
+
+        # counters match the rows and every follower's inbox holds the followed posts
+        info = UserInfo.objects.order_by('-followers_count').first()
+        self.assertEqual(info.followers_count, Follow.objects.filter(following_id=info.user_id).count())
+        self.assertEqual(info.posts_count, Post.objects.filter(author_id=info.user_id).count())
+        follow = Follow.objects.first()
+        self.assertEqual(
+            FeedEntry.objects.filter(user_id=follow.follower_id, author_id=follow.following_id).count(),
+            Post.objects.filter(author_id=follow.following_id).count(),
+        )
+        # created_at grows with the id and spans the past year
+        created = list(Post.objects.order_by('id').values_list('created_at', flat=True))
+        self.assertEqual(created, sorted(created))
+        self.assertGreater(created[-1] - created[0], timedelta(days=300))
+
+        call_command('seed_data', '--users', '5', '--skip-feeds', stdout=out, stderr=StringIO())
+        self.assertTrue(User.objects.filter(username='seed64').exists())
+
 class FollowModelTests(TestCase):
     def setUp(self):
         self.user1 = User.objects.create_user(username='user1', email='user1@test.com', password='pass123')
@@ -201,3 +915,128 @@ class FollowModelTests(TestCase):
         Follow.objects.create(follower=self.user1, following=self.user2)
         self.assertEqual(self.user2.followers.count(), 1)
         self.assertEqual(self.user1.following.count(), 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user1', email='user1@test.com', password='pass123')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_reads_go_to_the_chosen_replica_and_writes_to_the_primary(self):
+        from socialapi import routers
+        router = routers.ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Follow))
+        token = routers.use_replica('replica1')
+        try:
+            self.assertEqual(router.db_for_read(Follow), 'replica1')
+            self.assertEqual(router.db_for_write(Follow), 'default')
+            self.assertTrue(routers.reading_from_replica())
+        finally:
+            routers.restore(token)
+        self.assertFalse(routers.reading_from_replica())
+        self.assertFalse(router.allow_migrate('replica1', 'social'))
+        self.assertIsNone(router.allow_migrate('default', 'social'))
+
+    def test_pinned_users_and_unsafe_requests_read_the_primary(self):
+        from django.test import RequestFactory
+        from socialapi import routers
+        get, post = RequestFactory().get('/'), RequestFactory().post('/')
+        self.assertEqual(routers.choose_replica(get, self.user), 'replica1')
+        self.assertEqual(routers.choose_replica(get, None), 'replica1')
+        self.assertIsNone(routers.choose_replica(post, self.user))
+        routers.pin(self.user)
+        self.assertTrue(routers.is_pinned(self.user))
+        self.assertIsNone(routers.choose_replica(get, self.user))
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertIsNone(routers.choose_replica(get, None))
+
+    def test_replicas_need_a_shared_cache(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from django.http import HttpResponse
+        from socialapi.routers import ReplicaPinMiddleware
+        with override_settings(SHARED_CACHE=False):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'CACHE_BACKEND'):
+                ReplicaPinMiddleware(lambda request: HttpResponse())
+        with override_settings(SHARED_CACHE=True):
+            ReplicaPinMiddleware(lambda request: HttpResponse())
+
+
+class ReplicaReadYourWritesTests(TransactionTestCase):
+    """A real replica: a copy of the test database taken before the writes, i.e. one lagging behind."""
+    alias = 'replica1'
+    client_class = APIClient
+
+    @classmethod
+    def setUpClass(cls):
+        import os
+        import tempfile
+        from django.db import connections
+        super().setUpClass()
+        fd, cls.replica_file = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        # added after setUpClass, so the test runner doesn't create a test database for it
+        connections.settings[cls.alias] = {**connections['default'].settings_dict, 'NAME': cls.replica_file}
+        cls.databases = cls.databases | {cls.alias}
+
+    @classmethod
+    def tearDownClass(cls):
+        import os
+        from django.db import connections
+        connections[cls.alias].close()
+        del connections[cls.alias]
+        del connections.settings[cls.alias]
+        os.remove(cls.replica_file)
+        cls.databases = cls.databases - {cls.alias}
+        super().tearDownClass()
+
+    def setUp(self):
+        import sqlite3
+        from django.db import connections
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', email='user1@test.com', password='pass123')
+        self.user2 = User.objects.create_user(username='user2', email='user2@test.com', password='pass123')
+        connections[self.alias].close()
+        connections['default'].ensure_connection()
+        with sqlite3.connect(self.replica_file) as replica:
+            connections['default'].connection.backup(replica)
+        # a LocMem cache is shared by everything in this one process
+        self.settings_override = override_settings(DATABASE_REPLICAS=[self.alias], SHARED_CACHE=True)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        cache.clear()
+
+    def following(self, user):
+        self.client.force_authenticate(user=user)
+        return [row['following']['id'] for row in self.client.get(reverse('following')).json()['results']]
+
+    def followers(self, user):
+        self.client.force_authenticate(user=user)
+        return [row['follower']['id'] for row in self.client.get(reverse('followers')).json()['results']]
+
+    def test_writer_reads_the_primary_until_the_pin_expires(self):
+        from socialapi import routers
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.post(reverse('follow-user', kwargs={'pk': self.user2.id}))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Follow.objects.using('default').filter(follower=self.user1, following=self.user2).exists())
+
+        self.assertEqual(self.following(self.user1), [self.user2.id])  # pinned: the primary
+        self.assertEqual(self.followers(self.user2), [])  # not pinned: the stale replica
+
+        cache.delete(f'{routers.PIN_PREFIX}{self.user1.pk}')
+        self.assertEqual(self.following(self.user1), [])
+
+    def test_replica_responses_are_not_served_to_pinned_readers(self):
+        url = reverse('detail', kwargs={'pk': self.user1.pk})
+        self.client.force_authenticate(user=self.user2)
+        self.client.post(reverse('follow-user', kwargs={'pk': self.user1.id}))
+
+        # rendered from the stale replica, and cached, after the write bumped the user's version
+        self.assertEqual(APIClient().get(url).json()['info']['followers_count'], 0)
+        self.assertEqual(self.client.get(url).json()['info']['followers_count'], 1)
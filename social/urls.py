@@ -1,18 +1,30 @@
 """
 /api/social/follow/<user_id>/
 /api/social/unfollow/<user_id>/
+/api/social/follow/bulk/
+/api/social/unfollow/bulk/
 /api/social/followers/
 /api/social/following/
 /api/social/feed/
+/api/social/feed/async/
+/api/social/suggestions/
 
 """
 from django.urls import path
 
-from social.views import FollowUserView, UnfollowUserView, FollowersListView, FeedView
+from social.async_views import AsyncFeedView
+
+from social.views import FollowUserView, UnfollowUserView, BulkFollowView, BulkUnfollowView, FollowersListView, \
+    FollowingListView, SuggestionsView, FeedView
 
 urlpatterns = [
     path('follow/<int:pk>/', FollowUserView.as_view(), name='follow-user'),
     path('unfollow/<int:pk>/', UnfollowUserView.as_view(), name='unfollow-user'),
+    path('follow/bulk/', BulkFollowView.as_view(), name='bulk-follow'),
+    path('unfollow/bulk/', BulkUnfollowView.as_view(), name='bulk-unfollow'),
     path('followers/', FollowersListView.as_view(), name='followers'),
-    path('feed/', FeedView.as_view(), name='feed')
+    path('following/', FollowingListView.as_view(), name='following'),
+    path('suggestions/', SuggestionsView.as_view(), name='suggestions'),
+    path('feed/', FeedView.as_view(), name='feed'),
+    path('feed/async/', AsyncFeedView.as_view(), name='async-feed'),
 ]
@@ -1,26 +1,62 @@
 from django.core.serializers import serialize, get_serializer
+from django.db.models import Exists, OuterRef
 from django.shortcuts import render
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import CreateAPIView, ListAPIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
-from rest_framework.pagination import PageNumberPagination
 
+from accounts.authentication import StatelessReadJWTAuthentication
 from accounts.models import User
-from posts.serializers import PostSerializer
-from social.models import Follow
-from social.serializer import FollowSerializer, FollowerListSerializer, FollowingListSerializer
-
-from posts.models import Post
-
-
-class StandardResultsSetPagination(PageNumberPagination):
+from posts.serializers import PostSerializer, post_data
+from social import graph
+from social.feed import HomeFeed
+from social.models import Follow, FollowSuggestion, delete_follows, follows_created, follows_deleted, \
+    insert_follows
+from social.ranking import RANKINGS, RankedFeed, decode_as_of, encode_as_of
+from socialapi.pagination import KeysetPagination
+from socialapi.renderers import FastJSONRenderer
+from socialapi.routers import ReplicaReadMixin
+from social.serializer import FollowSerializer, FollowerListSerializer, FollowingListSerializer, \
+    BulkFollowSerializer, FollowSuggestionSerializer
+
+
+class StandardResultsSetPagination(KeysetPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
 
 
+class RankedFeedPagination(StandardResultsSetPagination):
+    """Pages of a RankedFeed; the links carry its snapshot time, so each page slices the same ranking."""
+    ordering_fields = ('score', 'id')  # best first, see social.ranking
+    key_type = float
+    as_of_query_param = 'as_of'
+
+    def _start(self, queryset, request):
+        estimate = super()._start(queryset, request)
+        as_of = request.query_params.get(self.as_of_query_param)
+        if as_of is not None:
+            try:
+                queryset.as_of = decode_as_of(as_of)
+            except ValueError:
+                raise NotFound('Invalid cursor')
+        self.base_url = replace_query_param(self.base_url, self.as_of_query_param, encode_as_of(queryset.as_of))
+        return estimate
+
+
+def feed_ranking(request):
+    """The ?ranking= of a feed request: 'recent' (the default) or 'relevance'."""
+    ranking = request.GET.get('ranking', RANKINGS[0])
+    if ranking not in RANKINGS:
+        raise ValidationError({'ranking': [f'Must be one of: {", ".join(RANKINGS)}.']})
+    return ranking
+
+
 class FollowUserView(APIView):  # (POST) - follow a user
     permission_classes = [IsAuthenticated]
 
@@ -74,34 +110,113 @@ class UnfollowUserView(APIView):  # (DELETE)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class FollowersListView(ListAPIView):  # (GET) - who follows me
+class BulkFollowView(APIView):  # (POST) - follow many users, e.g. onboarding suggestions
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkFollowSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = list(dict.fromkeys(serializer.validated_data['user_ids']))
+        me = request.user.id
+
+        # one query to validate every id; the INSERT itself reports which edges already existed
+        existing_users = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        to_follow = [user_id for user_id in user_ids if user_id != me and user_id in existing_users]
+
+        # no post_save: counters and feed backfill run once for the batch, for the rows actually inserted
+        followed = set(insert_follows(me, to_follow))
+        if followed:
+            follows_created((me, user_id) for user_id in to_follow if user_id in followed)
+
+        results = []
+        for user_id in user_ids:
+            if user_id == me:
+                result = 'cannot_follow_self'
+            elif user_id not in existing_users:
+                result = 'not_found'
+            else:
+                result = 'followed' if user_id in followed else 'already_following'
+            results.append({'user_id': user_id, 'status': result})
+
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+class BulkUnfollowView(APIView):  # (POST) - unfollow many users
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkFollowSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = list(dict.fromkeys(serializer.validated_data['user_ids']))
+        me = request.user.id
+
+        # no post_delete: downstream work runs once for the batch, for the rows this DELETE removed
+        following = set(delete_follows(me, user_ids))
+        if following:
+            follows_deleted((me, user_id) for user_id in user_ids if user_id in following)
+
+        results = [
+            {'user_id': user_id, 'status': 'unfollowed' if user_id in following else 'not_following'}
+            for user_id in user_ids
+        ]
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+class FollowersListView(ReplicaReadMixin, ListAPIView):  # (GET) - who follows me
+    authentication_classes = [StatelessReadJWTAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = FollowerListSerializer
     pagination_class = StandardResultsSetPagination
 
     def get_queryset(self):
         # We want to find all 'Follow' objects where the 'following' user is the current user
-        return self.request.user.followers.all()
+        return Follow.objects.filter(following_id=self.request.user.id).select_related('follower')
 
 
-class FollowingListView(ListAPIView):  # (GET) - who I follow
+class FollowingListView(ReplicaReadMixin, ListAPIView):  # (GET) - who I follow
+    authentication_classes = [StatelessReadJWTAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = FollowingListSerializer
     pagination_class = StandardResultsSetPagination
 
     def get_queryset(self):
         # We want to find all 'Follow' objects where the 'follower' is the current user
-        return self.request.user.following.all()
+        return Follow.objects.filter(follower_id=self.request.user.id).select_related('following')
 
 
-class FeedView(ListAPIView):
+class SuggestionsView(ReplicaReadMixin, ListAPIView):  # (GET) - who to follow, precomputed by compute_suggestions
+    authentication_classes = [StatelessReadJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    serializer_class = FollowSuggestionSerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        user_id = self.request.user.id
+        suggestions = FollowSuggestion.objects.filter(user_id=user_id).select_related('suggested') \
+            .order_by('-score', 'suggested_id')
+        # hide accounts followed since the suggestions were computed
+        if graph.get_graph() is None:
+            followed = Follow.objects.filter(follower_id=user_id, following_id=OuterRef('suggested_id'))
+            return suggestions.exclude(Exists(followed))
+        suggestions = list(suggestions)
+        followed = set(graph.followed_among(user_id, [suggestion.suggested_id for suggestion in suggestions]))
+        return [suggestion for suggestion in suggestions if suggestion.suggested_id not in followed]
+
+
+class FeedView(ReplicaReadMixin, ListAPIView):
+    authentication_classes = [StatelessReadJWTAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = PostSerializer  # You'll need to create this
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     pagination_class = StandardResultsSetPagination
 
     def get_queryset(self):
-        following_users = self.request.user.following.values_list('following', flat=True)
-
-        return Post.objects.filter(
-            author_id__in=following_users
-        ).select_related('author').order_by('-created_at')
+        if feed_ranking(self.request) == 'relevance':
+            self.pagination_class = RankedFeedPagination
+            return RankedFeed(self.request.user)
+        # reads the user's materialized inbox, merged with any followed pull authors (see social.feed)
+        return HomeFeed(self.request.user, rows=True)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(post_data(page))
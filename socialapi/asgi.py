@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'socialapi.settings')
+# turns persistent database connections off (see DB_POOL in settings)
+os.environ['SERVING_ASGI'] = 'True'
 
 application = get_asgi_application()
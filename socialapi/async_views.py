@@ -0,0 +1,66 @@
+"""
+Base class for the async read views.
+
+DRF's APIView is synchronous: under socialapi.asgi every request to it holds
+a worker thread for as long as it waits on the database or a slow client.
+AsyncAPIView is a plain Django View with async handlers that authenticates
+with AsyncJWTAuthentication, pages with KeysetPagination.apaginate_queryset
+and renders with FastJSONRenderer, so the event loop can interleave many
+such requests. Errors are reported in the same shape as DRF's. These are
+all read views: once authenticated, a request reads from a replica when
+there are any (socialapi.routers).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from accounts.authentication import AsyncJWTAuthentication
+from socialapi import routers
+from socialapi.renderers import FastJSONRenderer
+
+
+class AsyncAPIView(View):
+    authentication_class = AsyncJWTAuthentication
+    authentication_required = False
+    pagination_class = None
+
+    renderer = FastJSONRenderer()
+
+    def render(self, data, status=200):
+        return HttpResponse(self.renderer.render(data), status=status, content_type=self.renderer.media_type)
+
+    async def authenticate(self, request):
+        """The request's user, or None for anonymous requests."""
+        authenticator = self.authentication_class()
+        result = await authenticator.aauthenticate(request)
+        if result is None and self.authentication_required:
+            raise exceptions.NotAuthenticated()
+        user = None
+        if result is not None:
+            request.user, request.auth = result
+            user = request.user
+        if settings.DATABASE_REPLICAS:
+            routers.use_replica(await sync_to_async(routers.choose_replica)(request, user))
+        return user
+
+    async def paginate(self, queryset, request, to_data):
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, Request(request), view=self)
+        return self.render(paginator.get_paginated_response(to_data(page)).data)
+
+    async def dispatch(self, request, *args, **kwargs):
+        token = routers.use_replica(None)
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            response = exception_handler(exc, {'view': self, 'request': request})
+            rendered = self.render(response.data, status=response.status_code)
+            if response.status_code == 401:
+                rendered['WWW-Authenticate'] = self.authentication_class().authenticate_header(request)
+            return rendered
+        finally:
+            routers.restore(token)
@@ -0,0 +1,60 @@
+"""
+Maintenance of in-process indexes off the request thread.
+
+A BackgroundTask runs its function on a daemon thread, one run at a time:
+start() while a run is in progress does nothing. Called inside a
+transaction, start() waits for it to commit, as the thread couldn't see
+its writes before that (nor, in a TestCase, ever). Called from async code
+(an async view), where there is no transaction and the connection must
+not be touched, it starts the thread right away. Requests keep using the
+index they have (or fall back to the database) until the run swaps in a
+new one. The thread closes its database connections when it finishes, and
+a failed run is logged and retried on the next start().
+"""
+import asyncio
+import logging
+import threading
+
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTask:
+    def __init__(self, func, name):
+        self.func = func
+        self.name = name
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Run the function on a new thread unless a run is in progress."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            transaction.on_commit(self._start)
+        else:
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def join(self, timeout=None):
+        """Wait for the current run, if any (tests, management commands)."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        try:
+            self.func()
+        except Exception:
+            logger.exception('%s failed', self.name)
+        finally:
+            connections.close_all()
+            with self._lock:
+                self._thread = None
@@ -0,0 +1,152 @@
+"""
+Versioned response cache with conditional GET for public read endpoints.
+
+Every cacheable resource ("post:12", "user:3", "user-posts:3") has a version
+token in the cache that is replaced whenever the resource changes
+(bump_versions, called from post_save/post_delete receivers and from the
+counter updates). A cached response records the tokens of everything it was
+rendered from, so validating it is a cache lookup and never an ORM query:
+
+- If-None-Match / If-Modified-Since that still match are answered with 304;
+- otherwise the stored JSON body is served as is.
+
+If-Modified-Since is only looked at without If-None-Match. Last-Modified
+has one-second resolution, so each response stored under a URL is dated at
+least a second after the one it replaces: a change within the second of
+the previous render still fails an If-Modified-Since of that second.
+
+Versions must live in a cache shared by all workers (CACHE_BACKEND) for
+invalidation to reach every process.
+
+A response rendered from a read replica may predate the versions it was
+stored with, so it expires after DATABASE_REPLICA_PIN_SECONDS, and
+requests reading the primary (users pinned after a write) don't use it.
+"""
+import hashlib
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from socialapi import routers
+
+VERSION_PREFIX = 'version:'
+RESPONSE_PREFIX = 'response:'
+
+
+def _new_token():
+    return uuid.uuid4().hex
+
+
+def bump_versions(*names):
+    """Invalidate every cached response rendered from any of these resources."""
+    if names:
+        cache.set_many({VERSION_PREFIX + name: _new_token() for name in names}, timeout=None)
+
+
+def current_versions(names):
+    """{name: token} for the given resources, creating tokens that don't exist yet."""
+    keys = [VERSION_PREFIX + name for name in names]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _new_token(), timeout=None)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        found.update(cache.get_many(missing))
+    return {name: found.get(VERSION_PREFIX + name) for name in names}
+
+
+def _is_fresh(entry):
+    found = cache.get_many([VERSION_PREFIX + name for name in entry['versions']])
+    return all(found.get(VERSION_PREFIX + name) == token for name, token in entry['versions'].items())
+
+
+def _not_modified(request, entry):
+    # the ETag, where the client sent one, is the exact validator; see the module docstring
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or entry['etag'] in tags or 'W/' + entry['etag'] in tags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and entry['last_modified'] <= if_modified_since
+
+
+def _with_validators(response, entry):
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
+
+
+class ConditionalCacheMixin:
+    """
+    GET responses of this view are cached and validated by resource version.
+
+    `cache_resources` names the resources a response depends on, formatted
+    with the view kwargs and read before the database is queried; views can
+    add resources only known from the rendered data in
+    get_cache_dependencies(). The response must not depend on request.user.
+    """
+    cache_resources = ()
+
+    def get_cache_dependencies(self, data):
+        return []
+
+    def perform_authentication(self, request):
+        # responses are the same for everyone, so safe requests don't need the user loaded
+        if request.method not in SAFE_METHODS:
+            super().perform_authentication(request)
+
+    def _cache_key(self, request):
+        path = hashlib.sha1(request.build_absolute_uri().encode('utf-8')).hexdigest()
+        return f'{RESPONSE_PREFIX}{request.accepted_renderer.format}:{path}'
+
+    def get(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().get(request, *args, **kwargs)
+
+        entry = self._previous = cache.get(self._cache_key(request))
+        if entry is not None and entry.get('replica') and not routers.reading_from_replica():
+            entry = None
+        if entry is not None and _is_fresh(entry):
+            if _not_modified(request, entry):
+                return _with_validators(HttpResponseNotModified(), entry)
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            return _with_validators(response, entry)
+
+        self._cache_versions = current_versions([name.format(**kwargs) for name in self.cache_resources])
+        return super().get(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        versions = getattr(self, '_cache_versions', None)
+        if versions is None or not isinstance(response, Response) or response.status_code != 200:
+            return response
+
+        extra = [name for name in self.get_cache_dependencies(response.data) if name not in versions]
+        versions.update(current_versions(extra))
+        response.render()
+        last_modified = int(datetime.now(timezone.utc).timestamp())
+        previous = getattr(self, '_previous', None)
+        if previous is not None:
+            last_modified = max(last_modified, previous['last_modified'] + 1)
+        entry = {
+            'versions': versions,
+            'etag': quote_etag(hashlib.sha1(response.content).hexdigest()),
+            'last_modified': last_modified,
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'replica': routers.reading_from_replica(),
+        }
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        if entry['replica']:
+            timeout = min(timeout, settings.DATABASE_REPLICA_PIN_SECONDS)
+        cache.set(self._cache_key(request), entry, timeout)
+        if _not_modified(request, entry):
+            return _with_validators(HttpResponseNotModified(), entry)
+        return _with_validators(response, entry)
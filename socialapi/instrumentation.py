@@ -0,0 +1,219 @@
+"""
+Per-request SQL and timing instrumentation.
+
+ServerTimingMiddleware records, for each request:
+
+- db: the number of SQL queries and the time spent running them;
+- view: time from the view being called until it returned;
+- serialize: time the response's renderer spent encoding its data (and
+  the post_data() fast paths, which build that data in the view);
+- render: time rendering the response after the view returned;
+- total: time spent in the rest of the middleware chain and the view;
+
+and sends them in a Server-Timing header, which browser dev tools display:
+
+    Server-Timing: db;dur=3.2;desc="7 queries", view;dur=9.8, serialize;dur=2.1, render;dur=0.4, total;dur=11.0
+
+The phases overlap (queries run inside the view and serializers), they are
+not meant to add up.
+
+Queries are also grouped by shape, i.e. the SQL with its parameters still
+as placeholders and IN lists collapsed. A shape that runs
+N_PLUS_ONE_THRESHOLD times or more in one request is the usual sign of a
+lookup per row that select_related/prefetch_related would batch. It is
+logged as a warning on the socialapi.instrumentation logger and counted in
+an `nplus1` metric.
+
+The middleware is enabled by SERVER_TIMING, which defaults to DEBUG. The
+header discloses timings, so keep it off on public deployments. collect()
+records the same numbers for any block of code; socialapi.testing builds
+its query budget assertions on it.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# the collectors recording in this context, innermost last
+_active = ContextVar('socialapi_instrumentation', default=())
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_VALUES_LIST = re.compile(r'(\(\s*%s(?:\s*,\s*%s)*\s*\))(?:\s*,\s*\1)+')
+
+
+def query_shape(sql):
+    """The SQL with IN (%s, %s, ...) and multi-row VALUES lists collapsed, to group repeated queries."""
+    return _IN_LIST.sub('(...)', _VALUES_LIST.sub(r'\1, ...', sql))
+
+
+class Metrics:
+    """What one collect() block ran: queries by shape, and time per phase in seconds."""
+
+    def __init__(self):
+        self.queries = 0
+        self.shapes = Counter()
+        self.durations = Counter()
+        self._depth = Counter()
+
+    def repeated(self, threshold=None):
+        """{shape: count} of the query shapes that ran at least `threshold` times."""
+        threshold = settings.N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+
+@contextmanager
+def collect():
+    """Records the queries and timed() phases of the block into the Metrics it yields."""
+    install()
+    metrics = Metrics()
+    token = _active.set(_active.get() + (metrics,))
+    try:
+        yield metrics
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Adds the time the block takes to phase `name` of every active collector; nested blocks count once."""
+    collectors = [metrics for metrics in _active.get() if not metrics._depth[name]]
+    if not collectors:
+        yield
+        return
+    for metrics in collectors:
+        metrics._depth[name] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        for metrics in collectors:
+            metrics._depth[name] -= 1
+            metrics.durations[name] += elapsed
+
+
+def _record(execute, sql, params, many, context):
+    collectors = _active.get()
+    if not collectors:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        shape = query_shape(sql)
+        for metrics in collectors:
+            metrics.queries += 1
+            metrics.shapes[shape] += 1
+            metrics.durations['db'] += elapsed
+
+
+def _add_recorder(connection, **kwargs):
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+_install_lock = threading.Lock()
+_installed = False
+
+
+def install():
+    """
+    Puts the query recorder on every database connection of the process
+    (those opened from now on, in any thread, and this thread's open ones).
+    It does nothing outside collect() blocks.
+    """
+    global _installed
+    for connection in connections.all(initialized_only=True):
+        _add_recorder(connection)
+    with _install_lock:
+        if _installed:
+            return
+        connection_created.connect(_add_recorder, dispatch_uid='socialapi.instrumentation')
+        _installed = True
+
+
+def _ms(seconds):
+    return f'{seconds * 1000:.1f}'
+
+
+def server_timing(metrics, total):
+    """The Server-Timing header value for a request's Metrics."""
+    parts = [f'db;dur={_ms(metrics.durations["db"])};desc="{metrics.queries} queries"']
+    parts += [f'{name};dur={_ms(metrics.durations[name])}' for name in ('view', 'serialize', 'render')
+              if name in metrics.durations]
+    repeated = metrics.repeated()
+    if repeated:
+        parts.append(f'nplus1;desc="{len(repeated)} repeated query shapes"')
+    parts.append(f'total;dur={_ms(total)}')
+    return ', '.join(parts)
+
+
+class ServerTimingMiddleware:
+    """Server-Timing header and N+1 warnings for every request; see the module docstring."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with collect() as metrics:
+            response = self.get_response(request)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with collect() as metrics:
+            response = await self.get_response(request)
+        return self.finish(request, response, metrics, started)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # the view has returned and its response is about to be rendered; for a DRF
+        # Response, rendering is the renderer encoding response.data
+        request._view_finished = time.perf_counter()
+        response.add_post_render_callback(lambda response: self.rendered(request))
+        return response
+
+    def rendered(self, request):
+        request._rendered = time.perf_counter()
+
+    def finish(self, request, response, metrics, started):
+        finished = time.perf_counter()
+        view_started = getattr(request, '_view_started', None)
+        if view_started is not None:
+            view_finished = getattr(request, '_view_finished', finished)
+            metrics.durations['view'] = view_finished - view_started
+            if view_finished != finished:
+                metrics.durations['render'] = finished - view_finished
+            rendered = getattr(request, '_rendered', None)
+            if rendered is not None:
+                metrics.durations['serialize'] += rendered - view_finished
+
+        for shape, count in metrics.repeated().items():
+            logger.warning('Possible N+1: %d x %s (%s %s)', count, shape, request.method, request.path)
+        response['Server-Timing'] = server_timing(metrics, finished - started)
+        return response
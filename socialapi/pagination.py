@@ -0,0 +1,213 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by an opaque cursor holding the (created_at, id) of the
+row at the edge of the previous page, so every page is a bounded index seek
+instead of COUNT(*) plus OFFSET n. No total count is returned unless the
+client asks for one with ?count=estimate.
+"""
+import base64
+import json
+import math
+from collections import OrderedDict
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(created_at, pk, reverse=False):
+    # created_at is usually a datetime; numeric sort keys (e.g. a search rank) are stored as they are
+    value = created_at.isoformat() if isinstance(created_at, datetime) else created_at
+    payload = json.dumps([value, pk, 1 if reverse else 0], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, key_type=datetime):
+    """
+    Returns ((created_at, pk), reverse) or raises ValueError. The sort key
+    must be of `key_type`: an aware datetime, or a finite number for float.
+    """
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        created_at, pk, reverse = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if key_type is datetime:
+            created_at = datetime.fromisoformat(created_at)
+            if created_at.tzinfo is None:
+                raise ValueError(created_at)
+        elif isinstance(created_at, bool) or not isinstance(created_at, (int, float)) \
+                or not math.isfinite(created_at):
+            raise ValueError(created_at)
+        # a 64-bit primary key
+        if isinstance(pk, bool) or not isinstance(pk, int) or not -2 ** 63 <= pk < 2 ** 63:
+            raise ValueError(pk)
+        return (created_at, pk), bool(reverse)
+    except (TypeError, ValueError, OverflowError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def keyset_filter(queryset, position=None, reverse=False, fields=('created_at', 'id')):
+    """
+    Orders a queryset newest-first on `fields` (oldest-first if reverse) and,
+    given a (created_at, id) position, keeps only the rows after it.
+
+    The redundant `created_at <= x` bound lets the database use it as an
+    index range condition rather than filtering the OR row by row.
+    """
+    time_field, id_field = fields
+    direction = '' if reverse else '-'
+    queryset = queryset.order_by(direction + time_field, direction + id_field)
+    if position is None:
+        return queryset
+    created_at, pk = position
+    op = 'gt' if reverse else 'lt'
+    bound = 'gte' if reverse else 'lte'
+    return queryset.filter(
+        Q(**{f'{time_field}__{bound}': created_at}),
+        Q(**{f'{time_field}__{op}': created_at}) | Q(**{time_field: created_at, f'{id_field}__{op}': pk}),
+    )
+
+
+def estimate_count(queryset):
+    """
+    Planner row estimate on PostgreSQL; an exact count elsewhere. Objects
+    with seek() (HotColdPosts) estimate themselves, per queryset they read.
+    """
+    if hasattr(queryset, 'estimate'):
+        return queryset.estimate()
+    if hasattr(queryset, 'query'):
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            sql, params = queryset.order_by().query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+    return queryset.count()
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over (created_at, id), newest first.
+
+    Works on any queryset with `created_at` and `id` fields, and on objects
+    that implement `seek(position, reverse, limit)` themselves (HomeFeed).
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = None
+    max_page_size = None
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering_fields = ('created_at', 'id')
+    key_type = datetime  # of the first ordering field; float for scores and ranks
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size) if self.max_page_size else size
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def _start(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        position, self.reverse = None, False
+        if encoded:
+            try:
+                position, self.reverse = decode_cursor(encoded, self.key_type)
+            except ValueError:
+                raise NotFound('Invalid cursor')
+        self.position = position
+        self.count = None
+        return request.query_params.get(self.count_query_param) == 'estimate'
+
+    def _finish(self, rows):
+        self.has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+        self.page = rows
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self._start(queryset, request):
+            self.count = estimate_count(queryset)
+
+        limit = self.page_size + 1
+        if hasattr(queryset, 'seek'):
+            rows = queryset.seek(self.position, self.reverse, limit)
+        else:
+            rows = list(keyset_filter(queryset, self.position, self.reverse, self.ordering_fields)[:limit])
+        return self._finish(rows)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() with the async ORM; HomeFeed-like objects implement aseek()."""
+        if self._start(queryset, request):
+            self.count = await sync_to_async(estimate_count)(queryset)
+
+        limit = self.page_size + 1
+        if hasattr(queryset, 'aseek'):
+            rows = await queryset.aseek(self.position, self.reverse, limit)
+        else:
+            page = keyset_filter(queryset, self.position, self.reverse, self.ordering_fields)[:limit]
+            rows = [row async for row in page]
+        return self._finish(rows)
+
+    def _key(self, row):
+        time_field, id_field = self.ordering_fields
+        return getattr(row, time_field), getattr(row, id_field)
+
+    def _link(self, row, reverse):
+        return replace_query_param(self.base_url, self.cursor_query_param, encode_cursor(*self._key(row), reverse))
+
+    def get_next_link(self):
+        if not self.page:
+            return None
+        # paging backwards, there is always a next page: the one we came from
+        if self.reverse or self.has_more:
+            return self._link(self.page[-1], reverse=False)
+        return None
+
+    def get_previous_link(self):
+        if self.position is None:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        if self.has_more or not self.reverse:
+            return self._link(self.page[0], reverse=True)
+        return None
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,82 @@
+"""
+JSON renderer backed by orjson.
+
+Produces the same bytes as DRF's compact JSONRenderer for the data the post
+list views return (dicts, lists, strings, ints, None and datetimes), several
+times faster. Datetimes and any type orjson doesn't know are handed to DRF's
+encoder so they are formatted exactly as before. Falls back to JSONRenderer
+when orjson isn't installed or an indented response is asked for.
+
+NDJSONRenderer and CSVRenderer write one record per line. Besides render(),
+for an ordinary response such as an error, their stream() encodes an
+iterable of records lazily, for a StreamingHttpResponse (see accounts.export).
+"""
+import csv
+
+from rest_framework.utils import encoders
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=encoders.JSONEncoder().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+        # same strict-javascript-subset escaping as JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b''.join(self.stream(data if isinstance(data, list) else [data]))
+
+    def stream(self, records):
+        json = FastJSONRenderer()
+        for record in records:
+            yield json.render(record) + b'\n'
+
+
+class _Echo:
+    """A file for csv.writer that hands back each line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        records = data if isinstance(data, list) else [data]
+        return b''.join(self.stream(records, list(records[0]) if records else []))
+
+    def stream(self, records, fields):
+        """A header line, then one line per record (a dict with `fields` as keys)."""
+        writer = csv.DictWriter(_Echo(), fields, extrasaction='ignore')
+        yield writer.writeheader().encode(self.charset)
+        for record in records:
+            yield writer.writerow(record).encode(self.charset)
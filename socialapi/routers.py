@@ -0,0 +1,139 @@
+"""
+Read replicas with read-your-writes.
+
+With DB_REPLICAS set, settings adds a database alias per replica
+(DATABASE_REPLICAS). Writes always go to the primary (default), and so do
+reads, except in the read views: DRF views with ReplicaReadMixin and the
+async views (socialapi.async_views). A GET, HEAD or OPTIONS request to one
+of those reads from a randomly chosen replica for the rest of the request.
+
+A replica may lag behind the primary, so a user who has just written
+something would not see it there. ReplicaPinMiddleware therefore pins the
+user of every successful POST, PUT, PATCH or DELETE to the primary for
+DATABASE_REPLICA_PIN_SECONDS (a pin key in the shared cache), and their
+reads stay on the primary until it expires. Everyone else may see the
+write up to the replication lag later, which the pin window should cover.
+The pin has to reach whichever worker serves the user's next read, so
+replicas can't be enabled with a per-process cache (SHARED_CACHE).
+
+Data cached across requests from a replica is kept no longer than the pin
+window either; see socialapi.caching.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework import exceptions
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_PREFIX = 'replica-pin:'
+
+# the replica alias this request reads from, or None for the primary
+_replica = ContextVar('replica', default=None)
+
+
+def pin(user):
+    """Send `user`'s reads to the primary for the next DATABASE_REPLICA_PIN_SECONDS."""
+    cache.set(f'{PIN_PREFIX}{user.pk}', True, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return bool(user and user.is_authenticated and cache.get(f'{PIN_PREFIX}{user.pk}'))
+
+
+def choose_replica(request, user):
+    """A replica alias for a safe request by `user`, or None when it must read from the primary."""
+    if not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS or is_pinned(user):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def use_replica(alias):
+    """Route this request's reads to `alias` (None: the primary); the caller resets the returned token."""
+    return _replica.set(alias)
+
+
+def restore(token):
+    _replica.reset(token)
+
+
+def reading_from_replica():
+    return _replica.get() is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _replica.get()  # None: the instance's database or default, as usual
+
+    def db_for_write(self, model, **hints):
+        # explicitly, or saving an instance read from a replica would write to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get the schema from the primary through replication
+        return False if db in settings.DATABASE_REPLICAS else None
+
+
+class ReplicaReadMixin:
+    """Safe-method requests to this DRF view read from a replica, unless their user is pinned."""
+
+    def dispatch(self, request, *args, **kwargs):
+        token = use_replica(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            restore(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if settings.DATABASE_REPLICAS and request.method in SAFE_METHODS:
+            # authenticated here if the view hasn't already, so the user lookup itself reads the primary
+            try:
+                user = request.user
+            except exceptions.APIException:
+                user = None  # public views (ConditionalCacheMixin) don't authenticate safe requests at all
+            use_replica(choose_replica(request, user))
+
+
+class ReplicaPinMiddleware:
+    """Pins the user of every successful write request to the primary; see the module docstring."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        if not settings.SHARED_CACHE:
+            raise ImproperlyConfigured(
+                'DB_REPLICAS needs a CACHE_BACKEND shared by every worker: read-your-writes pins '
+                'in a per-process cache are only seen by the worker that set them.'
+            )
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.finish(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.finish(request, await self.get_response(request))
+
+    def finish(self, request, response):
+        # DRF sets request.user to the user it authenticated
+        user = getattr(request, 'user', None)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and user and user.is_authenticated:
+            pin(user)
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import copy
 from pathlib import Path
 from pickle import APPENDS
 from datetime import timedelta
@@ -49,11 +50,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'socialapi.instrumentation.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'socialapi.routers.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,9 +91,49 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default=''),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # keep connections open between requests instead of reconnecting every time
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
     }
 }
 
+# Persistent connections aren't used under ASGI: sync code runs on whichever thread is free, so each
+# thread would keep a connection of its own. socialapi.asgi sets SERVING_ASGI; use DB_POOL there instead.
+if config('SERVING_ASGI', default=False, cast=bool):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# psycopg 3 connection pool, shared by the threads of a worker process (see gunicorn.conf.py).
+# Replaces persistent connections, so CONN_MAX_AGE is 0 when it is on.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    from psycopg_pool import ConnectionPool
+
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+            'max_idle': config('DB_POOL_MAX_IDLE', default=300, cast=float),
+            # health check run when a connection is handed out
+            'check': ConnectionPool.check_connection if DATABASES['default']['CONN_HEALTH_CHECKS'] else None,
+        },
+    }
+
+# Read replicas (socialapi.routers): hosts (database files with SQLite) of copies of the default
+# database, which the read views read from. Each becomes an alias replica1, replica2, ...; users who
+# have just written are pinned to the primary for DATABASE_REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = []
+for _number, _host in enumerate(config('DB_REPLICAS', default='', cast=Csv()), 1):
+    _replica = copy.deepcopy(DATABASES['default'])
+    _replica['NAME' if _replica['ENGINE'] == 'django.db.backends.sqlite3' else 'HOST'] = _host
+    # tests create no replica databases: the aliases use the test database
+    _replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES[f'replica{_number}'] = _replica
+    DATABASE_REPLICAS.append(f'replica{_number}')
+DATABASE_ROUTERS = ['socialapi.routers.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = config('DB_REPLICA_PIN_SECONDS', default=5, cast=float)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -132,11 +175,26 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'accounts.User'
 
+# Use a shared backend (e.g. django.core.cache.backends.redis.RedisCache) when running
+# more than one worker: response cache versions (socialapi.caching) live here.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+# LocMem (the default) and the dummy cache are per process: state every gunicorn worker must
+# agree on (the timeline buffer, read-your-writes pins) needs a CACHE_BACKEND all of them share
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'socialapi.pagination.KeysetPagination',
     'PAGE_SIZE': 20
 }
 
@@ -160,10 +218,75 @@ SIMPLE_JWT = {
     "JTI_CLAIM": "jti",
 
     "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
-    "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.FilteredTokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "accounts.serializers.FilteredTokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
 APPEND_SLASH = False
+
+# Server-Timing header with query counts and phase timings (socialapi.instrumentation).
+# It discloses timings, so it is only on by default in development.
+SERVER_TIMING = config('SERVER_TIMING', default=DEBUG, cast=bool)
+# A query shape repeated this many times in one request is logged as a possible N+1
+N_PLUS_ONE_THRESHOLD = config('N_PLUS_ONE_THRESHOLD', default=5, cast=int)
+
+# Authenticated user cache (accounts.authentication)
+JWT_USER_CACHE_SIZE = config('JWT_USER_CACHE_SIZE', default=10000, cast=int)
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=30, cast=int)
+# Serve safe requests on StatelessReadJWTAuthentication views from token claims alone
+JWT_STATELESS_READS = config('JWT_STATELESS_READS', default=False, cast=bool)
+
+# Bloom filter in front of the refresh token blacklist (accounts.blacklist)
+BLACKLIST_FILTER_REFRESH_SECONDS = config('BLACKLIST_FILTER_REFRESH_SECONDS', default=5, cast=int)
+BLACKLIST_FILTER_REBUILD_SECONDS = config('BLACKLIST_FILTER_REBUILD_SECONDS', default=3600, cast=int)
+BLACKLIST_FILTER_MIN_CAPACITY = config('BLACKLIST_FILTER_MIN_CAPACITY', default=100000, cast=int)
+BLACKLIST_FILTER_ERROR_RATE = config('BLACKLIST_FILTER_ERROR_RATE', default=0.001, cast=float)
+
+# Lifetime of cached JSON bodies of public read endpoints (socialapi.caching)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Home feed fan-out (social.feed)
+# Authors with more followers than this are not pushed into follower inboxes;
+# their posts are merged into the feed at read time instead.
+FEED_FANOUT_MAX_FOLLOWERS = config('FEED_FANOUT_MAX_FOLLOWERS', default=5000, cast=int)
+# How many of an author's recent posts are copied into the inbox on follow.
+FEED_BACKFILL_LIMIT = config('FEED_BACKFILL_LIMIT', default=200, cast=int)
+FEED_FANOUT_BATCH_SIZE = config('FEED_FANOUT_BATCH_SIZE', default=1000, cast=int)
+
+# Relevance-ranked feed, ?ranking=relevance (social.ranking)
+FEED_RANKING_CANDIDATES = config('FEED_RANKING_CANDIDATES', default=5000, cast=int)
+FEED_RANKING_HALF_LIFE_HOURS = config('FEED_RANKING_HALF_LIFE_HOURS', default=24, cast=float)
+FEED_RANKING_MUTUAL_BOOST = config('FEED_RANKING_MUTUAL_BOOST', default=1.0, cast=float)
+FEED_RANKING_CACHE_SECONDS = config('FEED_RANKING_CACHE_SECONDS', default=60, cast=int)
+
+# Posts older than this many days are moved to the archive table by archive_posts (posts.archive)
+POST_HOT_WINDOW_DAYS = config('POST_HOT_WINDOW_DAYS', default=90, cast=int)
+
+# Newest posts kept in the shared cache for the first page of the public post list (posts.timeline); 0 disables.
+# Always off without a shared cache, where each worker's buffer would only see its own writes
+POST_TIMELINE_SIZE = config('POST_TIMELINE_SIZE', default=200, cast=int) if SHARED_CACHE else 0
+# Seconds a buffer is served before it is rebuilt, bounding how long writes it missed stay hidden
+POST_TIMELINE_TTL_SECONDS = config('POST_TIMELINE_TTL_SECONDS', default=60, cast=int)
+
+# Maximum number of posts accepted by POST /api/posts/batch/
+POST_BATCH_MAX = config('POST_BATCH_MAX', default=500, cast=int)
+
+# Maximum number of user ids accepted by the bulk follow/unfollow endpoints
+SOCIAL_BULK_FOLLOW_MAX = config('SOCIAL_BULK_FOLLOW_MAX', default=200, cast=int)
+
+# In-process follow graph index (social.graph)
+SOCIAL_GRAPH_INDEX = config('SOCIAL_GRAPH_INDEX', default=False, cast=bool)
+SOCIAL_GRAPH_INDEX_MAX_BYTES = config('SOCIAL_GRAPH_INDEX_MAX_BYTES', default=256 * 1024 * 1024, cast=int)
+SOCIAL_GRAPH_INDEX_REBUILD_SECONDS = config('SOCIAL_GRAPH_INDEX_REBUILD_SECONDS', default=300, cast=int)
+SOCIAL_GRAPH_INDEX_COMPACT_EVERY = config('SOCIAL_GRAPH_INDEX_COMPACT_EVERY', default=10000, cast=int)
+
+# Suggestions stored per user by compute_suggestions (social.suggestions)
+SOCIAL_SUGGESTIONS_TOP_K = config('SOCIAL_SUGGESTIONS_TOP_K', default=20, cast=int)
+
+# Number of recent posts embedded in a user's profile (accounts.serializers.UserInfoSerializer)
+USER_EMBEDDED_POSTS_LIMIT = config('USER_EMBEDDED_POSTS_LIMIT', default=10, cast=int)
+
+# Rows fetched per server-side cursor round trip by the user data export (accounts.export)
+USER_EXPORT_CHUNK_SIZE = config('USER_EXPORT_CHUNK_SIZE', default=2000, cast=int)
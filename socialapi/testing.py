@@ -0,0 +1,63 @@
+"""
+Helpers shared by the apps' test suites.
+
+QueryPlanMixin asserts, through EXPLAIN, that a hot query is served from a
+given index rather than a full table scan or a sort of every matching row.
+Tests seed enough rows (and ANALYZE them) for the planner to choose the
+way it would on a real database.
+
+QueryBudgetMixin asserts how many queries a block (usually one request)
+may run, and that none of them is repeated per row (an N+1).
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import connections
+
+from socialapi.instrumentation import collect
+
+FULL_SCAN = {
+    # SCAN without USING reads the whole table; USING [COVERING] INDEX walks an index in order
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING\b).*$', re.M),
+    'postgresql': re.compile(r'Seq Scan'),
+}
+SORT = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY'),
+    'postgresql': re.compile(r'(?<!Incremental )\bSort\b'),
+}
+
+
+def analyze(using='default'):
+    """Refresh planner statistics after seeding rows."""
+    with connections[using].cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+class QueryPlanMixin:
+    def assertUsesIndex(self, queryset, index_name, ordered=True):
+        """
+        `queryset` reads through `index_name` and never scans a whole table;
+        with ordered=True the rows also come out of the index in order.
+        """
+        plan = queryset.explain()
+        vendor = connections[queryset.db].vendor
+        self.assertIn(index_name, plan, f'{index_name} not used:\n{plan}')
+        if vendor in FULL_SCAN:
+            self.assertIsNone(FULL_SCAN[vendor].search(plan), f'full table scan:\n{plan}')
+            if ordered:
+                self.assertIsNone(SORT[vendor].search(plan), f'rows sorted outside the index:\n{plan}')
+
+
+class QueryBudgetMixin:
+    @contextmanager
+    def assertQueryBudget(self, max_queries, max_repeats=None):
+        """
+        The block runs at most `max_queries` queries and no query shape more
+        than `max_repeats` times (default: below N_PLUS_ONE_THRESHOLD).
+        """
+        with collect() as metrics:
+            yield metrics
+        listing = '\n'.join(f'{count} x {shape}' for shape, count in metrics.shapes.most_common())
+        self.assertLessEqual(metrics.queries, max_queries, f'{metrics.queries} queries:\n{listing}')
+        repeated = metrics.repeated(None if max_repeats is None else max_repeats + 1)
+        self.assertFalse(repeated, f'repeated queries (N+1):\n{listing}')